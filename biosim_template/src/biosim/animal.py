@@ -1,11 +1,23 @@
 import math as m
-import random
+import operator
+
+import numpy as np
+
+from . import counters, sampling
+from .counters import count
+
+# Reads the slots directly, faster than the properties when used on many animals
+_get_fitness = operator.attrgetter('_fitness')
+_get_weight = operator.attrgetter('_weight')
 
 
 class Animal:
     """This is a class for a single animal"""
     params = {}
 
+    # No __dict__ for each animal, so they are faster to make and use less memory
+    __slots__ = ('_age', '_weight', '_fitness')
+
     @classmethod
     def set_params(cls, given_params):
         """
@@ -42,6 +54,113 @@ class Animal:
         for key in given_params:
             cls.params[key] = given_params[key]     # Changes the parameters
 
+    @classmethod
+    def fitness_values(cls, ages, weights):
+        """
+        Finds the fitness of many animals at once, with the same formula as update_fitness
+
+        Parameters
+        ----------
+        ages: array
+            the ages of the animals
+        weights: array
+            the weights of the animals
+
+        Returns
+        -------
+        Array with the fitness of each animal, 0 if the weight is 0 or less
+        """
+        ages = np.asarray(ages, dtype=float)
+        weights = np.asarray(weights, dtype=float)
+        fitness = 1 / (1 + np.exp(cls.params['phi_age'] * (ages - cls.params['a_half']))) * \
+            1 / (1 + np.exp(cls.params['phi_weight'] * (cls.params['w_half'] - weights)))
+        count('fitness_updates', fitness.size)
+        return np.where(weights > 0, fitness, 0.)
+
+    @classmethod
+    def from_arrays(cls, ages, weights):
+        """
+        Makes many animals at once, with the fitness found for all of them together
+
+        Parameters
+        ----------
+        ages: array
+            the ages of the animals
+        weights: array
+            the weights of the animals, must be strictly positive
+
+        Returns
+        -------
+        List with the new animals
+
+        Raises
+        ------
+        ValueError
+        """
+        ages = np.asarray(ages)
+        weights = np.asarray(weights, dtype=float)
+        if (weights <= 0).any():
+            raise ValueError('Weight of the animal must be strictly positive')
+
+        count('allocations', len(ages))
+        fitness = cls.fitness_values(ages, weights)
+        animals = []
+        new = object.__new__
+        for age, weight, fit in zip(ages.tolist(), weights.tolist(), fitness.tolist()):
+            animal = new(cls)
+            animal._age = age
+            animal._weight = weight
+            animal._fitness = fit
+            animals.append(animal)
+        return animals
+
+    @staticmethod
+    def fitness_array(animals):
+        """
+        Parameters
+        ----------
+        animals: list
+            the animals
+
+        Returns
+        -------
+        Array with the fitness of each animal
+        """
+        return np.fromiter(map(_get_fitness, animals), dtype=float, count=len(animals))
+
+    @staticmethod
+    def weight_array(animals):
+        """
+        Parameters
+        ----------
+        animals: list
+            the animals
+
+        Returns
+        -------
+        Array with the weight of each animal
+        """
+        return np.fromiter(map(_get_weight, animals), dtype=float, count=len(animals))
+
+    @staticmethod
+    def sort_by_fitness(animals, descending=False):
+        """
+        Sorts a list of animals by fitness, in place
+
+        Animals with the same fitness keep their order. The sort is fastest when the list is
+        already sorted, in either direction, so keeping the list sorted between the phases of
+        the year makes each sort take about linear time.
+
+        Parameters
+        ----------
+        animals: list
+            the animals
+        descending: bool
+            if True, from the highest fitness
+        """
+        count('sorts')
+        animals.sort(key=_get_fitness, reverse=descending)
+
     def __init__(self, age=0, weight=None):
         """
 
@@ -64,8 +183,9 @@ class Animal:
                 raise ValueError('Weight of the animal must be strictly positive')
         else:
             while weight is None or weight <= 0:    # weights of a new animal must be strictly positive
-                weight = random.gauss(self.params['w_birth'], self.params['sigma_birth'])
+                weight = sampling.gauss(self.params['w_birth'], self.params['sigma_birth'])
 
+        count('allocations')
         self._age = age
         self._weight = weight
         self._fitness = 0
@@ -98,6 +218,19 @@ class Animal:
         """
         return self._fitness
 
+    def copy(self):
+        """
+        Returns
+        -------
+        A new animal with the same age, weight and fitness
+        """
+        count('allocations')
+        twin = object.__new__(type(self))
+        twin._age = self._age
+        twin._weight = self._weight
+        twin._fitness = self._fitness
+        return twin
+
     def add_weight(self, food):
         """
         Give weight to the animal when it eats
@@ -130,6 +263,8 @@ class Animal:
         It is called every time the weight or age
 
         """
+        if counters.num_enabled:
+            count('fitness_updates')
         if self._weight <= 0:    # if the animal weight is less than 0 it cannot get any fitness
             self._fitness = 0
         else:
@@ -143,7 +278,7 @@ class Animal:
         -------
         True if the animal will move, otherwise it returns False
         """
-        return random.random() < self.params['mu'] * self._fitness
+        return sampling.random() < self.params['mu'] * self._fitness
 
     def birth(self, num):
         """
@@ -160,8 +295,8 @@ class Animal:
         if self._weight < self.params['zeta'] * (self.params['w_birth'] + self.params['sigma_birth']):
             return False    # if the mother weighs too little, no birth
 
-        elif random.random() < min(1, self.params['gamma'] * self._fitness * (num - 1)):
-            weight_baby = random.gauss(self.params['w_birth'], self.params['sigma_birth'])
+        elif sampling.random() < min(1, self.params['gamma'] * self._fitness * (num - 1)):
+            weight_baby = sampling.gauss(self.params['w_birth'], self.params['sigma_birth'])
             # gives a weight to baby if birth
 
             if weight_baby > self._weight:
@@ -180,7 +315,7 @@ class Animal:
         """Sets conditions for an animal to die"""
         if self._weight == 0:
             return True     # if the weight is 0 it's going to die
-        elif random.random() < self.params['omega'] * (1-self._fitness):
+        elif sampling.random() < self.params['omega'] * (1-self._fitness):
             return True     # if less fit, more likely to die
         else:
             return False       # if not dead, it's going to live
@@ -188,6 +323,7 @@ class Animal:
 
 class Herbivore(Animal):
     """Given parameters for herbivores that works with the code"""
+    __slots__ = ()
 
     default_params = {'w_birth': 8.0,
                       'sigma_birth': 1.5,
@@ -211,6 +347,7 @@ class Herbivore(Animal):
 
 class Carnivore(Animal):
     """Given parameters for carnivores that works with the code"""
+    __slots__ = ()
 
     default_params = {'w_birth': 6.0,
                       'sigma_birth': 1.0,
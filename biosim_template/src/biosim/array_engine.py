@@ -0,0 +1,599 @@
+"""
+Engine that keeps the animals in arrays and runs the year with compiled kernels.
+
+Each species is stored as columns (row, column, age, weight and fitness), and the loops of
+feeding, carnivore feeding, reproduction, migration and death are kernels over these
+columns. When numba is installed the kernels are compiled with ``numba.njit``, which makes
+a year many times faster than with one Python object for each animal. Select the engine
+with ``BioSim(..., engine='array')``; without numba BioSim warns and uses the object engine.
+
+The kernels are plain Python functions over arrays, so they can also be run without numba,
+see ``ArrayIsland(..., compiled=False)``, which is slow but useful for testing. The random
+numbers come from the generator of numba, or from ``numpy.random`` when the kernels are
+not compiled, and are seeded with :meth:`ArrayIsland.seed`.
+
+The rules are the same as for the object engine, but the random numbers are drawn in a
+different order, so the results are only the same in distribution.
+"""
+
+import numpy as np
+
+from .animal import Herbivore, Carnivore
+from .island import Island, _LANDSCAPES
+from .landscape import split_species
+
+try:
+    import numba
+except ImportError:     # numba is optional
+    numba = None
+
+HAVE_NUMBA = numba is not None
+
+
+def _jit(function):
+    """Compiles a kernel with numba if it is installed"""
+    return numba.njit(cache=True)(function) if HAVE_NUMBA else function
+
+
+# Row and column steps of the four directions an animal can move in
+_STEPS = np.array([(-1, 0), (0, -1), (1, 0), (0, 1)], dtype=np.int64)
+
+
+@_jit
+def seed_kernels(seed):
+    """Seeds the random number generator of the kernels"""
+    np.random.seed(seed)
+
+
+@_jit
+def draw_seed():
+    """Draws a seed from the random number generator of the kernels"""
+    return np.random.randint(0, 2 ** 31 - 1)
+
+
+@_jit
+def fitness_one(age, weight, phi_age, a_half, phi_weight, w_half):
+    """The fitness of one animal, the same formula as Animal.update_fitness"""
+    if weight <= 0:
+        return 0.
+    return 1 / (1 + np.exp(phi_age * (age - a_half))) * \
+        1 / (1 + np.exp(phi_weight * (w_half - weight)))
+
+
+@_jit
+def fitness_all(age, weight, fitness_params):
+    """
+    The fitness of many animals, the same formula as Animal.fitness_values
+
+    Parameters
+    ----------
+    age, weight: array
+        the age and weight of each animal
+    fitness_params: array
+        phi_age, a_half, phi_weight and w_half
+
+    Returns
+    -------
+    Array with the fitness of each animal
+    """
+    phi_age, a_half, phi_weight, w_half = fitness_params
+    fitness = np.empty(len(weight))
+    for i in range(len(weight)):
+        fitness[i] = fitness_one(age[i], weight[i], phi_age, a_half, phi_weight, w_half)
+    return fitness
+
+
+@_jit
+def random_keys(n):
+    """n random numbers, used to put animals in random order"""
+    return np.random.random(n)
+
+
+@_jit
+def feed_herbivores(order, cell, age, weight, fitness, fodder, appetite, beta, fitness_params):
+    """
+    Feeds the herbivores, the fittest first in each cell
+
+    Parameters
+    ----------
+    order: array
+        the herbivores sorted by cell, and by fitness from the highest in each cell
+    cell: array
+        the cell of each herbivore
+    age, weight, fitness: array
+        the herbivores, weight and fitness are changed
+    fodder: array
+        the fodder in each cell, is eaten
+    appetite, beta: float
+        the parameters F and beta of the herbivores
+    fitness_params: array
+        phi_age, a_half, phi_weight and w_half of the herbivores
+    """
+    phi_age, a_half, phi_weight, w_half = fitness_params
+    for k in range(len(order)):
+        i = order[k]
+        if fodder[cell[i]] <= 0:
+            continue
+        eaten = min(appetite, fodder[cell[i]])
+        fodder[cell[i]] -= eaten
+        weight[i] += beta * eaten
+        fitness[i] = fitness_one(age[i], weight[i], phi_age, a_half, phi_weight, w_half)
+
+
+@_jit
+def feed_carnivores(herbi_order, herbi_start, herbi_end, herbi_weight, herbi_fitness,
+                    carni_order, carni_start, carni_end, carni_age, carni_weight, carni_fitness,
+                    appetite, beta, delta_phi_max, fitness_params):
+    """
+    Lets the carnivores of each cell hunt the herbivores, the least fit herbivores first
+
+    Parameters
+    ----------
+    herbi_order: array
+        the herbivores sorted by cell, and by fitness from the lowest in each cell
+    herbi_start, herbi_end: array
+        the part of herbi_order that is in each cell
+    herbi_weight, herbi_fitness: array
+        the herbivores
+    carni_order: array
+        the carnivores sorted by cell, in random order in each cell
+    carni_start, carni_end: array
+        the part of carni_order that is in each cell
+    carni_age, carni_weight, carni_fitness: array
+        the carnivores, weight and fitness are changed
+    appetite, beta, delta_phi_max: float
+        the parameters F, beta and DeltaPhiMax of the carnivores
+    fitness_params: array
+        phi_age, a_half, phi_weight and w_half of the carnivores
+
+    Returns
+    -------
+    bool array, False for the herbivores that are killed
+    """
+    phi_age, a_half, phi_weight, w_half = fitness_params
+    alive = np.ones(len(herbi_weight), dtype=np.bool_)
+    for c in range(len(carni_start)):
+        for k in range(carni_start[c], carni_end[c]):
+            j = carni_order[k]
+            hunger = appetite
+            for m in range(herbi_start[c], herbi_end[c]):
+                i = herbi_order[m]
+                if not alive[i]:
+                    continue
+                if (carni_fitness[j] - herbi_fitness[i]) / delta_phi_max > np.random.random():
+                    eaten = min(herbi_weight[i], hunger)
+                    alive[i] = False
+                    hunger -= eaten
+                    carni_weight[j] += beta * eaten
+                    carni_fitness[j] = fitness_one(carni_age[j], carni_weight[j],
+                                                   phi_age, a_half, phi_weight, w_half)
+                    if hunger <= 0:
+                        break
+    return alive
+
+
+@_jit
+def reproduce(cell, age, weight, fitness, cell_counts, params, fitness_params):
+    """
+    Draws the births of one species
+
+    Parameters
+    ----------
+    cell: array
+        the cell of each animal
+    age, weight, fitness: array
+        the animals, weight and fitness of the mothers are changed
+    cell_counts: array
+        number of animals of the species in each cell
+    params: array
+        gamma, zeta, w_birth, sigma_birth and xi of the species
+    fitness_params: array
+        phi_age, a_half, phi_weight and w_half of the species
+
+    Returns
+    -------
+    The index of the mother and the weight of each newborn animal
+    """
+    gamma, zeta, w_birth, sigma_birth, xi = params
+    phi_age, a_half, phi_weight, w_half = fitness_params
+    mothers = np.empty(len(weight), dtype=np.int64)
+    babies = np.empty(len(weight))
+    born = 0
+    for i in range(len(weight)):
+        if weight[i] < zeta * (w_birth + sigma_birth):
+            continue
+        if np.random.random() < min(1., gamma * fitness[i] * (cell_counts[cell[i]] - 1)):
+            baby = np.random.normal(w_birth, sigma_birth)
+            if baby > weight[i] or baby <= 0:
+                continue
+            weight[i] -= xi * baby
+            fitness[i] = fitness_one(age[i], weight[i], phi_age, a_half, phi_weight, w_half)
+            mothers[born] = i
+            babies[born] = baby
+            born += 1
+    return mothers[:born], babies[:born]
+
+
+@_jit
+def migrate(row, col, fitness, mu, entry, steps):
+    """
+    Moves the animals that migrate to a random neighbour cell, if they can get into it
+
+    Parameters
+    ----------
+    row, col: array
+        the cell of each animal, from 0, are changed
+    fitness: array
+        the fitness of each animal
+    mu: float
+        the parameter mu of the species
+    entry: array
+        2-D, the chance that an animal gets into each cell, 0 where animals can not live
+    steps: array
+        the row and column step of each direction
+
+    Returns
+    -------
+    int, how many animals moved
+    """
+    moved = 0
+    for i in range(len(row)):
+        if np.random.random() < mu * fitness[i]:
+            direction = np.random.randint(0, 4)
+            new_row, new_col = row[i] + steps[direction, 0], col[i] + steps[direction, 1]
+            chance = entry[new_row, new_col]
+            if chance >= 1. or (chance > 0. and np.random.random() < chance):
+                row[i] = new_row
+                col[i] = new_col
+                moved += 1
+    return moved
+
+
+@_jit
+def survive(weight, fitness, omega):
+    """
+    Draws which animals die
+
+    Returns
+    -------
+    bool array, True for the animals that survive
+    """
+    alive = np.ones(len(weight), dtype=np.bool_)
+    for i in range(len(weight)):
+        if weight[i] == 0 or np.random.random() < omega * (1 - fitness[i]):
+            alive[i] = False
+    return alive
+
+
+_KERNELS = ('seed_kernels', 'draw_seed', 'fitness_all', 'random_keys', 'feed_herbivores',
+            'feed_carnivores', 'reproduce', 'migrate', 'survive')
+
+
+class _Kernels:
+    """The kernels, compiled or as plain Python functions"""
+    def __init__(self, compiled):
+        for name in _KERNELS:
+            kernel = globals()[name]
+            setattr(self, name, kernel if compiled else getattr(kernel, 'py_func', kernel))
+
+
+def _fitness_params(species):
+    """The parameters of the fitness of a species as an array"""
+    return np.array([species.params[key] for key in ('phi_age', 'a_half', 'phi_weight', 'w_half')])
+
+
+class Population:
+    """The animals of one species as columns"""
+    def __init__(self, species, fitness_kernel=None):
+        """
+
+        Parameters
+        ----------
+        species: class
+            Herbivore or Carnivore
+        fitness_kernel: callable
+            the fitness_all kernel to find the fitness with, species.fitness_values if not given
+        """
+        self.species = species
+        self.fitness_kernel = fitness_kernel
+        self.row = np.empty(0, dtype=np.int64)     # from 0
+        self.col = np.empty(0, dtype=np.int64)
+        self.age = np.empty(0, dtype=np.int64)
+        self.weight = np.empty(0)
+        self.fitness = np.empty(0)
+
+    def __len__(self):
+        return len(self.weight)
+
+    def copy(self):
+        """
+        Returns
+        -------
+        Independent copy of the animals
+        """
+        twin = Population(self.species, self.fitness_kernel)
+        for column in ('row', 'col', 'age', 'weight', 'fitness'):
+            setattr(twin, column, getattr(self, column).copy())
+        return twin
+
+    def append(self, row, col, age, weight):
+        """Adds animals, with their fitness"""
+        age, weight = np.asarray(age, dtype=np.int64), np.asarray(weight, dtype=float)
+        self.row = np.concatenate((self.row, np.asarray(row, dtype=np.int64)))
+        self.col = np.concatenate((self.col, np.asarray(col, dtype=np.int64)))
+        self.age = np.concatenate((self.age, age))
+        self.weight = np.concatenate((self.weight, weight))
+        self.fitness = np.concatenate((self.fitness, self._fitness(age, weight)))
+
+    def keep(self, mask):
+        """Keeps only the animals where mask is True"""
+        for column in ('row', 'col', 'age', 'weight', 'fitness'):
+            setattr(self, column, getattr(self, column)[mask])
+
+    def _fitness(self, age, weight):
+        """The fitness of animals of this species"""
+        if self.fitness_kernel is None:
+            return self.species.fitness_values(age, weight)
+        return self.fitness_kernel(age, weight, _fitness_params(self.species))
+
+    def update_fitness(self):
+        """Finds the fitness of all the animals"""
+        self.fitness = self._fitness(self.age, self.weight)
+
+    def cell(self, length):
+        """The index of the cell of each animal in the flattened map"""
+        return self.row * length + self.col
+
+
+class _CellLoader:
+    """Gives new animals at one location to the populations of an ArrayIsland"""
+    def __init__(self, island, loc):
+        self.island = island
+        self.loc = loc
+
+    def pop_animals(self, pop):
+        """
+        Adds animals, given in any of the forms of :meth:`Landscape.pop_animals`
+
+        Raises
+        ------
+        ValueError
+        """
+        if not isinstance(pop, (dict, np.ndarray)):
+            if len(pop) == 0:
+                return
+            pop = {key: [animal[key] for animal in pop] for key in ('species', 'age', 'weight')}
+        herbi_ages, herbi_weights, carni_ages, carni_weights = split_species(
+            pop['species'], pop['age'], pop['weight'])
+        for population, ages, weights in ((self.island.herbivores, herbi_ages, herbi_weights),
+                                          (self.island.carnivores, carni_ages, carni_weights)):
+            if (weights <= 0).any():
+                raise ValueError('Weight of the animal must be strictly positive')
+            population.append(np.full(len(ages), self.loc[0] - 1),
+                              np.full(len(ages), self.loc[1] - 1), ages, weights)
+
+
+class ArrayIsland(Island):
+    """Island where the animals are kept in arrays, see :mod:`biosim.array_engine`"""
+    def __init__(self, island_map, ini_animals=None, instrument=None, compiled=True, regrowth=None,
+                 f_max=None, barriers=None):
+        """
+
+        Parameters
+        ----------
+        island_map: str
+            map of the island
+        ini_animals: list with dict
+            the Animals that start on the Island, in any of the forms of :meth:`Island.new_animals`
+        instrument: Instrumentation
+            if given, each phase of the year is measured, see :mod:`biosim.instrumentation`
+        compiled: bool
+            if False, the kernels are run as Python functions even if numba is installed
+        regrowth: callable
+            if given, how the fodder grows back each year, see :class:`biosim.island.Island`
+        f_max: array or str
+            if given, the most fodder of each cell, see :meth:`biosim.island.Island.set_f_max_map`
+        barriers: array or str
+            if given, the chance that an animal gets into each cell,
+            see :meth:`biosim.island.Island.set_barriers`
+
+        Raises
+        ------
+        ValueError
+        """
+        self._kernels = _Kernels(compiled)
+        self.herbivores = Population(Herbivore, self._kernels.fitness_all)
+        self.carnivores = Population(Carnivore, self._kernels.fitness_all)
+        super().__init__(island_map, ini_animals, instrument=instrument, regrowth=regrowth,
+                         f_max=f_max, barriers=barriers)
+        self.can_move = np.array([landscape.move for landscape in _LANDSCAPES],
+                                 dtype=float)[self.terrain]
+
+    def seed(self, seed):
+        """Seeds the random number generator of the kernels"""
+        self._kernels.seed_kernels(seed)
+
+    def draw_seed(self):
+        """
+        Draws a seed from the random number generator of the kernels
+
+        numba has one generator for each thread, so this is used to seed the kernels again
+        when the years are simulated in other threads
+
+        Returns
+        -------
+        int
+        """
+        return int(self._kernels.draw_seed())
+
+    def copy(self):
+        """
+        Returns
+        -------
+        A new ArrayIsland with the same landscape, year and copies of all the animals
+        """
+        twin = super().copy()
+        twin.herbivores = self.herbivores.copy()
+        twin.carnivores = self.carnivores.copy()
+        return twin
+
+    @property
+    def map(self):
+        """
+        The array engine has no cells, the animals of all cells are in the same arrays
+
+        Raises
+        ------
+        AttributeError
+        """
+        raise AttributeError('The array engine keeps the animals in arrays, not in cells')
+
+    cells = map
+
+    def _cell(self, loc):
+        """Gives the new animals at a location to the arrays, None if animals can not be there"""
+        if not _LANDSCAPES[self.terrain[loc[0] - 1, loc[1] - 1]].move:
+            return None
+        return _CellLoader(self, loc)
+
+    def to_cohorts(self, bin_width=1.):
+        """
+        The array engine can not group the animals into cohorts
+
+        Raises
+        ------
+        ValueError
+        """
+        raise ValueError('The array engine does not support cohorts')
+
+    def to_animals(self):
+        """The animals are always single animals in the array engine"""
+
+    def _cells_range(self, cells):
+        """The start and end in the sorted cells of each cell of the map"""
+        all_cells = np.arange(self.height * self.length)
+        return np.searchsorted(cells, all_cells), np.searchsorted(cells, all_cells, side='right')
+
+    def feeding_season(self):
+        """Feeds the herbivores in every cell"""
+        fodder = self.regrow().ravel()  # a view, so the fodder left is kept for next year
+        herbi = self.herbivores
+        cell = herbi.cell(self.length)
+        order = np.lexsort((-herbi.fitness, cell))
+        params = Herbivore.params
+        self._kernels.feed_herbivores(order, cell, herbi.age, herbi.weight, herbi.fitness, fodder,
+                                      float(params['F']), float(params['beta']),
+                                      _fitness_params(Herbivore))
+
+    def carnivore_feeding_season(self):
+        """Feeds the carnivores in every cell"""
+        herbi, carni = self.herbivores, self.carnivores
+        if len(herbi) == 0 or len(carni) == 0:
+            return
+        herbi_cell, carni_cell = herbi.cell(self.length), carni.cell(self.length)
+        herbi_order = np.lexsort((herbi.fitness, herbi_cell))
+        carni_order = np.lexsort((self._kernels.random_keys(len(carni)), carni_cell))
+        herbi_start, herbi_end = self._cells_range(herbi_cell[herbi_order])
+        carni_start, carni_end = self._cells_range(carni_cell[carni_order])
+        params = Carnivore.params
+        alive = self._kernels.feed_carnivores(herbi_order, herbi_start, herbi_end, herbi.weight,
+                                              herbi.fitness, carni_order, carni_start, carni_end,
+                                              carni.age, carni.weight, carni.fitness,
+                                              float(params['F']), float(params['beta']),
+                                              float(params['DeltaPhiMax']),
+                                              _fitness_params(Carnivore))
+        herbi.keep(alive)
+
+    def reproduction_season(self):
+        """Adds the new babies in every cell"""
+        for population in (self.herbivores, self.carnivores):
+            cell = population.cell(self.length)
+            params = np.array([population.species.params[key]
+                               for key in ('gamma', 'zeta', 'w_birth', 'sigma_birth', 'xi')])
+            counts = np.bincount(cell, minlength=self.height * self.length)
+            mothers, babies = self._kernels.reproduce(cell, population.age, population.weight,
+                                                      population.fitness, counts, params,
+                                                      _fitness_params(population.species))
+            population.append(population.row[mothers], population.col[mothers],
+                              np.zeros(len(babies), dtype=np.int64), babies)
+
+    def migrate_season(self):
+        """
+        Moves animals from one cell to another
+
+        Returns
+        -------
+        int, how many animals moved to another cell
+        """
+        entry = self.can_move if self._barriers is None else self.can_move * self._barriers
+        return sum(self._kernels.migrate(population.row, population.col, population.fitness,
+                                         float(population.species.params['mu']), entry, _STEPS)
+                   for population in (self.herbivores, self.carnivores))
+
+    def aging_season(self):
+        """Makes all the animals one year older"""
+        for population in (self.herbivores, self.carnivores):
+            population.age += 1
+            population.update_fitness()
+
+    def weight_loss_season(self):
+        """Makes all the animals lose the yearly weight"""
+        for population in (self.herbivores, self.carnivores):
+            population.weight -= population.weight * population.species.params['eta']
+            population.update_fitness()
+
+    def death_season(self):
+        """Removes the animals that die in every cell"""
+        for population in (self.herbivores, self.carnivores):
+            population.keep(self._kernels.survive(population.weight, population.fitness,
+                                                  float(population.species.params['omega'])))
+
+    def amount_of_herbivores(self):
+        """Count how many herbivores it is"""
+        return len(self.herbivores)
+
+    def amount_of_carnivores(self):
+        """Count how many carnivores it is"""
+        return len(self.carnivores)
+
+    def herbivore_counts(self):
+        """
+        Returns
+        -------
+        2-D array with how many herbivores there are in each cell
+        """
+        return np.bincount(self.herbivores.cell(self.length),
+                           minlength=self.height * self.length).reshape(self.height, self.length)
+
+    def carnivore_counts(self):
+        """
+        Returns
+        -------
+        2-D array with how many carnivores there are in each cell
+        """
+        return np.bincount(self.carnivores.cell(self.length),
+                           minlength=self.height * self.length).reshape(self.height, self.length)
+
+    def herbivore_ages(self):
+        """The age of all herbivores in a list"""
+        return self.herbivores.age.tolist()
+
+    def carnivore_ages(self):
+        """The age of all carnivores in a list"""
+        return self.carnivores.age.tolist()
+
+    def herbivore_weights(self):
+        """The weight of all herbivores in a list"""
+        return self.herbivores.weight.tolist()
+
+    def carnivore_weights(self):
+        """The weight of all carnivores in a list"""
+        return self.carnivores.weight.tolist()
+
+    def herbivore_fitness(self):
+        """The fitness of all herbivores in a list"""
+        return self.herbivores.fitness.tolist()
+
+    def carnivore_fitness(self):
+        """The fitness of all carnivores in a list"""
+        return self.carnivores.fitness.tolist()
@@ -0,0 +1,175 @@
+"""
+Benchmarks for the simulation, run without graphics.
+
+Run from the command line with::
+
+    python -m biosim.benchmark
+    python -m biosim.benchmark check_sim mono_hc --repeat 3 --json results.json
+    python -m biosim.benchmark --compare results.json
+
+Each scenario reports years per second and how much time each part of
+:meth:`biosim.island.Island.season` used, and the results can be saved as JSON
+to compare the speed before and after a change.
+"""
+
+import contextlib
+import datetime
+import platform
+import random
+import subprocess
+import time
+
+import numpy as np
+
+from .. import __version__
+from ..animal import Herbivore, Carnivore
+from .. import sampling
+from ..instrumentation import Instrumentation, MemorySink
+from ..island import Island
+from ..landscape import Lowland, Highland, Dessert
+from ..simulation import BioSim
+from .scenarios import SCENARIOS, DEFAULT_SCENARIOS
+
+_DEFAULT_SEED = 12345
+
+
+@contextlib.contextmanager
+def _parameters(animal_params=None, landscape_params=None):
+    """Sets the parameters of a scenario, and sets the old parameters back afterwards"""
+    saved_animals = {cls: dict(cls.params) for cls in (Herbivore, Carnivore)}
+    saved_f_max = {cls: cls.f_max for cls in (Lowland, Highland, Dessert)}
+    try:
+        for species, params in (animal_params or {}).items():
+            BioSim.set_animal_parameters(species, params)
+        for landscape, params in (landscape_params or {}).items():
+            BioSim.set_landscape_parameters(landscape, params)
+        yield
+    finally:
+        for cls, params in saved_animals.items():
+            cls.params.update(params)
+        for cls, f_max in saved_f_max.items():
+            cls.f_max = f_max
+
+
+def _make_island(spec, seed, instrument=None, bin_width=None, engine='object',
+                 sampling_mode='animal'):
+    """Seeds the random numbers and makes the island of a scenario with the given engine"""
+    random.seed(seed)
+    sampling.seed(seed)
+    if engine == 'array':
+        from ..array_engine import ArrayIsland     # imports numba, which is slow
+        island = ArrayIsland(spec['island_map'], spec['ini_pop'], instrument=instrument)
+        island.seed(seed)
+    else:
+        island = Island(spec['island_map'], spec['ini_pop'], instrument=instrument,
+                        bin_width=bin_width, sampling=sampling_mode)
+    return island
+
+
+def run_scenario(name, seed=_DEFAULT_SEED, years=None, bin_width=None, engine='object'):
+    """
+    Runs one scenario and measures the time of each part of the year
+
+    Parameters
+    ----------
+    name: str
+        name of the scenario, a key in SCENARIOS
+    seed: int
+        seed for the random number generator
+    years: int
+        how many years to simulate, the number of years of the scenario if not given
+    bin_width: float
+        if given, the animals are counted in cohorts with this weight bin width
+    engine: str
+        'object' or 'array', see :mod:`biosim.array_engine`
+
+    Returns
+    -------
+    dict with the time used, years per second, time for each phase, the number of births,
+    deaths and kills, and the final animal counts
+
+    Raises
+    ------
+    KeyError
+    """
+
+    if name not in SCENARIOS:
+        raise KeyError(f'Unknown scenario: {name}')
+    spec = SCENARIOS[name]()
+    years = spec['years'] if years is None else years
+    additions = spec.get('additions', {})
+
+    with _parameters(spec.get('animal_params'), spec.get('landscape_params')):
+        sink = MemorySink()
+        island = _make_island(spec, seed, Instrumentation(sink), bin_width=bin_width, engine=engine)
+
+        start = time.perf_counter()
+        for year in range(years):
+            if year in additions:
+                island.new_animals(additions[year])
+            island.season()
+        seconds = time.perf_counter() - start
+
+    return {'scenario': name,
+            'seed': seed,
+            'years': years,
+            'bin_width': bin_width,
+            'engine': engine,
+            'seconds': seconds,
+            'years_per_second': years / seconds if seconds > 0 else float('inf'),
+            'phases': {phase: sink.phase_totals().get(phase, 0.) for phase in island.PHASES},
+            'births': sum(sink.phase_totals('births').values()),
+            'deaths': sum(sink.phase_totals('deaths').values()),
+            'kills': sum(sink.phase_totals('kills').values()),
+            'herbivores': island.amount_of_herbivores(),
+            'carnivores': island.amount_of_carnivores()}
+
+
+def _git_commit():
+    """The commit of the source code, if it is in a git repository"""
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              check=True, cwd=__path__[0]).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(names=None, seed=_DEFAULT_SEED, years=None, repeat=1, bin_width=None,
+                   engine='object'):
+    """
+    Runs several scenarios, each of them repeat times
+
+    Parameters
+    ----------
+    names: list of str
+        the scenarios to run, DEFAULT_SCENARIOS if not given
+    seed: int
+        seed for the random number generator, the same for all repeats
+    years: int
+        how many years to simulate in each scenario, the years of each scenario if not given
+    repeat: int
+        how many times each scenario is run, the fastest run is kept
+    bin_width: float
+        if given, the animals are counted in cohorts with this weight bin width
+    engine: str
+        'object' or 'array', see :mod:`biosim.array_engine`
+
+    Returns
+    -------
+    dict with information on the machine and version, and the result of each scenario
+    """
+
+    results = {}
+    for name in names or DEFAULT_SCENARIOS:
+        runs = [run_scenario(name, seed=seed, years=years, bin_width=bin_width, engine=engine)
+                for _ in range(repeat)]
+        results[name] = min(runs, key=lambda run: run['seconds'])
+
+    return {'biosim_version': __version__,
+            'git_commit': _git_commit(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'date': datetime.datetime.now().isoformat(timespec='seconds'),
+            'repeat': repeat,
+            'results': results}
@@ -0,0 +1,78 @@
+"""Command line interface for the benchmarks, see :mod:`biosim.benchmark`"""
+
+import argparse
+import json
+import sys
+
+from . import run_benchmarks
+from .scenarios import SCENARIOS, DEFAULT_SCENARIOS
+
+
+def _print_report(report, baseline=None, file=sys.stdout):
+    """Prints a table with the results, and the speed-up from the baseline if given"""
+    phases = next(iter(report['results'].values()))['phases'] if report['results'] else {}
+    header = f"{'scenario':<22}{'years':>7}{'seconds':>10}{'years/s':>10}"
+    if baseline is not None:
+        header += f"{'speed-up':>10}"
+    header += ''.join(f"{phase.replace('_season', ''):>19}" for phase in phases)
+    print(header, file=file)
+
+    for name, result in report['results'].items():
+        line = (f"{name:<22}{result['years']:>7}{result['seconds']:>10.3f}"
+                f"{result['years_per_second']:>10.1f}")
+        if baseline is not None:
+            old = baseline['results'].get(name)
+            line += f"{old['seconds'] / result['seconds']:>10.2f}" if old else f"{'-':>10}"
+        line += ''.join(f"{100 * seconds / result['seconds']:>18.1f}%"
+                        for seconds in result['phases'].values())
+        print(line, file=file)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m biosim.benchmark',
+                                     description='Benchmarks for BioSim without graphics.')
+    parser.add_argument('scenarios', nargs='*', metavar='scenario',
+                        help=f"scenarios to run (default: {' '.join(DEFAULT_SCENARIOS)})")
+    parser.add_argument('--list', action='store_true', help='list the scenarios and exit')
+    parser.add_argument('--seed', type=int, default=12345, help='seed for the random numbers')
+    parser.add_argument('--years', type=int,
+                        help='years to simulate instead of the years of each scenario')
+    parser.add_argument('--repeat', type=int, default=1,
+                        help='runs of each scenario, the fastest is kept')
+    parser.add_argument('--bin-width', type=float,
+                        help='count the animals in cohorts with this weight bin width')
+    parser.add_argument('--engine', choices=('object', 'array'), default='object',
+                        help='the engine to run the scenarios with')
+    parser.add_argument('--json', metavar='FILE', help="save the results as JSON, '-' for stdout")
+    parser.add_argument('--compare', metavar='FILE', help='JSON results to compare with')
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for name, scenario in SCENARIOS.items():
+            print(f'{name:<22}{scenario.__doc__}')
+        return 0
+
+    unknown = [name for name in args.scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenario: {', '.join(unknown)}")
+
+    report = run_benchmarks(args.scenarios, seed=args.seed, years=args.years, repeat=args.repeat,
+                            bin_width=args.bin_width, engine=args.engine)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    if args.json == '-':
+        json.dump(report, sys.stdout, indent=2)
+    else:
+        _print_report(report, baseline)
+        if args.json:
+            with open(args.json, 'w') as f:
+                json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
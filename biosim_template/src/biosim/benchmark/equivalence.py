@@ -0,0 +1,377 @@
+"""
+Statistical equivalence of the engines.
+
+The faster engines (the array engine, the cohorts and the binomial sampling) do not draw
+the same random numbers as the animals in :class:`biosim.island.Island`, so they can not
+give the same animals year by year. Instead, a scenario is run many times with each of
+them, and the results are compared with statistical tests::
+
+    python -m biosim.benchmark.equivalence mono_ho mono_hc --candidate array --seeds 30
+
+For each seed the number of herbivores and carnivores is kept at some checkpoint years, and
+at the end of the run the mean, the 10th, 50th and 90th percentile of the age, weight and
+fitness of each species. Each of these values is one sample per seed, and the samples of the
+reference and the candidate are compared with Welch's t-test and the two-sample
+Kolmogorov-Smirnov test. The p-values are corrected with the Holm method, since many tests
+are done at once. The candidate is run with other seeds than the reference, so that the two
+samples are independent even when both use the same engine.
+
+A passed comparison means that no difference was found with the given number of seeds, not
+that there is none. More seeds find smaller differences.
+"""
+
+import argparse
+import json
+import math
+import sys
+
+import numpy as np
+
+from . import _DEFAULT_SEED, _make_island, _parameters
+from .scenarios import SCENARIOS
+
+# The alternatives to the object engine that can be compared with it
+CANDIDATES = {'array': {'engine': 'array'},
+              'cohorts': {'bin_width': 1.},
+              'binomial': {'sampling': 'binomial'}}
+
+# The options that can be given for the reference and the candidate
+OPTIONS = ('engine', 'bin_width', 'sampling', 'animal_params')
+
+SPECIES = ('Herbivore', 'Carnivore')
+
+# The values of each species compared at the end of a run, and the Island methods returning them
+_VARIABLES = {'age': 'ages', 'weight': 'weights', 'fitness': 'fitness'}
+_SUMMARIES = {'mean': np.mean,
+              'p10': lambda values: np.percentile(values, 10),
+              'p50': np.median,
+              'p90': lambda values: np.percentile(values, 90)}
+
+
+def _betacf(a, b, x):
+    """Continued fraction of the incomplete beta function, by the modified Lentz method"""
+    tiny = 1e-300
+    c = 1.
+    d = 1. - (a + b) * x / (a + 1.)
+    d = 1. / (d if abs(d) > tiny else tiny)
+    result = d
+    for m in range(1, 300):
+        for numerator in (m * (b - m) * x / ((a + 2 * m - 1) * (a + 2 * m)),
+                          -(a + m) * (a + b + m) * x / ((a + 2 * m) * (a + 2 * m + 1))):
+            d = 1. + numerator * d
+            d = 1. / (d if abs(d) > tiny else tiny)
+            c = 1. + numerator / c
+            c = c if abs(c) > tiny else tiny
+            result *= d * c
+        if abs(d * c - 1.) < 1e-14:
+            break
+    return result
+
+
+def _betainc(a, b, x):
+    """The regularized incomplete beta function I_x(a, b)"""
+    if x <= 0.:
+        return 0.
+    if x >= 1.:
+        return 1.
+    front = math.exp(math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b)
+                     + a * math.log(x) + b * math.log1p(-x))
+    # The continued fraction converges fast on this side of the mean
+    if x < (a + 1.) / (a + b + 2.):
+        return front * _betacf(a, b, x) / a
+    return 1. - front * _betacf(b, a, 1. - x) / b
+
+
+def _kolmogorov(lam):
+    """The probability that the Kolmogorov distribution is larger than lam"""
+    if lam < 0.2:
+        return 1.
+    total = sum(2 * (-1) ** (k - 1) * math.exp(-2 * k * k * lam * lam) for k in range(1, 101))
+    return min(max(total, 0.), 1.)
+
+
+def welch_ttest(a, b):
+    """
+    Welch's t-test for equal means, without assuming equal variances
+
+    Parameters
+    ----------
+    a, b: array_like
+        the two samples, with at least two values each
+
+    Returns
+    -------
+    t statistic and two-sided p-value
+
+    Raises
+    ------
+    ValueError
+    """
+    a, b = np.asarray(a, dtype=float), np.asarray(b, dtype=float)
+    if a.size < 2 or b.size < 2:
+        raise ValueError('Both samples must have at least two values')
+    var_a, var_b = a.var(ddof=1) / a.size, b.var(ddof=1) / b.size
+    difference = a.mean() - b.mean()
+    if var_a + var_b == 0:
+        # Both samples are constant
+        return (0., 1.) if difference == 0 else (math.copysign(math.inf, difference), 0.)
+
+    t = difference / math.sqrt(var_a + var_b)
+    df = (var_a + var_b) ** 2 / (var_a ** 2 / (a.size - 1) + var_b ** 2 / (b.size - 1))
+    return t, _betainc(df / 2, 0.5, df / (df + t * t))
+
+
+def ks_2samp(a, b):
+    """
+    Two-sample Kolmogorov-Smirnov test for equal distributions
+
+    The p-value is the asymptotic one, which is conservative when the samples have ties.
+
+    Parameters
+    ----------
+    a, b: array_like
+        the two samples, with at least one value each
+
+    Returns
+    -------
+    largest difference between the two empirical distributions, and the p-value
+
+    Raises
+    ------
+    ValueError
+    """
+    a, b = np.sort(np.asarray(a, dtype=float)), np.sort(np.asarray(b, dtype=float))
+    if a.size < 1 or b.size < 1:
+        raise ValueError('Both samples must have at least one value')
+    values = np.concatenate((a, b))
+    distance = np.max(np.abs(np.searchsorted(a, values, side='right') / a.size
+                             - np.searchsorted(b, values, side='right') / b.size))
+    effective = math.sqrt(a.size * b.size / (a.size + b.size))
+    return float(distance), _kolmogorov((effective + 0.12 + 0.11 / effective) * distance)
+
+
+def holm(p_values):
+    """
+    Corrects p-values for multiple tests with the Holm method
+
+    Parameters
+    ----------
+    p_values: array_like
+        the p-values of all the tests
+
+    Returns
+    -------
+    numpy array with the corrected p-values, in the same order
+    """
+    p_values = np.asarray(p_values, dtype=float)
+    order = np.argsort(p_values)
+    corrected = np.minimum(1., np.maximum.accumulate(p_values[order]
+                                                     * (p_values.size - np.arange(p_values.size))))
+    result = np.empty_like(p_values)
+    result[order] = corrected
+    return result
+
+
+def _checkpoints(years, num):
+    """num years evenly spread over the run, ending with the last year"""
+    return sorted({int(round(year)) for year in np.linspace(0, years, num + 1)[1:]})
+
+
+def run_sample(name, seeds, years=None, checkpoints=5, options=None):
+    """
+    Runs a scenario once for each seed and keeps the values that are compared
+
+    Parameters
+    ----------
+    name: str
+        name of the scenario, a key in SCENARIOS
+    seeds: list of int
+        the seeds, one run for each
+    years: int
+        how many years to simulate, the number of years of the scenario if not given
+    checkpoints: int
+        at how many years the number of animals is kept
+    options: dict
+        how to run the scenario, with any of the keys in OPTIONS. 'animal_params' is a dict
+        with parameters for each species, used on top of the parameters of the scenario
+
+    Returns
+    -------
+    dict with the checkpoint years, and for each value a numpy array with one entry for each
+    seed. The values at the end are nan for the seeds where the species died out
+
+    Raises
+    ------
+    KeyError
+    """
+    if name not in SCENARIOS:
+        raise KeyError(f'Unknown scenario: {name}')
+    options = dict(options or {})
+    unknown = set(options) - set(OPTIONS)
+    if unknown:
+        raise KeyError(f"Unknown options: {', '.join(sorted(unknown))}")
+
+    spec = SCENARIOS[name]()
+    years = spec['years'] if years is None else years
+    additions = spec.get('additions', {})
+    animal_params = {species: dict(params)
+                     for species, params in spec.get('animal_params', {}).items()}
+    for species, params in options.pop('animal_params', {}).items():
+        animal_params.setdefault(species, {}).update(params)
+
+    years_kept = _checkpoints(years, checkpoints)
+    sample = {'checkpoints': years_kept}
+    values = {}
+    with _parameters(animal_params, spec.get('landscape_params')):
+        for seed in seeds:
+            island = _make_island(spec, seed, bin_width=options.get('bin_width'),
+                                  engine=options.get('engine', 'object'),
+                                  sampling_mode=options.get('sampling', 'animal'))
+            for year in range(years):
+                if year in additions:
+                    island.new_animals(additions[year])
+                island.season()
+                if year + 1 in years_kept:
+                    values.setdefault(f'Herbivore count year {year + 1}', []).append(
+                        island.amount_of_herbivores())
+                    values.setdefault(f'Carnivore count year {year + 1}', []).append(
+                        island.amount_of_carnivores())
+
+            for species, prefix in zip(SPECIES, ('herbivore', 'carnivore')):
+                for variable, method in _VARIABLES.items():
+                    animals = np.asarray(getattr(island, f'{prefix}_{method}')(), dtype=float)
+                    for summary, function in _SUMMARIES.items():
+                        values.setdefault(f'{species} {variable} {summary}', []).append(
+                            function(animals) if animals.size else np.nan)
+
+    sample.update({key: np.array(value, dtype=float) for key, value in values.items()})
+    return sample
+
+
+def compare_engines(name, candidate, reference=None, seeds=30, seed=_DEFAULT_SEED, years=None,
+                    checkpoints=5, alpha=0.01):
+    """
+    Compares the results of a candidate engine with a reference over many seeds
+
+    Parameters
+    ----------
+    name: str
+        name of the scenario, a key in SCENARIOS
+    candidate: dict or str
+        options of the candidate, see run_sample, or a key in CANDIDATES
+    reference: dict or str
+        options of the reference, the object engine if not given
+    seeds: int
+        how many runs of each engine. The reference uses the seeds from seed, and the
+        candidate the following seeds
+    seed: int
+        the first seed
+    years: int
+        how many years to simulate, the number of years of the scenario if not given
+    checkpoints: int
+        at how many years the number of animals is compared
+    alpha: float
+        significance level of the tests, after the Holm correction
+
+    Returns
+    -------
+    dict with the scenario and the settings, a list with the result of each test, and
+    'passed' which is False if any test found a difference
+
+    Raises
+    ------
+    KeyError, ValueError
+    """
+    if seeds < 2:
+        raise ValueError('At least two seeds are needed')
+    candidate = CANDIDATES[candidate] if isinstance(candidate, str) else candidate
+    reference = CANDIDATES[reference] if isinstance(reference, str) else reference or {}
+
+    samples = [run_sample(name, range(first, first + seeds), years=years,
+                          checkpoints=checkpoints, options=options)
+               for first, options in ((seed, reference), (seed + seeds, candidate))]
+
+    tests = []
+    for quantity in samples[0]:
+        if quantity == 'checkpoints':
+            continue
+        ref, cand = (sample[quantity] for sample in samples)
+        # Runs where the species died out have no values at the end
+        ref, cand = ref[~np.isnan(ref)], cand[~np.isnan(cand)]
+        if ref.size < 2 or cand.size < 2:
+            continue
+        for test, function in (('welch', welch_ttest), ('ks', ks_2samp)):
+            statistic, p_value = function(ref, cand)
+            tests.append({'quantity': quantity,
+                          'test': test,
+                          'statistic': float(statistic),
+                          'p_value': float(p_value),
+                          'reference_mean': float(ref.mean()),
+                          'candidate_mean': float(cand.mean())})
+
+    for test, corrected in zip(tests, holm([test['p_value'] for test in tests])):
+        test['p_holm'] = float(corrected)
+        test['passed'] = bool(corrected >= alpha)
+
+    return {'scenario': name,
+            'years': years if years is not None else SCENARIOS[name]()['years'],
+            'seeds': seeds,
+            'reference': reference,
+            'candidate': candidate,
+            'alpha': alpha,
+            'checkpoints': samples[0]['checkpoints'],
+            'passed': all(test['passed'] for test in tests),
+            'tests': tests}
+
+
+def _print_comparison(result, file=sys.stdout):
+    """Prints the tests of one comparison, with the failed tests marked"""
+    status = 'passed' if result['passed'] else 'FAILED'
+    print(f"{result['scenario']}: {status} ({len(result['tests'])} tests, "
+          f"{result['seeds']} seeds, {result['years']} years)", file=file)
+    print(f"  {'quantity':<28}{'test':>6}{'reference':>12}{'candidate':>12}{'p':>10}{'p Holm':>10}",
+          file=file)
+    for test in result['tests']:
+        mark = '' if test['passed'] else '  <--'
+        print(f"  {test['quantity']:<28}{test['test']:>6}{test['reference_mean']:>12.3f}"
+              f"{test['candidate_mean']:>12.3f}{test['p_value']:>10.4f}"
+              f"{test['p_holm']:>10.4f}{mark}", file=file)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m biosim.benchmark.equivalence',
+                                     description='Compares the engines of BioSim over many seeds.')
+    parser.add_argument('scenarios', nargs='*', metavar='scenario', default=['mono_ho', 'mono_hc'],
+                        help='scenarios to compare (default: mono_ho mono_hc)')
+    parser.add_argument('--candidate', choices=sorted(CANDIDATES), default='array',
+                        help='the engine compared with the object engine')
+    parser.add_argument('--seeds', type=int, default=30, help='runs of each engine')
+    parser.add_argument('--seed', type=int, default=_DEFAULT_SEED, help='the first seed')
+    parser.add_argument('--years', type=int,
+                        help='years to simulate instead of the years of each scenario')
+    parser.add_argument('--alpha', type=float, default=0.01,
+                        help='significance level after the Holm correction')
+    parser.add_argument('--json', metavar='FILE', help="save the results as JSON, '-' for stdout")
+    args = parser.parse_args(argv)
+
+    unknown = [name for name in args.scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenario: {', '.join(unknown)}")
+
+    results = [compare_engines(name, args.candidate, seeds=args.seeds, seed=args.seed,
+                               years=args.years, alpha=args.alpha)
+               for name in args.scenarios]
+
+    if args.json == '-':
+        json.dump(results, sys.stdout, indent=2)
+    else:
+        for result in results:
+            _print_comparison(result)
+        if args.json:
+            with open(args.json, 'w') as f:
+                json.dump(results, f, indent=2)
+    return 0 if all(result['passed'] for result in results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,129 @@
+"""
+Scenarios for the benchmarks.
+
+Each scenario is a function returning a dict with the island map, the initial population,
+how many years to simulate, animals added in later years and the parameters to use.
+The first scenarios are headless versions of the reference examples, the rest are
+synthetic scenarios to see how the simulation scales.
+"""
+
+import functools
+import textwrap
+
+
+def _population(loc, species, num, age=5, weight=20):
+    """One location with num equal animals, in the format used by Island.new_animals"""
+    return [{'loc': loc,
+             'pop': [{'species': species,
+                      'age': age,
+                      'weight': weight}
+                     for _ in range(num)]}]
+
+
+def _lowland_map(size):
+    """Square map with only lowland inside the boundary of water"""
+    return '\n'.join(['W' * size] + ['W' + 'L' * (size - 2) + 'W'] * (size - 2) + ['W' * size])
+
+
+def check_sim():
+    """reference_examples/check_sim.py: 100 years of herbivores, then 100 years with carnivores"""
+    geogr = """\
+               WWWWWWWWWWWWWWWWWWWWW
+               WWWWWWWWHWWWWLLLLLLLW
+               WHHHHHLLLLWWLLLLLLLWW
+               WHHHHHHHHHWWLLLLLLWWW
+               WHHHHHLLLLLLLLLLLLWWW
+               WHHHHHLLLDDLLLHLLLWWW
+               WHHLLLLLDDDLLLHHHHWWW
+               WWHHHHLLLDDLLLHWWWWWW
+               WHHHLLLLLDDLLLLLLLWWW
+               WHHHHLLLLDDLLLLWWWWWW
+               WWHHHHLLLLLLLLWWWWWWW
+               WWWHHHHLLLLLLLWWWWWWW
+               WWWWWWWWWWWWWWWWWWWWW"""
+    return {'island_map': textwrap.dedent(geogr),
+            'ini_pop': _population((10, 10), 'Herbivore', 150),
+            'years': 200,
+            'additions': {100: _population((10, 10), 'Carnivore', 40)},
+            'animal_params': {'Herbivore': {'zeta': 3.2, 'xi': 1.8},
+                              'Carnivore': {'a_half': 70, 'phi_age': 0.5, 'omega': 0.3, 'F': 65,
+                                            'DeltaPhiMax': 9.}},
+            'landscape_params': {'L': {'f_max': 700}}}
+
+
+def mono_ho():
+    """reference_examples/mono_ho.py: herbivores on a single lowland cell"""
+    return {'island_map': 'WWW\nWLW\nWWW',
+            'ini_pop': _population((2, 2), 'Herbivore', 50),
+            'years': 301}
+
+
+def mono_hc():
+    """reference_examples/mono_hc.py: a single lowland cell, carnivores come after 50 years"""
+    return {'island_map': 'WWW\nWLW\nWWW',
+            'ini_pop': _population((2, 2), 'Herbivore', 50),
+            'years': 301,
+            'additions': {50: _population((2, 2), 'Carnivore', 20)}}
+
+
+def check_migration():
+    """reference_examples/check_migration.py: animals that always migrate and never eat"""
+    return {'island_map': _lowland_map(21),
+            'ini_pop': (_population((10, 10), 'Herbivore', 400) +
+                        _population((10, 10), 'Carnivore', 150, weight=1000)),
+            'years': 10,
+            'animal_params': {'Herbivore': {'mu': 100},
+                              'Carnivore': {'mu': 100, 'F': 0}},
+            'landscape_params': {'L': {'f_max': 700}}}
+
+
+def map_size(size, years=20):
+    """Lowland map of size x size with small groups of animals every fifth cell"""
+    ini_pop = []
+    for row in range(2, size, 5):
+        for col in range(2, size, 5):
+            ini_pop += _population((row, col), 'Herbivore', 10) + \
+                _population((row, col), 'Carnivore', 2)
+    return {'island_map': _lowland_map(size),
+            'ini_pop': ini_pop,
+            'years': years}
+
+
+def population(num, years=50):
+    """Herbivores in the middle of a 11 x 11 lowland map"""
+    return {'island_map': _lowland_map(11),
+            'ini_pop': _population((6, 6), 'Herbivore', num),
+            'years': years}
+
+
+def predator_ratio(ratio, num=1000, years=50):
+    """Herbivores with ratio carnivores per herbivore in the middle of a 9 x 9 lowland map"""
+    return {'island_map': _lowland_map(9),
+            'ini_pop': (_population((5, 5), 'Herbivore', num) +
+                        _population((5, 5), 'Carnivore', int(ratio * num))),
+            'years': years}
+
+
+def _variant(scenario, value):
+    """The scenario with its first argument set to value"""
+    variant = functools.partial(scenario, value)
+    variant.__doc__ = f'{scenario.__doc__} ({value})'
+    return variant
+
+
+SCENARIOS = {'check_sim': check_sim,
+             'mono_ho': mono_ho,
+             'mono_hc': mono_hc,
+             'check_migration': check_migration,
+             'map_size_20': _variant(map_size, 20),
+             'map_size_50': _variant(map_size, 50),
+             'map_size_100': _variant(map_size, 100),
+             'population_1000': _variant(population, 1000),
+             'population_10000': _variant(population, 10000),
+             'predator_ratio_0.05': _variant(predator_ratio, 0.05),
+             'predator_ratio_0.2': _variant(predator_ratio, 0.2),
+             'predator_ratio_0.5': _variant(predator_ratio, 0.5)}
+
+# The scenarios that are run if no scenarios are chosen
+DEFAULT_SCENARIOS = ('check_sim', 'mono_ho', 'mono_hc', 'check_migration',
+                     'map_size_20', 'map_size_50', 'population_1000', 'predator_ratio_0.2')
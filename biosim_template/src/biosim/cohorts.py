@@ -0,0 +1,525 @@
+"""
+Animals counted in cohorts instead of one object for each animal.
+
+A cohort is a group of animals of one species in one cell with the same age and a weight
+in the same weight bin. Each cohort keeps its number of animals and their mean weight, and
+the yearly events are drawn for the whole cohort at once: how many of the animals give
+birth, die or move is drawn from binomial and multinomial distributions with the same
+probabilities as for a single animal. The work of each phase is then proportional to the
+number of cohorts rather than the number of animals.
+
+The weights inside a bin are replaced by their mean, so the model is an approximation of
+the model with single animals. The narrower the bins, the closer it is.
+"""
+
+import numpy as np
+
+from .animal import Herbivore, Carnivore
+from .landscape import split_species
+from .sampling import rng
+
+# Number of directions an animal can move in
+_DIRECTIONS = 4
+
+
+class Cohorts:
+    """The cohorts of one species in one cell"""
+    def __init__(self, species, bin_width, ages=(), weights=(), counts=(), merge=True):
+        """
+
+        Parameters
+        ----------
+        species: class
+            Herbivore or Carnivore, gives the parameters and the fitness
+        bin_width: float
+            width of the weight bins
+        ages: array
+            the age of each cohort
+        weights: array
+            the mean weight of each cohort
+        counts: array
+            the number of animals in each cohort
+        merge: bool
+            False if the cohorts already have different ages or weight bins
+        """
+        self.species = species
+        self.bin_width = bin_width
+        self.ages = np.asarray(ages, dtype=np.int64)
+        self.weights = np.asarray(weights, dtype=float)
+        self.counts = np.asarray(counts, dtype=np.int64)
+        if merge:
+            self._merge()
+        else:
+            self._drop_empty()
+
+    @classmethod
+    def from_animals(cls, species, animals, bin_width):
+        """
+        Groups animals into cohorts
+
+        Parameters
+        ----------
+        species: class
+            Herbivore or Carnivore
+        animals: list
+            the animals, all of the given species
+        bin_width: float
+            width of the weight bins
+
+        Returns
+        -------
+        Cohorts with the animals
+        """
+        return cls(species, bin_width, [animal.age for animal in animals],
+                   [animal.weight for animal in animals], np.ones(len(animals), dtype=np.int64))
+
+    def to_animals(self):
+        """
+        Returns
+        -------
+        List with one animal for each animal in the cohorts, with the mean weight of its cohort
+        """
+        return self.species.from_arrays(np.repeat(self.ages, self.counts),
+                                        np.repeat(self.weights, self.counts))
+
+    def copy(self):
+        """
+        Returns
+        -------
+        Independent copy of the cohorts
+        """
+        return Cohorts(self.species, self.bin_width, self.ages.copy(), self.weights.copy(),
+                       self.counts.copy(), merge=False)
+
+    def _drop_empty(self):
+        """Removes the cohorts without animals"""
+        if not self.counts.all():
+            keep = self.counts > 0
+            self.ages, self.weights = self.ages[keep], self.weights[keep]
+            self.counts = self.counts[keep]
+
+    def _merge(self):
+        """Removes empty cohorts and joins the cohorts with the same age and weight bin"""
+        keep = self.counts > 0
+        ages, weights, counts = self.ages[keep], self.weights[keep], self.counts[keep]
+        bins = np.floor(weights / self.bin_width).astype(np.int64)
+        keys, inverse = np.unique((ages << 32) | bins, return_inverse=True)
+        self.counts = np.bincount(inverse, weights=counts).astype(np.int64)
+        self.weights = np.bincount(inverse, weights=weights * counts) / self.counts
+        self.ages = keys >> 32
+
+    def add(self, ages, weights, counts):
+        """
+        Adds animals to the cohorts
+
+        Parameters
+        ----------
+        ages, weights, counts: array
+            the age, mean weight and number of animals of each new group
+        """
+        if len(counts) == 0:
+            self._drop_empty()
+            return
+        self.ages = np.concatenate((self.ages, np.asarray(ages, dtype=np.int64)))
+        self.weights = np.concatenate((self.weights, np.asarray(weights, dtype=float)))
+        self.counts = np.concatenate((self.counts, np.asarray(counts, dtype=np.int64)))
+        self._merge()
+
+    def extend(self, *others):
+        """Adds all the animals of other cohorts of the same species"""
+        others = [other for other in others if len(other.counts)]
+        if others:
+            self.add(np.concatenate([other.ages for other in others]),
+                     np.concatenate([other.weights for other in others]),
+                     np.concatenate([other.counts for other in others]))
+
+    @property
+    def fitness(self):
+        """The fitness of each cohort"""
+        return self.species.fitness_values(self.ages, self.weights)
+
+    def total(self):
+        """The number of animals in all the cohorts"""
+        return int(self.counts.sum()) if len(self.counts) else 0
+
+    def aging(self):
+        """Makes all the animals one year older"""
+        self.ages = self.ages + 1
+
+    def lose_weight(self):
+        """Reduces the weight of all the animals"""
+        self.weights = self.weights - self.weights * self.species.params['eta']
+
+    def deaths(self):
+        """Removes the animals that die"""
+        if len(self.counts) == 0:
+            return
+        probability = np.where(self.weights <= 0, 1.,
+                               self.species.params['omega'] * (1 - self.fitness))
+        self.counts = self.counts - rng().binomial(self.counts, np.clip(probability, 0, 1))
+        self._drop_empty()
+
+    def births(self):
+        """Draws the births of the cohorts, adds the newborns and makes the mothers lighter"""
+        params = self.species.params
+        total = self.total()
+        if total < 2:
+            return      # an animal alone can not give birth
+        probability = np.minimum(1, params['gamma'] * self.fitness * (total - 1))
+        probability[self.weights < params['zeta'] * (params['w_birth'] + params['sigma_birth'])] = 0
+        mothers = rng().binomial(self.counts, np.clip(probability, 0, 1))
+
+        # One baby for each mother, which is only born if it weighs less than its mother
+        cohort = np.repeat(np.arange(len(self.counts)), mothers)
+        babies = rng().normal(params['w_birth'], params['sigma_birth'], size=len(cohort))
+        born = (babies > 0) & (babies <= self.weights[cohort])
+        cohort, babies = cohort[born], babies[born]
+
+        # The mothers get a weight of their own and are moved to the bin of that weight
+        self.counts = self.counts - np.bincount(cohort, minlength=len(self.counts))
+        self.add(np.concatenate((self.ages[cohort], np.zeros(len(babies), dtype=np.int64))),
+                 np.concatenate((self.weights[cohort] - params['xi'] * babies, babies)),
+                 np.ones(2 * len(babies), dtype=np.int64))
+
+    def emigrants(self):
+        """
+        Draws which animals leave the cell and in which direction
+
+        Returns
+        -------
+        list with one Cohorts for each direction, None for the directions no animals move in
+        """
+        if len(self.counts) == 0:
+            return [None] * _DIRECTIONS
+        probability = np.clip(self.species.params['mu'] * self.fitness, 0, 1)
+        moving = rng().binomial(self.counts, probability)
+        if not moving.any():
+            return [None] * _DIRECTIONS
+        self.counts = self.counts - moving
+        directions = rng().multinomial(moving, [1 / _DIRECTIONS] * _DIRECTIONS)
+        groups = [Cohorts(self.species, self.bin_width, self.ages, self.weights, directions[:, i],
+                          merge=False) if directions[:, i].any() else None
+                  for i in range(_DIRECTIONS)]
+        self._drop_empty()
+        return groups
+
+    def split(self, chance):
+        """
+        Draws which animals get through, each of them with the same chance
+
+        Parameters
+        ----------
+        chance: float
+            the chance of each animal
+
+        Returns
+        -------
+        Two Cohorts, with the animals that get through and the rest, None if there are none
+        """
+        passed = rng().binomial(self.counts, min(max(chance, 0), 1))
+        stopped = self.counts - passed
+        return tuple(Cohorts(self.species, self.bin_width, self.ages, self.weights, counts,
+                             merge=False) if counts.any() else None
+                     for counts in (passed, stopped))
+
+    def ages_list(self):
+        """The age of every animal"""
+        return np.repeat(self.ages, self.counts).tolist()
+
+    def weights_list(self):
+        """The weight of every animal"""
+        return np.repeat(self.weights, self.counts).tolist()
+
+    def fitness_list(self):
+        """The fitness of every animal"""
+        return np.repeat(self.fitness, self.counts).tolist()
+
+
+class CohortCell:
+    """A cell of the island where the animals are counted in cohorts"""
+    def __init__(self, landscape, herbivores, carnivores, fodder=None):
+        """
+
+        Parameters
+        ----------
+        landscape: class
+            the Landscape class of the cell, gives f_max and the animal classes
+        herbivores: Cohorts
+            the herbivores in the cell
+        carnivores: Cohorts
+            the carnivores in the cell
+        fodder: float
+            how much food there is, f_max if not given
+        """
+        self.landscape = landscape
+        self.herbivores = herbivores
+        self.carnivores = carnivores
+        self.immigrating_herbivores = []    # Lists of Cohorts immigrating
+        self.immigrating_carnivores = []
+        self.fodder = landscape.f_max if fodder is None else fodder
+
+    @classmethod
+    def from_cell(cls, cell, bin_width):
+        """
+        Groups the animals in a cell into cohorts
+
+        Parameters
+        ----------
+        cell: Landscape
+            cell with single animals
+        bin_width: float
+            width of the weight bins
+
+        Returns
+        -------
+        CohortCell with the same animals and fodder
+        """
+        return cls(type(cell), Cohorts.from_animals(Herbivore, cell.herbivores, bin_width),
+                   Cohorts.from_animals(Carnivore, cell.carnivores, bin_width), cell.fodder)
+
+    def to_cell(self):
+        """
+        Returns
+        -------
+        Landscape cell with one animal object for each animal
+        """
+        cell = self.landscape(self.herbivores.to_animals(), self.carnivores.to_animals())
+        cell.fodder = self.fodder
+        return cell
+
+    def copy(self):
+        """
+        Returns
+        -------
+        Independent copy of the cell
+        """
+        return CohortCell(self.landscape, self.herbivores.copy(), self.carnivores.copy(),
+                          self.fodder)
+
+    def pop_animals(self, pop):
+        """
+        Adds animals to the cell, given in any of the forms of :meth:`Landscape.pop_animals`
+
+        The animals are put straight into cohorts, so a block of animals with the same age
+        and weight becomes a single cohort.
+
+        Raises
+        ------
+        ValueError
+        """
+        if not isinstance(pop, (dict, np.ndarray)):
+            if len(pop) == 0:
+                return
+            pop = {key: [animal[key] for animal in pop] for key in ('species', 'age', 'weight')}
+        self.pop_columns(pop['species'], pop['age'], pop['weight'])
+
+    def pop_columns(self, species, ages, weights):
+        """
+        Adds many animals to the cell at once, see :meth:`Landscape.pop_columns`
+
+        Raises
+        ------
+        ValueError
+        """
+        herbi_ages, herbi_weights, carni_ages, carni_weights = split_species(species, ages, weights)
+        for cohorts, group_ages, group_weights in ((self.herbivores, herbi_ages, herbi_weights),
+                                                   (self.carnivores, carni_ages, carni_weights)):
+            if (group_weights <= 0).any():
+                raise ValueError('Weight of the animal must be strictly positive')
+            cohorts.add(group_ages, group_weights, np.ones(len(group_ages), dtype=np.int64))
+
+    def num_herbivores(self):
+        """Finds the number of herbivores"""
+        return self.herbivores.total()
+
+    def num_carnivores(self):
+        """Finds the number of carnivores"""
+        return self.carnivores.total()
+
+    def feeding(self, fodder=None):
+        """
+        Feeds the herbivores, the fittest cohorts first
+
+        Parameters
+        ----------
+        fodder: float
+            how much fodder there is, f_max if not given
+        """
+        herbi = self.herbivores
+        fodder = self.landscape.f_max if fodder is None else fodder
+        if len(herbi.counts) == 0:
+            self.fodder = fodder
+            return
+        appetite, beta = herbi.species.params['F'], herbi.species.params['beta']
+        order = np.argsort(-herbi.fitness, kind='stable')
+        counts = herbi.counts[order]
+
+        # The first animals get a whole portion each, and the next one what is left
+        portions = min(int(fodder // appetite), herbi.total())
+        fed = np.clip(portions - (np.cumsum(counts) - counts), 0, counts)
+        rest = fodder - portions * appetite if portions < herbi.total() else 0
+        rest_fed = np.zeros_like(counts)
+        if rest > 0:
+            rest_fed[np.searchsorted(np.cumsum(counts), portions, side='right')] = 1
+        self.fodder = fodder - portions * appetite - rest
+
+        ages, weights = herbi.ages[order], herbi.weights[order]
+        herbi.counts[order] = counts - fed - rest_fed
+        herbi.add(np.concatenate((ages, ages)),
+                  np.concatenate((weights + beta * appetite, weights + beta * rest)),
+                  np.concatenate((fed, rest_fed)))
+
+    def carnivore_feeding(self):
+        """
+        Feeds the carnivores one by one in random order
+
+        Each carnivore tries the herbivore cohorts from the least fit, and the number of
+        herbivores it catches in a cohort is drawn from a binomial distribution, but never
+        more than it can eat.
+        """
+        herbi, carni = self.herbivores, self.carnivores
+        if herbi.total() == 0 or carni.total() == 0:
+            return
+        params = carni.species.params
+        order = np.argsort(herbi.fitness, kind='stable')
+        herbi_fitness = herbi.fitness[order]
+        herbi_weights = herbi.weights[order]
+        herbi_counts = herbi.counts[order]
+
+        # The carnivores eat one by one in random order
+        shuffle = rng().permutation(carni.total())
+        ages = np.repeat(carni.ages, carni.counts)[shuffle]
+        weights = np.repeat(carni.weights, carni.counts)[shuffle]
+
+        for c in range(len(ages)):
+            hunger = params['F']
+            fitness = float(carni.species.fitness_values(ages[c], weights[c]))
+            for h in range(len(herbi_counts)):
+                probability = (fitness - herbi_fitness[h]) / params['DeltaPhiMax']
+                if herbi_counts[h] == 0 or probability <= 0:
+                    continue
+                needed = int(np.ceil(hunger / herbi_weights[h]))
+                caught = min(rng().binomial(herbi_counts[h], min(probability, 1.)), needed)
+                if caught == 0:
+                    continue
+                eaten = min(caught * herbi_weights[h], hunger)
+                herbi_counts[h] -= caught
+                hunger -= eaten
+                weights[c] += params['beta'] * eaten
+                fitness = float(carni.species.fitness_values(ages[c], weights[c]))
+                if hunger <= 0:
+                    break
+
+        herbi.counts = herbi_counts[np.argsort(order)]
+        herbi._drop_empty()
+        self.carnivores = Cohorts(carni.species, carni.bin_width, ages, weights,
+                                  np.ones(len(ages), dtype=np.int64))
+
+    def reproduction(self):
+        """Adds the newborn animals of each species"""
+        self.herbivores.births()
+        self.carnivores.births()
+
+    def aging_animals(self):
+        """Makes all the animals one year older"""
+        self.herbivores.aging()
+        self.carnivores.aging()
+
+    def weight_loss(self):
+        """Makes all the animals loss the yearly weight"""
+        self.herbivores.lose_weight()
+        self.carnivores.lose_weight()
+
+    def pop_reduction(self):
+        """Removes all animals that dies"""
+        self.herbivores.deaths()
+        self.carnivores.deaths()
+
+    def emigrate(self, neighbours, cell_at, entry=None):
+        """
+        Moves the cohorts of animals that migrate to the immigration lists of the neighbour cells
+
+        Parameters
+        ----------
+        neighbours: list
+            the four locations the animals can move to
+        cell_at: callable
+            gives the cell at a location, or None if animals can not move there
+        entry: callable
+            gives the chance that an animal gets into the cell at a location, see
+            :func:`biosim.landscape.passes_barrier`
+
+        Returns
+        -------
+        int, how many animals moved to another cell
+        """
+        migrants = 0
+        herbivores, carnivores = self.migration()   # the cohorts moving in each direction
+        for loc, herbi, carni in zip(neighbours, herbivores, carnivores):
+            if herbi is None and carni is None:
+                continue
+            if (new_cell := cell_at(loc)) is None:
+                new_cell = self     # can not move into water, so they stay
+            else:
+                if entry is not None and (chance := entry(loc)) < 1:
+                    # The animals stopped by the barrier stay
+                    (herbi, herbi_stopped), (carni, carni_stopped) = (
+                        group.split(chance) if group is not None else (None, None)
+                        for group in (herbi, carni))
+                    self._add_immigrants(herbi_stopped, carni_stopped)
+                migrants += sum(group.total() for group in (herbi, carni) if group is not None)
+            new_cell._add_immigrants(herbi, carni)
+        return migrants
+
+    def _add_immigrants(self, herbivores, carnivores):
+        """Adds Cohorts to the immigration lists, None is skipped"""
+        if herbivores is not None:
+            self.immigrating_herbivores.append(herbivores)
+        if carnivores is not None:
+            self.immigrating_carnivores.append(carnivores)
+
+    # The cohorts are always drawn binomially
+    pop_reduction_binomial = pop_reduction
+    emigrate_binomial = emigrate
+
+    def migration(self):
+        """
+        Draws the animals that leave the cell
+
+        Returns
+        -------
+        Two lists, with the Cohorts of herbivores and of carnivores moving in each of the
+        four directions, or None where no animals move
+        """
+        return self.herbivores.emigrants(), self.carnivores.emigrants()
+
+    def immigration(self):
+        """Adds the animals that have moved to the cell"""
+        self.herbivores.extend(*self.immigrating_herbivores)
+        self.carnivores.extend(*self.immigrating_carnivores)
+        self.immigrating_herbivores = []
+        self.immigrating_carnivores = []
+
+    def list_herbivores_ages(self):
+        """Retrieving the age of herbivores and put it in a list"""
+        return self.herbivores.ages_list()
+
+    def list_carnivores_ages(self):
+        """Retrieving the age of carnivores and put it in a list"""
+        return self.carnivores.ages_list()
+
+    def list_herbivores_weight(self):
+        """Retrieving the weight of herbivores and put it in a list"""
+        return self.herbivores.weights_list()
+
+    def list_carnivores_weight(self):
+        """Retrieving the weight of carnivores and put it in a list"""
+        return self.carnivores.weights_list()
+
+    def list_herbivores_fitness(self):
+        """Retrieving the fitness of herbivores and put it in a list"""
+        return self.herbivores.fitness_list()
+
+    def list_carnivores_fitness(self):
+        """Retrieving the fitness of carnivores and put it in a list"""
+        return self.carnivores.fitness_list()
@@ -0,0 +1,115 @@
+"""
+Counters for the work done by the simulation.
+
+The counters count how many times the fitness is computed, how many calls are made to the
+random number generators, how many times the animals in a cell are sorted and how many animals
+and cells are made. They are used through :class:`biosim.simulation.BioSim` with ``counters=True``::
+
+    sim = BioSim(geogr, ini_pop, seed=1, vis_years=0, counters=True)
+    sim.simulate(50)
+    sim.stats()['fitness_updates']
+
+The simulation calls :func:`count` where the events happen, which returns at once when no
+counters are enabled. The code run for every animal checks num_enabled first, to not even make
+the call, and the loop that draws a random number for each herbivore a carnivore tries counts
+the draws together after the loop. Each event is counted by the
+counters enabled in the thread where it happens, so simulations running in different threads,
+e.g. with :meth:`biosim.simulation.BioSim.aiter_years`, each count their own work. The kernels
+of the array engine are not counted, so the counters can only be used with the object engine.
+"""
+
+import threading
+
+# The names of the counters
+EVENTS = ('fitness_updates', 'rng_draws', 'sorts', 'allocations')
+
+# How many counters are enabled, in all threads, nothing has to be counted when it is 0
+_lock = threading.Lock()
+num_enabled = 0
+
+# The counters enabled in each thread, the last one counts
+_local = threading.local()
+
+
+def count(event, number=1):
+    """
+    Adds to the counter of the counters enabled in this thread, if any
+
+    Parameters
+    ----------
+    event: str
+        the counter, from EVENTS
+    number: int
+        how many events
+    """
+    if num_enabled:
+        enabled = getattr(_local, 'enabled', None)
+        if enabled:
+            enabled[-1].counts[event] += number
+
+
+class EventCounters:
+    """Counts events in Animal, Landscape and Island while enabled"""
+    def __init__(self):
+        self.counts = dict.fromkeys(EVENTS, 0)
+        self.years = []     # the counts of each year since the last reset
+        self._year_start = dict(self.counts)
+        self._thread = None     # the thread the counters are enabled in
+
+    def reset(self):
+        """Sets all the counters to 0"""
+        self.counts.update(dict.fromkeys(EVENTS, 0))
+        self.years = []
+        self._year_start = dict(self.counts)
+
+    def end_year(self):
+        """Stores what was counted since the last call as the counts of one year"""
+        self.years.append({event: self.counts[event] - self._year_start[event] for event in EVENTS})
+        self._year_start = dict(self.counts)
+
+    def enable(self):
+        """
+        Starts counting the events in this thread
+
+        Several counters can be enabled at once, and in the same thread the last one enabled
+        counts until it is disabled.
+
+        Raises
+        ------
+        RuntimeError
+        """
+        global num_enabled
+        if self._thread is not None:
+            raise RuntimeError('The counters are already enabled')
+        with _lock:
+            num_enabled += 1
+        if getattr(_local, 'enabled', None) is None:
+            _local.enabled = []
+        _local.enabled.append(self)
+        self._thread = threading.get_ident()
+
+    def disable(self):
+        """
+        Stops counting
+
+        Raises
+        ------
+        RuntimeError
+        """
+        global num_enabled
+        if self._thread is None:
+            return
+        if self._thread != threading.get_ident():
+            raise RuntimeError('The counters must be disabled in the thread they were enabled in')
+        _local.enabled.remove(self)
+        self._thread = None
+        with _lock:
+            num_enabled -= 1
+
+    def stats(self):
+        """
+        Returns
+        -------
+        dict with the total of each counter, and the counts of each year in the list 'years'
+        """
+        return dict(self.counts, years=[dict(year) for year in self.years])
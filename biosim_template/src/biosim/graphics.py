@@ -10,6 +10,10 @@ This is a modified graphic from the Randvis project to Biosim.
    * You need to set the :const:`_DEFAULT_FILEBASE` constant below to the
      directory and file-name start you want to use for the graphics output
      files.
+   * With ``stream_movie=True`` the frames are not saved as image files, but
+     sent straight to ``ffmpeg``, and the movie is ready when the simulation is done.
+   * With ``img_workers`` the images are drawn and saved by a pool of processes
+     using the Agg backend, while the simulation goes on.
 
 """
 
@@ -17,7 +21,15 @@ This is a modified graphic from the Randvis project to Biosim.
 import matplotlib.pyplot as plt
 import numpy as np
 import subprocess
+import collections
+import concurrent.futures
+import io
 import os
+import queue
+import tempfile
+import threading
+
+from .island import TERRAIN, terrain_codes
 
 # Update these variables to point to your ffmpeg and convert binaries
 # If you installed ffmpeg using conda or installed both softwares in
@@ -31,14 +43,38 @@ _DEFAULT_GRAPHICS_DIR = os.path.join('../results', 'data')
 _DEFAULT_GRAPHICS_NAME = 'biosim'
 _DEFAULT_IMG_FORMAT = 'png'
 _DEFAULT_MOVIE_FORMAT = 'mp4'   # alternatives: mp4, gif
+_MOVIE_FPS = 25     # same as ffmpeg uses for a sequence of images
+
+# colour of each terrain code, in the same order as island.TERRAIN
+_TERRAIN_RGB = np.array([(0.0, 0.0, 1.0),   # Water: blue
+                         (0.0, 0.6, 0.0),   # Lowland: dark green
+                         (0.5, 1.0, 0.5),   # Highland: light green
+                         (1.0, 1.0, 0.5)])  # Desert: light yellow
+
+# bins used for the histograms if no hist_specs are given
+_DEFAULT_HIST_SPECS = {'age': {'max': 60.0, 'delta': 2},
+                       'weight': {'max': 60.0, 'delta': 2},
+                       'fitness': {'max': 1.0, 'delta': 0.05}}
+
+# y-limits are only changed when the data are outside them, and then with some headroom,
+# so that the whole figure does not have to be redrawn for every update
+_HEADROOM = 1.2
+_SHRINK_LIMIT = 0.25
+
+# Backends without a window, nothing has to be drawn before the images are saved
+_NON_GUI_BACKENDS = ('agg', 'cairo', 'pdf', 'pgf', 'ps', 'svg', 'template')
+
+# How many frames per worker process that can wait to be saved
+_FRAMES_PER_WORKER = 4
 
 
 class Graphics:
     """Provides graphics support for Biosim."""
 
     def __init__(self, island_map, vis_years=1, img_dir=None, img_name=None, img_fmt=None,
-                 ymax_animals=None, cmax_herbi=None, cmax_carni=None, hist_specs_age=None, hist_specs_fitness=None,
-                 hist_specs_weight=None):
+                 ymax_animals=None, cmax_herbi=None, cmax_carni=None, hist_specs_age=None,
+                 hist_specs_fitness=None, hist_specs_weight=None, stream_movie=False,
+                 img_workers=None):
         """
 
         Parameters
@@ -65,8 +101,22 @@ class Graphics:
             sets the x-max limit and the bins for the fitness histogram
         hist_specs_weight: dict
             sets the x-max limit and the bins for the weight histogram
+        stream_movie: bool
+            if True, the frames are sent to ffmpeg as raw pixels instead of being saved as
+            images, and the mp4 movie is finished each time the simulation is done
+        img_workers: int
+            if given, the images are saved by this many processes in parallel
+
+        Raises
+        ------
+        ValueError
         """
 
+        if stream_movie and img_workers is not None:
+            raise ValueError('The frames can not both be streamed and saved by img_workers')
+        if stream_movie and img_dir is None:
+            raise ValueError('img_dir must be given to stream the movie')
+
         if img_name is None:
             img_name = _DEFAULT_GRAPHICS_NAME
 
@@ -81,6 +131,20 @@ class Graphics:
         self._img_year = 1
         self._vis_year = vis_years
 
+        # Each simulate() call streams one part of the movie, which is joined to the movie when
+        # it is done
+        self._stream_movie = stream_movie
+        self._movie_pipe = None
+        self._movie_log = None      # file with what ffmpeg writes to stderr while streaming
+        self._frame_size = None
+        self._movie_parts = []
+        self._movie_made = False    # True when the parts so far are joined in the movie
+
+        # Pool of processes saving the images, started when the first image is saved
+        self._img_workers = img_workers
+        self._frame_pool = None
+        self._frame_jobs = collections.deque()
+
         # the following will be initialized by _setup_graphics
         self._fig = None
         self._herbivore_map_ax = None
@@ -92,9 +156,8 @@ class Graphics:
         self._carnivore_line = None
         self._island_map = island_map
         self._island_img = None
-        self._island_map_lines = self._island_map.splitlines()
-        self._hight = len(self._island_map_lines)
-        self._length = len(self._island_map_lines[0])
+        self._terrain = terrain_codes(island_map)
+        self._hight, self._length = self._terrain.shape
         self._ages_hist = None
         self._ages_histogram = None
         self._weights_hist = None
@@ -115,6 +178,13 @@ class Graphics:
 
         self.template = 'Year: {:5d}'
 
+        # Saved image of everything that does not change between updates, used for blitting
+        self._background = None
+        self._shown = False
+
+        # Passing control to the GUI is only possible from the main thread, see AsyncGraphics
+        self.gui_events = True
+
     def update(self, year, num_herbivores, num_carnivores, herbivore_map, carnivore_map,
                age_herbi=None, age_carni=None, weight_herbi=None, weight_carni=None,
                fitness_herbi=None, fitness_carni=None):
@@ -128,10 +198,10 @@ class Graphics:
             Total number of herbivores
         num_carnivores: int
             Total number of carnivores
-        herbivore_map: list
-            Nested list with how many herbivores there are in each cell
-        carnivore_map: list
-            Nested list with how many carnivores there are in each cell
+        herbivore_map: 2-D array or nested list
+            How many herbivores there are in each cell
+        carnivore_map: 2-D array or nested list
+            How many carnivores there are in each cell
         age_herbi: list with int
             List of ages for every herbivore
         age_carni: list with int
@@ -153,12 +223,144 @@ class Graphics:
         self._update_herbivore_map(herbivore_map)
         self._update_animal_graph(year, num_herbivores, num_carnivores)
         self._update_histograms(age_herbi, age_carni, weight_herbi, weight_carni, fitness_herbi, fitness_carni)
-        self._fig.canvas.flush_events()  # ensure every thing is drawn
-        plt.pause(1e-6)  # pause required to pass control to GUI
+        if self.gui_events and plt.get_backend().lower() not in _NON_GUI_BACKENDS:
+            self._blit()
+            if not self._shown:
+                plt.pause(1e-6)  # pause required to show the window and pass control to GUI
+                self._shown = True
+            self._fig.canvas.flush_events()  # ensure every thing is drawn
 
         if self._img_base is not None:
             self._save_graphics(year)
 
+    def finish(self):
+        """
+        Called when the simulation is done, after the last update
+
+        Waits until all the images are saved and finishes the movie if the frames
+        are streamed to ffmpeg
+
+        Raises
+        ------
+        RuntimeError
+        """
+
+        if self._frame_pool is not None:
+            while self._frame_jobs:
+                self._frame_jobs.popleft().result()     # raises the errors from the workers
+            self._frame_pool.shutdown()
+            self._frame_pool = None
+
+        if self._movie_pipe is None:
+            return
+
+        try:
+            self._movie_pipe.stdin.close()
+        except OSError:
+            pass    # ffmpeg has stopped, which wait tells
+        if self._movie_pipe.wait() != 0:
+            raise RuntimeError('ERROR: ffmpeg failed while streaming the movie: {}'.format(
+                self._stop_movie_part(failed=True)))
+        self._stop_movie_part()
+
+        # The movie made by the last finish() is joined with the new part, and the parts are
+        # deleted, so each frame is only stored once
+        movie = '{}.{}'.format(self._img_base, _DEFAULT_MOVIE_FORMAT)
+        joined = '{}_joined.{}'.format(self._img_base, _DEFAULT_MOVIE_FORMAT)
+        parts_file = '{}_parts.txt'.format(self._img_base)
+        with open(parts_file, 'w') as f:
+            for part in ([movie] if self._movie_made else []) + self._movie_parts:
+                f.write("file '{}'\n".format(os.path.abspath(part)))
+        try:
+            # The parts have the same encoding, so they are joined without encoding them again
+            subprocess.check_call([_FFMPEG_BINARY,
+                                   '-y',
+                                   '-f', 'concat',
+                                   '-safe', '0',
+                                   '-i', parts_file,
+                                   '-c', 'copy',
+                                   joined])
+        except subprocess.CalledProcessError as err:
+            raise RuntimeError('ERROR: ffmpeg failed with: {}'.format(err))
+        os.replace(joined, movie)
+        for part in self._movie_parts + [parts_file]:
+            os.remove(part)
+        self._movie_parts = []
+        self._movie_made = True
+
+    def _start_movie_part(self):
+        """Starts ffmpeg for a new part of the movie, reading raw RGBA frames from a pipe"""
+
+        self._frame_size = tuple(int(size) for size in self._fig.get_size_inches() * self._fig.dpi)
+        part = '{}_part{:03d}.{}'.format(self._img_base, len(self._movie_parts),
+                                         _DEFAULT_MOVIE_FORMAT)
+        self._movie_parts.append(part)
+        self._movie_log = tempfile.TemporaryFile()
+        self._movie_pipe = subprocess.Popen([_FFMPEG_BINARY,
+                                             '-y',
+                                             '-f', 'rawvideo',
+                                             '-pix_fmt', 'rgba',
+                                             '-s', '{}x{}'.format(*self._frame_size),
+                                             '-r', str(_MOVIE_FPS),
+                                             '-i', '-',
+                                             '-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2',
+                                             '-profile:v', 'baseline',
+                                             '-level', '3.0',
+                                             '-pix_fmt', 'yuv420p',
+                                             part],
+                                            stdin=subprocess.PIPE,
+                                            stderr=self._movie_log)
+
+    def _write_frame(self, frame):
+        """
+        Sends the raw pixels of one frame to ffmpeg
+
+        Parameters
+        ----------
+        frame: bytes-like
+            the RGBA pixels of the figure
+
+        Raises
+        ------
+        RuntimeError
+            if the figure does not have the size the movie was started with, or ffmpeg stopped
+        """
+        width, height = self._frame_size
+        if len(frame) != width * height * 4:
+            raise RuntimeError('The figure must keep the size of {}x{} pixels while the movie is '
+                               'streamed'.format(width, height))
+        try:
+            self._movie_pipe.stdin.write(frame)
+        except OSError as err:
+            self._movie_pipe.kill()
+            self._movie_pipe.wait()
+            raise RuntimeError('ERROR: ffmpeg stopped while streaming the movie: {}'.format(
+                self._stop_movie_part(failed=True))) from err
+
+    def _stop_movie_part(self, failed=False):
+        """
+        Forgets the ffmpeg process that has ended
+
+        Parameters
+        ----------
+        failed: bool
+            if True, the part it made is thrown away
+
+        Returns
+        -------
+        str, what ffmpeg wrote to stderr
+        """
+        self._movie_pipe = None
+        if failed:
+            part = self._movie_parts.pop()
+            if os.path.exists(part):
+                os.remove(part)
+        self._movie_log.seek(0)
+        errors = self._movie_log.read().decode(errors='replace').strip()
+        self._movie_log.close()
+        self._movie_log = None
+        return errors
+
     def make_movie(self, movie_fmt=None):
         """
 
@@ -178,6 +380,15 @@ class Graphics:
         if movie_fmt is None:
             movie_fmt = _DEFAULT_MOVIE_FORMAT
 
+        if self._stream_movie:
+            # The movie was made while simulating
+            if movie_fmt != _DEFAULT_MOVIE_FORMAT:
+                raise ValueError('Only {} movies can be streamed'.format(_DEFAULT_MOVIE_FORMAT))
+            self.finish()
+            return
+
+        self.finish()   # waits for the images that are still being saved
+
         if movie_fmt == 'mp4':
             try:
                 # Parameters chosen according to http://trac.ffmpeg.org/wiki/Encode/H.264,
@@ -225,6 +436,7 @@ class Graphics:
         # create new figure window
         if self._fig is None:
             self._fig = plt.figure()
+            self._fig.canvas.mpl_connect('resize_event', self._forget_background)
 
         # Add left subplot for images created with imshow().
         # We cannot create the actual ImageAxis object before we know
@@ -264,22 +476,15 @@ class Graphics:
 
         # Makes a map of the island with different color for different terrain
         if self._island_img is None:
-            rgb_value = {'W': (0.0, 0.0, 1.0),  # blue
-                         'L': (0.0, 0.6, 0.0),  # dark green
-                         'H': (0.5, 1.0, 0.5),  # light green
-                         'D': (1.0, 1.0, 0.5)}  # light yellow
-
-            map_rgb = [[rgb_value[column] for column in row]
-                       for row in self._island_map.splitlines()]
             self._island_img = self._fig.add_axes([0.05, 0.7, 0.25, 0.25])
             self._island_img.set_title('Island')
-            self._island_img.imshow(map_rgb)
+            self._island_img.imshow(_TERRAIN_RGB[self._terrain])
 
             # Gives correct axis to the island map
-            self._island_img.set_xticks(range(0, len(map_rgb[0]), 5))
-            self._island_img.set_xticklabels(range(1, 1 + len(map_rgb[0]), 5))
-            self._island_img.set_yticks(range(0, len(map_rgb), 5))
-            self._island_img.set_yticklabels(range(1, 1 + len(map_rgb), 5))
+            self._island_img.set_xticks(range(0, self._length, 5))
+            self._island_img.set_xticklabels(range(1, 1 + self._length, 5))
+            self._island_img.set_yticks(range(0, self._hight, 5))
+            self._island_img.set_yticklabels(range(1, 1 + self._hight, 5))
 
             # Adds description on what terrain the different colors represent
             ax_lg = self._fig.add_axes([0.33, 0.7, 0.05, 0.3])  # llx, lly, w, h
@@ -288,28 +493,50 @@ class Graphics:
                                        'Highland', 'Desert')):
                 ax_lg.add_patch(plt.Rectangle((0., ix * 0.2), 0.1, 0.1,
                                               edgecolor='none',
-                                              facecolor=rgb_value[name[0]]))
+                                              facecolor=_TERRAIN_RGB[TERRAIN.index(name[0])]))
                 ax_lg.text(0.25, ix * 0.2, name, transform=ax_lg.transAxes)
 
+        # Makes the heatmaps with the colorbars, the data are changed on each update
+        if self._herbivore_img_axis is None:
+            self._herbivore_img_axis = self._herbivore_map_ax.imshow(
+                np.zeros((self._hight, self._length)), interpolation='nearest', vmin=0,
+                vmax=(200 if self.cmax_herbi is None else self.cmax_herbi))
+            self._fig.colorbar(self._herbivore_img_axis, ax=self._herbivore_map_ax,
+                               orientation='vertical')
+
+        if self._carnivore_img_axis is None:
+            self._carnivore_img_axis = self._carnivore_map_ax.imshow(
+                np.zeros((self._hight, self._length)), interpolation='nearest', vmin=0,
+                vmax=(60 if self.cmax_carni is None else self.cmax_carni))
+            self._fig.colorbar(self._carnivore_img_axis, ax=self._carnivore_map_ax,
+                               orientation='vertical')
+
         # Makes a histogram to put the age
         if self._ages_hist is None:
             self._ages_hist = self._fig.add_axes([0.08, 0.05, 0.2, 0.15])
-            self._ages_histogram = None
+            self._ages_histogram = self._make_histogram(self._ages_hist, 'Age', self.hist_specs_age,
+                                                        _DEFAULT_HIST_SPECS['age'])
 
         # Makes a histogram to put the weight
         if self._weights_hist is None:
             self._weights_hist = self._fig.add_axes([0.38, 0.05, 0.2, 0.15])
-            self._weights_histogram = None
+            self._weights_histogram = self._make_histogram(self._weights_hist, 'Weights',
+                                                           self.hist_specs_weight,
+                                                           _DEFAULT_HIST_SPECS['weight'])
 
         # Makes a histogram to put the fitness
         if self._fitness_hist is None:
             self._fitness_hist = self._fig.add_axes([0.70, 0.05, 0.2, 0.15])
-            self._fitness_histogram = None
+            self._fitness_histogram = self._make_histogram(self._fitness_hist, 'Fitness',
+                                                           self.hist_specs_fitness,
+                                                           _DEFAULT_HIST_SPECS['fitness'])
 
         # Makes a graph to put the animal population
         if self._mean_ax is None:
             self._mean_ax = self._fig.add_axes([0.65, 0.7, 0.3, 0.25])
             self._mean_ax.set_title('Animal population')
+            if self.ymax_animals is not None:
+                self._mean_ax.set_ylim(0, self.ymax_animals)
 
         # add 1 so we can show values for time zero and time final_step
         self._mean_ax.set_xlim(0, final_step+1)
@@ -341,46 +568,121 @@ class Graphics:
                 self._carnivore_line.set_data(np.hstack((x_data, x_new)),
                                               np.hstack((y_data, y_new)))
 
+        if self._mean_ax.get_legend() is None:
+            self._mean_ax.legend((self._herbivore_line, self._carnivore_line),
+                                 ['Herbivore', 'Carnivore'], loc='upper left')
+
+        # The axes may have changed, so the background must be drawn again
+        self._background = None
+
+    @staticmethod
+    def _make_histogram(ax, title, hist_specs, default_specs):
+        """
+        Makes the step lines for a histogram once, later only their heights are changed
+
+        Parameters
+        ----------
+        ax: Axes
+            where the histogram is drawn
+        title: string
+            title of the histogram
+        hist_specs: dict
+            max and delta for the bins, or None to use the default_specs
+        default_specs: dict
+            max and delta for the bins if hist_specs is None
+
+        Returns
+        -------
+        Tuple with the step lines for herbivores and carnivores
+        """
+
+        specs = hist_specs if hist_specs is not None else default_specs
+        bins = np.arange(0, specs['max'] + specs['delta'], specs['delta'])
+        ax.set_title(title)
+        ax.set_xlim(0, bins[-1])
+        return (ax.stairs(np.zeros(len(bins) - 1), bins),
+                ax.stairs(np.zeros(len(bins) - 1), bins))
+
+    def _dynamic_artists(self):
+        """All the parts of the figure that are changed on each update"""
+        return (self._year_txt, self._herbivore_img_axis, self._carnivore_img_axis,
+                self._herbivore_line, self._carnivore_line,
+                *self._ages_histogram, *self._weights_histogram, *self._fitness_histogram)
+
+    def _forget_background(self, event=None):
+        """The saved background is wrong after a resize or a change of the axes"""
+        self._background = None
+
+    def _blit(self):
+        """
+        Draws the parts of the figure that have changed
+
+        The rest of the figure is saved as a background the first time, and only drawn again
+        if the limits of an axis have changed.
+        """
+
+        canvas = self._fig.canvas
+        if not canvas.supports_blit:
+            canvas.draw_idle()
+            return
+
+        if self._background is None:
+            for artist in self._dynamic_artists():
+                artist.set_visible(False)
+            canvas.draw()
+            self._background = canvas.copy_from_bbox(self._fig.bbox)
+            for artist in self._dynamic_artists():
+                artist.set_visible(True)
+        else:
+            canvas.restore_region(self._background)
+
+        for artist in self._dynamic_artists():
+            artist.axes.draw_artist(artist)
+        canvas.blit(self._fig.bbox)
+
+    def _rescale(self, ax, top_value, shrink=True):
+        """
+        Changes the y-limit of an axis if the data are outside it
+
+        Parameters
+        ----------
+        ax: Axes
+            the axis to rescale
+        top_value: float
+            the highest value in the data
+        shrink: bool
+            if the limit can be lowered when the data only use a small part of the axis
+        """
+
+        top = ax.get_ylim()[1]
+        new_top = max(top_value, 1) * _HEADROOM
+        if top_value > top or (shrink and top_value < top * _SHRINK_LIMIT and new_top < top):
+            ax.set_ylim(0, new_top)
+            self._background = None
+
     def _update_herbivore_map(self, herbivore_map):
         """
         Update the map with herbivores
         Parameters
         ----------
-        herbivore_map: nested list
-            How many herbivores there are in each cell
+        herbivore_map: 2-D array or nested list
+            How many herbivores there are in each cell, used by the image without copying
 
         """
 
-        if self._herbivore_img_axis is not None:
-            self._herbivore_img_axis.set_data(herbivore_map)
-        else:
-            self._herbivore_img_axis = self._herbivore_map_ax.imshow(herbivore_map,
-                                                                     interpolation='nearest',
-                                                                     vmin=0,
-                                                                     vmax=(200 if self.cmax_herbi is None
-                                                                           else self.cmax_herbi))
-            plt.colorbar(self._herbivore_img_axis, ax=self._herbivore_map_ax,
-                         orientation='vertical')
+        self._herbivore_img_axis.set_data(herbivore_map)
 
     def _update_carnivore_map(self, carnivore_map):
         """
         Update the map with carnivores
         Parameters
         ----------
-        carnivore_map: nested list
-            How many herbivores there are in each cell
+        carnivore_map: 2-D array or nested list
+            How many carnivores there are in each cell, used by the image without copying
 
         """
 
-        if self._carnivore_img_axis is not None:
-            self._carnivore_img_axis.set_data(carnivore_map)
-        else:
-            self._carnivore_img_axis = self._carnivore_map_ax.imshow(carnivore_map,
-                                                                     interpolation='nearest',
-                                                                     vmin=0, vmax=(60 if self.cmax_carni is None
-                                                                                   else self.cmax_carni))
-            plt.colorbar(self._carnivore_img_axis, ax=self._carnivore_map_ax,
-                         orientation='vertical')
+        self._carnivore_img_axis.set_data(carnivore_map)
 
     def _update_animal_graph(self, year, herbivore, carnivore):
         """
@@ -414,13 +716,9 @@ class Graphics:
         x_data_2[step] = year
         self._carnivore_line.set_xdata(x_data_2)
 
-        plt.legend((self._herbivore_line, self._carnivore_line), ['Herbivore', 'Carnivore'], loc='upper left')
-
-        if self.ymax_animals is not None:
-            self._mean_ax.set_ylim(0, self.ymax_animals)
-        else:
+        if self.ymax_animals is None:
             self.animal_ydata.append(max(herbivore, carnivore))
-            self._mean_ax.set_ylim(0, max(self.animal_ydata))
+            self._rescale(self._mean_ax, max(self.animal_ydata), shrink=False)
 
     def _update_histograms(self, age_herbi, age_carn, weight_herbi, weight_carn, fitness_herbi, fitness_carn):
         """
@@ -442,54 +740,16 @@ class Graphics:
             list with all fitness for all carnivores
         """
 
-        self._ages_hist.cla()
-        self._ages_hist.set_title('Age')
-        if self.hist_specs_age is not None:
-            self._ages_histogram = self._ages_hist.hist(age_herbi, bins=np.arange(0, self.hist_specs_age['max']
-                                                                                  + self.hist_specs_age['delta'],
-                                                                                  self.hist_specs_age['delta']),
-                                                        histtype='step')
-            self._ages_histogram = self._ages_hist.hist(age_carn, bins=np.arange(0, self.hist_specs_age['max']
-                                                                                 + self.hist_specs_age['delta'],
-                                                                                 self.hist_specs_age['delta']),
-                                                        histtype='step')
-        else:
-            self._ages_histogram = self._ages_hist.hist(age_herbi, histtype='step')
-            self._ages_histogram = self._ages_hist.hist(age_carn, histtype='step')
-
-        self._weights_hist.cla()
-        self._weights_hist.set_title('Weights')
-        if self.hist_specs_weight is not None:
-            self._weights_histogram = self._weights_hist.hist(weight_herbi,
-                                                              bins=np.arange(0, self.hist_specs_weight['max']
-                                                                             + self.hist_specs_weight['delta'],
-                                                                             self.hist_specs_weight['delta']),
-                                                              histtype='step')
-            self._weights_histogram = self._weights_hist.hist(weight_carn,
-                                                              bins=np.arange(0, self.hist_specs_weight['max']
-                                                                             + self.hist_specs_weight['delta'],
-                                                                             self.hist_specs_weight['delta']),
-                                                              histtype='step')
-        else:
-            self._weights_histogram = self._weights_hist.hist(weight_herbi, histtype='step')
-            self._weights_histogram = self._weights_hist.hist(weight_carn, histtype='step')
-
-        self._fitness_hist.cla()
-        self._fitness_hist.set_title('Fitness')
-        if self.hist_specs_fitness is not None:
-            self._fitness_histogram = self._fitness_hist.hist(fitness_herbi,
-                                                              bins=np.arange(0, self.hist_specs_fitness['max']
-                                                                             + self.hist_specs_fitness['delta'],
-                                                                             self.hist_specs_fitness['delta']),
-                                                              histtype='step')
-            self._fitness_histogram = self._fitness_hist.hist(fitness_carn,
-                                                              bins=np.arange(0, self.hist_specs_fitness['max']
-                                                                             + self.hist_specs_fitness['delta'],
-                                                                             self.hist_specs_fitness['delta']),
-                                                              histtype='step')
-        else:
-            self._fitness_histogram = self._fitness_hist.hist(fitness_herbi, histtype='step')
-            self._fitness_histogram = self._fitness_hist.hist(fitness_carn, histtype='step')
+        for histogram, herbi_data, carni_data in (
+                (self._ages_histogram, age_herbi, age_carn),
+                (self._weights_histogram, weight_herbi, weight_carn),
+                (self._fitness_histogram, fitness_herbi, fitness_carn)):
+            bins = histogram[0].get_data().edges
+            herbi_counts = np.histogram(herbi_data, bins=bins)[0]
+            carni_counts = np.histogram(carni_data, bins=bins)[0]
+            histogram[0].set_data(herbi_counts)
+            histogram[1].set_data(carni_counts)
+            self._rescale(histogram[0].axes, max(herbi_counts.max(), carni_counts.max()))
 
     def _save_graphics(self, year):
         """
@@ -508,7 +768,285 @@ class Graphics:
         if self._img_base is None or year % self._img_year != 0:
             return
 
-        plt.savefig('{base}_{num:05d}.{type}'.format(base=self._img_base,
-                                                     num=self._img_ctr,
-                                                     type=self._img_fmt))
+        filename = '{base}_{num:05d}.{type}'.format(base=self._img_base,
+                                                    num=self._img_ctr,
+                                                    type=self._img_fmt)
+
+        if self._img_workers is not None:
+            self._submit_frame(filename)
+            self._img_ctr += 1
+            return
+
+        if self._stream_movie:
+            if self._movie_pipe is None:
+                self._start_movie_part()
+            # The figure is rendered as raw pixels, the size is fixed by the dpi
+            frame = io.BytesIO()
+            self._fig.savefig(frame, format='rgba', dpi=self._fig.dpi)
+            self._write_frame(frame.getbuffer())
+            self._img_ctr += 1
+            return
+
+        self._fig.savefig(filename)
         self._img_ctr += 1
+
+    def _submit_frame(self, filename):
+        """
+        Sends a snapshot of the figure to the pool of processes that saves the images
+
+        Parameters
+        ----------
+        filename: string
+            where the image is saved
+        """
+
+        if self._frame_pool is None:
+            settings = dict(vis_years=self._vis_year, img_fmt=self._img_fmt,
+                            ymax_animals=self.ymax_animals, cmax_herbi=self.cmax_herbi,
+                            cmax_carni=self.cmax_carni, hist_specs_age=self.hist_specs_age,
+                            hist_specs_fitness=self.hist_specs_fitness,
+                            hist_specs_weight=self.hist_specs_weight)
+            self._frame_pool = concurrent.futures.ProcessPoolExecutor(
+                self._img_workers, initializer=_start_frame_worker,
+                initargs=(self._island_map, settings))
+
+        # Wait for the oldest frames, so the snapshots do not fill up the memory
+        while len(self._frame_jobs) >= _FRAMES_PER_WORKER * self._img_workers:
+            self._frame_jobs.popleft().result()
+
+        self._frame_jobs.append(self._frame_pool.submit(_save_frame, self._snapshot(), filename))
+
+    def _snapshot(self):
+        """
+        Returns
+        -------
+        dict with everything that is needed to draw the current frame again
+        """
+
+        return {'year': self._year_txt.get_text(),
+                'herbivore_map': np.asarray(self._herbivore_img_axis.get_array()),
+                'carnivore_map': np.asarray(self._carnivore_img_axis.get_array()),
+                'herbivore_line': tuple(np.array(data) for data in self._herbivore_line.get_data()),
+                'carnivore_line': tuple(np.array(data) for data in self._carnivore_line.get_data()),
+                'histograms': [stairs.get_data().values.copy()
+                               for stairs in self._ages_histogram + self._weights_histogram +
+                               self._fitness_histogram],
+                'xlim': self._mean_ax.get_xlim(),
+                'ylims': [ax.get_ylim() for ax in (self._mean_ax, self._ages_hist,
+                                                   self._weights_hist, self._fitness_hist)]}
+
+    def _draw_snapshot(self, snapshot):
+        """
+        Sets the figure to a snapshot from :meth:`_snapshot()`
+
+        Parameters
+        ----------
+        snapshot: dict
+            the data from another Graphics with the same settings
+        """
+
+        self._year_txt.set_text(snapshot['year'])
+        self._herbivore_img_axis.set_data(snapshot['herbivore_map'])
+        self._carnivore_img_axis.set_data(snapshot['carnivore_map'])
+        self._herbivore_line.set_data(*snapshot['herbivore_line'])
+        self._carnivore_line.set_data(*snapshot['carnivore_line'])
+        histograms = self._ages_histogram + self._weights_histogram + self._fitness_histogram
+        for stairs, values in zip(histograms, snapshot['histograms']):
+            stairs.set_data(values)
+        self._mean_ax.set_xlim(snapshot['xlim'])
+        axes = (self._mean_ax, self._ages_hist, self._weights_hist, self._fitness_hist)
+        for ax, ylim in zip(axes, snapshot['ylims']):
+            ax.set_ylim(ylim)
+
+
+# The graphics of a worker process in the pool that saves the images
+_worker_graphics = None
+
+
+def _start_frame_worker(island_map, settings):
+    """Makes the graphics for a worker process, which only saves images with Agg"""
+    global _worker_graphics
+    plt.switch_backend('Agg')
+    _worker_graphics = Graphics(island_map, **settings)
+    _worker_graphics.gui_events = False
+    _worker_graphics.setup(1, 1)
+
+
+def _save_frame(snapshot, filename):
+    """Draws a snapshot in a worker process and saves it as an image"""
+    _worker_graphics._draw_snapshot(snapshot)
+    _worker_graphics._fig.savefig(filename)
+
+
+class AsyncGraphics:
+    """
+    Renders the graphics in a separate thread.
+
+    The simulation only puts snapshots of the data in a bounded queue, and the drawing and
+    saving of the frames is done by the render thread. GUI backends can only draw in the main
+    thread, so this is only for saving images with a backend without a window, such as Agg.
+    When the queue is full, the policy decides what happens:
+
+    * ``'block'``: wait until there is room for the frame, no frames are lost
+    * ``'drop'``: skip the new frame
+    * ``'coalesce'``: replace the oldest waiting frame with the new one
+
+    The animal counts of skipped frames are still added to the population graph. If drawing
+    or saving a frame fails, the rest of the frames are thrown away and the error is raised
+    by the next call to :meth:`update` or :meth:`finish`. The graphics are finished in both
+    cases, so the movie pipe and the image workers are always closed.
+    """
+
+    policies = ('block', 'drop', 'coalesce')
+
+    def __init__(self, graphics, queue_size=4, policy='block'):
+        """
+
+        Parameters
+        ----------
+        graphics: Graphics
+            the graphics that the frames are drawn with
+        queue_size: int
+            how many snapshots that can wait to be drawn
+        policy: string
+            what to do when the queue is full, must be block, drop or coalesce
+
+        Raises
+        ------
+        ValueError
+        """
+
+        if policy not in self.policies:
+            raise ValueError(f'Policy must be block, drop or coalesce, not {policy}')
+        if queue_size < 1:
+            raise ValueError('queue_size must be at least 1')
+        if plt.get_backend().lower() not in _NON_GUI_BACKENDS:
+            raise ValueError('The graphics can not be drawn in a thread with the '
+                             f'{plt.get_backend()} backend, use a backend without a window '
+                             f'such as Agg')
+
+        self._graphics = graphics
+        self._graphics.gui_events = False
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._policy = policy
+        self._thread = None
+        self._error = None      # the exception from the render thread, if a frame failed
+
+        self._lock = threading.Lock()
+        self._missed_counts = []    # (year, herbivores, carnivores) from frames that were skipped
+        self.dropped = 0
+
+    def setup(self, final_step, img_year):
+        """
+        Waits for the frames from the last simulation and prepares the graphics
+
+        Parameters
+        ----------
+        final_step: int
+            last time step to be visualised
+        img_year: int
+            interval between saving image to file
+        """
+
+        self.finish()
+        self._graphics.setup(final_step, img_year)
+        self._thread = threading.Thread(target=self._render, name='biosim-graphics', daemon=True)
+        self._thread.start()
+
+    def update(self, year, num_herbivores, num_carnivores, *snapshot):
+        """
+        Puts a snapshot in the queue, takes the same parameters as :meth:`Graphics.update()`
+
+        Raises
+        ------
+        Exception
+            the error from drawing or saving an earlier frame
+        """
+
+        if self._error is not None:
+            raise self._error
+        frame = (year, num_herbivores, num_carnivores) + snapshot
+
+        if self._policy == 'block':
+            self._queue.put(frame)
+            return
+
+        while True:
+            try:
+                self._queue.put_nowait(frame)
+                return
+            except queue.Full:
+                if self._policy == 'drop':
+                    self._skip(frame)
+                    return
+
+            # coalesce: make room by skipping the oldest frame, the render thread may
+            # already have taken it
+            try:
+                self._skip(self._queue.get_nowait())
+            except queue.Empty:
+                pass
+
+    def _skip(self, frame):
+        """Remembers the animal counts of a frame that will not be drawn"""
+        with self._lock:
+            self._missed_counts.append(frame[:3])
+            self.dropped += 1
+
+    def _add_missed_counts(self, year):
+        """Adds the counts of skipped frames up to the given year to the population graph"""
+        with self._lock:
+            missed = [counts for counts in self._missed_counts if counts[0] <= year]
+            self._missed_counts = [counts for counts in self._missed_counts if counts[0] > year]
+        for counts in missed:
+            self._graphics._update_animal_graph(*counts)
+
+    def _render(self):
+        """
+        Draws the frames in the queue until it gets None
+
+        After an error the frames are still taken from the queue, so update and finish never
+        wait for a thread that has stopped
+        """
+        while (frame := self._queue.get()) is not None:
+            if self._error is not None:
+                continue
+            try:
+                self._add_missed_counts(frame[0])
+                self._graphics.update(*frame)
+            except Exception as error:
+                self._error = error
+
+    def finish(self):
+        """
+        Waits until all the frames in the queue are drawn and stops the render thread
+
+        Raises
+        ------
+        Exception
+            the error from drawing or saving a frame
+        """
+        try:
+            if self._thread is not None:
+                self._queue.put(None)
+                self._thread.join()
+                self._thread = None
+            if (error := self._error) is not None:
+                self._error = None
+                raise error
+            self._add_missed_counts(float('inf'))
+        finally:
+            self._graphics.finish()
+
+    def make_movie(self, movie_fmt=None):
+        """
+        Makes the movie when all the frames are saved
+
+        Parameters
+        ----------
+        movie_fmt: string
+            the format of the movie, mp4 or gif
+        """
+
+        self.finish()
+        self._graphics.make_movie(movie_fmt)
@@ -0,0 +1,149 @@
+"""
+Instrumentation of the phases of the year.
+
+Give an :class:`Instrumentation` to the island (or to :class:`biosim.simulation.BioSim`
+with ``instrument=``) to record, for each phase of each year, the time it used, how many
+animals it processed and how many animals were born, died, were killed or migrated::
+
+    sink = MemorySink()
+    sim = BioSim(geogr, ini_pop, seed=1, vis_years=0, instrument=Instrumentation(sink))
+    sim.simulate(100)
+    slowest = max(sink.records, key=lambda record: record['seconds'])
+
+Each record is a dict with the keys in :data:`FIELDS`, and is passed to the sink as soon as
+the phase is finished. When no instrumentation is given, :meth:`Island.season` runs the
+phases without any extra work.
+"""
+
+import csv
+import time
+
+# The keys of each record
+FIELDS = ('year', 'phase', 'seconds', 'herbivores', 'carnivores',
+          'births', 'deaths', 'kills', 'migrants')
+
+
+class MemorySink:
+    """Keeps the records in a list"""
+    def __init__(self):
+        self.records = []
+
+    def write(self, record):
+        """Adds a record to the list"""
+        self.records.append(record)
+
+    def close(self):
+        """Nothing to close, the records are kept"""
+
+    def phase_totals(self, key='seconds'):
+        """
+        Sums a value over all years for each phase
+
+        Parameters
+        ----------
+        key: str
+            which value in the records to sum
+
+        Returns
+        -------
+        dict with the sum for each phase
+        """
+        totals = {}
+        for record in self.records:
+            totals[record['phase']] = totals.get(record['phase'], 0) + record[key]
+        return totals
+
+
+class CSVSink:
+    """Writes the records to a CSV file, one line for each phase of each year"""
+    def __init__(self, filename):
+        """
+
+        Parameters
+        ----------
+        filename: str
+            path to the file, which is overwritten
+        """
+        self._file = open(filename, 'w', newline='', buffering=1)   # line buffered
+        self._writer = csv.DictWriter(self._file, fieldnames=FIELDS)
+        self._writer.writeheader()
+
+    def write(self, record):
+        """Writes a record as a line in the file"""
+        self._writer.writerow(record)
+
+    def close(self):
+        """Closes the file"""
+        self._file.close()
+
+
+class CallbackSink:
+    """Calls a function with each record"""
+    def __init__(self, callback):
+        """
+
+        Parameters
+        ----------
+        callback: callable
+            called with the record dict after each phase
+        """
+        self._callback = callback
+
+    def write(self, record):
+        """Calls the function with the record"""
+        self._callback(record)
+
+    def close(self):
+        """Nothing to close"""
+
+
+class Instrumentation:
+    """Measures each phase of the year and sends the records to the sinks"""
+    def __init__(self, *sinks):
+        """
+
+        Parameters
+        ----------
+        sinks: MemorySink, CSVSink, CallbackSink
+            where the records are sent, anything with write(record) and close() methods.
+            A MemorySink is used if none are given
+        """
+        self.sinks = sinks or (MemorySink(),)
+
+    def run_season(self, island):
+        """
+        Runs all the phases of a year on the island and records each of them
+
+        Parameters
+        ----------
+        island: Island
+            the island to simulate one year on
+        """
+        herbivores, carnivores = island.amount_of_herbivores(), island.amount_of_carnivores()
+        for phase in island.PHASES:
+            start = time.perf_counter()
+            migrants = getattr(island, phase)()     # only migrate_season returns a number
+            seconds = time.perf_counter() - start
+
+            herbi_after, carni_after = island.amount_of_herbivores(), island.amount_of_carnivores()
+            herbi_change, carni_change = herbi_after - herbivores, carni_after - carnivores
+            lost = -min(herbi_change, 0) - min(carni_change, 0)
+            # Herbivores that disappear while the carnivores eat are killed, not dead
+            kills = lost if phase == 'carnivore_feeding_season' else 0
+            record = {'year': island.year,
+                      'phase': phase,
+                      'seconds': seconds,
+                      'herbivores': herbivores,
+                      'carnivores': carnivores,
+                      'births': max(herbi_change, 0) + max(carni_change, 0),
+                      'deaths': lost - kills,
+                      'kills': kills,
+                      'migrants': migrants or 0}
+            for sink in self.sinks:
+                sink.write(record)
+            herbivores, carnivores = herbi_after, carni_after
+
+    def close(self):
+        """Closes all the sinks"""
+        for sink in self.sinks:
+            sink.close()
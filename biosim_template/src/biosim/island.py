@@ -1,11 +1,183 @@
-import random
+import collections.abc
+import os
+import types
 
+import numpy as np
+
+from .animal import Herbivore, Carnivore
+from .cohorts import Cohorts, CohortCell
 from .landscape import Lowland, Highland, Water, Dessert
 
+# The letters of the landscapes, the terrain code of a cell is its index in this string
+TERRAIN = 'WLHD'
+
+# Terrain code for each byte value, 255 for letters that are not a landscape
+_TERRAIN_LOOKUP = np.full(256, 255, dtype=np.uint8)
+for _code, _letter in enumerate(TERRAIN):
+    _TERRAIN_LOOKUP[ord(_letter)] = _code
+
+
+# The landscape class for each terrain code
+_LANDSCAPES = (Water, Lowland, Highland, Dessert)
+
+
+def terrain_codes(island_map):
+    """
+    Converts the map of the island to terrain codes and checks that the map is valid
+
+    Parameters
+    ----------
+    island_map: str
+        map of the island
+
+    Returns
+    -------
+    2-D uint8 array with the index in TERRAIN of each cell
+
+    Raises
+    ------
+    ValueError
+    """
+    map_lines = island_map.splitlines()
+    length = len(map_lines[0])
+    if any(len(row) != length for row in map_lines):
+        raise ValueError('All lines must have the same length')
+
+    text = ''.join(map_lines)
+    if not text.isascii():
+        wrong = next(letter for letter in text if not letter.isascii())
+        raise ValueError(f'Landscape has to be W, L, H, D, can not be {wrong}')
+    letters = np.frombuffer(text.encode('ascii'), dtype=np.uint8)
+    codes = _TERRAIN_LOOKUP[letters].reshape(len(map_lines), length)
+
+    # Checks if the boundaries are all water
+    water = TERRAIN.index('W')
+    if (codes[[0, -1], :] != water).any() or (codes[:, [0, -1]] != water).any():
+        raise ValueError('Boundary must be W')
+
+    if (invalid := letters[codes.ravel() == 255]).size > 0:
+        raise ValueError(f'Landscape has to be W, L, H, D, can not be {chr(invalid[0])}')
+
+    return codes
+
+
+def partial_regrowth(fraction):
+    """
+    Regrowth rule where the fodder of each cell grows back a fraction of what is missing each year
+
+    Parameters
+    ----------
+    fraction: float
+        between 0 and 1, how much of the eaten fodder grows back. 1 is the same as no rule,
+        where all the fodder grows back every year
+
+    Returns
+    -------
+    Function of the fodder and f_max of all cells, to give as regrowth to :class:`Island`
+
+    Raises
+    ------
+    ValueError
+    """
+    if not 0 <= fraction <= 1:
+        raise ValueError('fraction must be between 0 and 1')
+
+    def regrow(fodder, f_max):
+        return fodder + fraction * (f_max - fodder)
+    return regrow
+
+
+def load_map_array(values, shape):
+    """
+    Reads a map of values with one value for each cell of the island
+
+    Parameters
+    ----------
+    values: array or str
+        2-D array, or path to a .npy file which is memory-mapped instead of read into memory
+    shape: tuple
+        (rows, columns) of the island map
+
+    Returns
+    -------
+    2-D array with the values
+
+    Raises
+    ------
+    ValueError
+    """
+    if isinstance(values, (str, os.PathLike)):
+        values = np.load(values, mmap_mode='r')
+    values = np.asarray(values, dtype=float)
+    if values.shape != tuple(shape):
+        raise ValueError(f'The map of values must have shape {tuple(shape)}, not {values.shape}')
+    return values
+
+
+def load_population(filename):
+    """
+    Reads animals from a CSV file
+
+    The file must have a header line with the columns row, col, species, age and weight,
+    and one line for each animal, for example ``2, 7, Herbivore, 5, 20``.
+
+    Parameters
+    ----------
+    filename: str
+        path to the CSV file
+
+    Returns
+    -------
+    Structured array with the fields row, col, species, age and weight, which can be given
+    to :meth:`Island.new_animals`
+    """
+    table = np.genfromtxt(filename, delimiter=',', names=True, dtype=None, encoding='utf-8',
+                          autostrip=True)
+    return np.atleast_1d(table)
+
+
+class _CellMap(collections.abc.Mapping):
+    """
+    All the cells of an island, with (row, column) from 1 as key
+
+    A cell is made when it is first looked up. Water cells are kept apart, as animals never
+    live there, so looking at the whole map does not add them to the simulation.
+    """
+    def __init__(self, island):
+        self._island = island
+
+    def __getitem__(self, loc):
+        island = self._island
+        row, col = loc
+        if not (1 <= row <= island.height and 1 <= col <= island.length):
+            raise KeyError(loc)
+        cell = island._cell(loc)
+        if cell is None:
+            cell = island._water_cells.get(loc)
+            if cell is None:
+                cell = island._water_cells[loc] = _LANDSCAPES[island.terrain[row - 1, col - 1]]()
+        return cell
+
+    def __iter__(self):
+        island = self._island
+        return ((row, col) for row in range(1, island.height + 1)
+                for col in range(1, island.length + 1))
+
+    def __len__(self):
+        return self._island.height * self._island.length
+
 
 class Island:
-    """Class for the island"""
-    def __init__(self, island_map, ini_animals=None):
+    """
+    Class for the island
+
+    The landscape of every cell is kept as terrain codes, and a cell is only made when animals
+    first come to it, so large maps with few animals are cheap. :attr:`cells` has the cells made
+    so far, which are the ones the seasons go through. :attr:`map` still has every cell of the
+    island, but makes the ones that are looked up, so it is slow to go through on a large map.
+    """
+    def __init__(self, island_map, ini_animals=None, instrument=None, bin_width=None,
+                 sampling='animal', regrowth=None, f_max=None, barriers=None):
         """
 
         Parameters
@@ -14,97 +186,344 @@ class Island:
             map of the island
         ini_animals: list with dict
             the Animals that start on the Island
+        instrument: Instrumentation
+            if given, each phase of the year is measured, see :mod:`biosim.instrumentation`
+        bin_width: float
+            if given, the animals are counted in cohorts with weight bins of this width instead
+            of one object for each animal, see :mod:`biosim.cohorts`
+        sampling: str
+            'animal' to draw deaths and migration with one random number for each animal, or
+            'binomial' to draw them for each fitness class at once,
+            see :func:`biosim.landscape.select_by_class`
+        regrowth: callable
+            if given, how the fodder grows back each year, called with the arrays of the fodder
+            left and f_max of all cells, returning the new fodder, see :func:`partial_regrowth`.
+            All the fodder grows back every year if not given
+        f_max: array or str
+            if given, the most fodder of each cell, see :meth:`set_f_max_map`
+        barriers: array or str
+            if given, the chance that an animal gets into each cell, see :meth:`set_barriers`
 
         Raises
         ------
         ValueError
         """
-        self.map = {}
-        map_lines = island_map.splitlines()
-        self.height = len(map_lines)
-        self.length = len(map_lines[0].strip())
-
-        # Checks if the boundaries are all water and if the lines in the landscape are equal length
-        for landscape in map_lines[0] + map_lines[-1]:
-            if landscape != 'W':
-                raise ValueError('Boundary must be W')
-        for row in map_lines:
-            if len(row) != self.length:
-                raise ValueError('All lines must have the same length')
-            if row[0] != 'W' or row[-1] != 'W':
-                raise ValueError('Boundary must be W')
-
-        # Place the different landscape in the right places, also raises error if wrong type of landscape
-        for i, row in enumerate(island_map.splitlines()):
-            for j, landscape in enumerate(row):
-                if landscape == 'W':
-                    self.map[(i+1, j+1)] = Water()
-                elif landscape == 'L':
-                    self.map[(i+1, j+1)] = Lowland()
-                elif landscape == 'H':
-                    self.map[(i+1, j+1)] = Highland()
-                elif landscape == 'D':
-                    self.map[(i+1, j+1)] = Dessert()
-                else:
-                    raise ValueError(f'Landscape has to be W, L, H, D, can not be {landscape}')
+        self.terrain = terrain_codes(island_map)
+        self.height, self.length = self.terrain.shape
+        self._cells = {}   # the cells that animals have been in, with (row, column) from 1 as key
+        self._water_cells = {}  # water cells looked up through map
         self.year = 0   # set the start year to 0
+        self.instrument = instrument
+        if bin_width is not None and bin_width <= 0:
+            raise ValueError('bin_width must be strictly positive')
+        self.bin_width = bin_width  # the width of the weight bins when the animals are in cohorts
+        if sampling not in ('animal', 'binomial'):
+            raise ValueError(f'sampling must be animal or binomial, not {sampling}')
+        self.sampling = sampling
+        self.regrowth = regrowth
+        self._f_max_cells = None    # f_max set for single cells, nan where the landscape decides
+        self._f_max_own = False     # True if _f_max_cells was made here and can be changed
+        self.set_f_max_map(f_max)
+        self.fodder = self.f_max_map()  # how much fodder there is in each cell
+        self._barriers = None
+        self.set_barriers(barriers)
 
         # Import the animals
-        if ini_animals:
+        if ini_animals is not None:
             self.new_animals(ini_animals)
 
+    def copy(self):
+        """
+        Copies the island without parsing the map again
+
+        Returns
+        -------
+        A new Island with the same landscape, year and copies of all the animals
+        """
+        twin = object.__new__(type(self))
+        twin.__dict__.update(self.__dict__)
+        twin._cells = {loc: cell.copy() for loc, cell in self._cells.items()}
+        twin._water_cells = {}
+        twin.fodder = self.fodder.copy()
+        if self._f_max_own:     # the maps that were given are never changed, so they are shared
+            twin._f_max_cells = self._f_max_cells.copy()
+        return twin
+
+    @property
+    def map(self):
+        """
+        Returns
+        -------
+        Mapping with every cell of the island, with (row, column) from 1 as key. The cells are
+        made when they are looked up
+        """
+        return _CellMap(self)
+
+    @property
+    def cells(self):
+        """
+        Returns
+        -------
+        Read-only mapping with the cells made so far, the ones animals have been in, with
+        (row, column) from 1 as key
+        """
+        return types.MappingProxyType(self._cells)
+
+    def f_max_map(self):
+        """
+        Returns
+        -------
+        2-D array with the most fodder each cell can have, the f_max of its landscape unless
+        it is set for the cell with :meth:`set_f_max`
+        """
+        f_max = np.array([landscape.f_max for landscape in _LANDSCAPES], dtype=float)[self.terrain]
+        if self._f_max_cells is not None:
+            f_max = np.where(np.isnan(self._f_max_cells), f_max, self._f_max_cells)
+        return f_max
+
+    def set_f_max(self, loc, f_max):
+        """
+        Sets the most fodder one cell can have, instead of the f_max of its landscape
+
+        Parameters
+        ----------
+        loc: tuple
+            (row, column) of the cell, from 1
+        f_max: float
+            the most fodder in the cell, None to use the f_max of the landscape again
+
+        Raises
+        ------
+        ValueError
+        """
+        row, col = loc
+        if not (1 <= row <= self.height and 1 <= col <= self.length):
+            raise ValueError(f'Location {loc} is not on the island')
+        if f_max is not None and f_max < 0:
+            raise ValueError('f_max can not be negative')
+        if not self._f_max_own:
+            self._f_max_cells = np.full(self.terrain.shape, np.nan) if self._f_max_cells is None \
+                else np.array(self._f_max_cells)
+            self._f_max_own = True
+        self._f_max_cells[row - 1, col - 1] = np.nan if f_max is None else f_max
+
+    def set_f_max_map(self, f_max):
+        """
+        Sets the most fodder of every cell at once, instead of the f_max of their landscape
+
+        A float64 array is used as it is, and not copied, so a memory-mapped file is read from
+        the disk each year instead of kept in memory.
+
+        Parameters
+        ----------
+        f_max: array or str
+            2-D array with the same shape as the map, or a .npy file with it. Cells with nan use
+            the f_max of their landscape. None to use the f_max of the landscapes everywhere
+
+        Raises
+        ------
+        ValueError
+        """
+        if f_max is not None:
+            f_max = load_map_array(f_max, self.terrain.shape)
+            if np.nanmin(f_max, initial=0) < 0:
+                raise ValueError('f_max can not be negative')
+        self._f_max_cells = f_max
+        self._f_max_own = False
+
+    def set_barriers(self, barriers):
+        """
+        Sets how hard it is for animals to get into each cell when they migrate
+
+        An animal moving to a cell gets in with the chance of the cell, otherwise it stays
+        where it is, like when it tries to move into water.
+
+        Parameters
+        ----------
+        barriers: array or str
+            2-D array with the same shape as the map with a chance between 0 and 1 for each cell,
+            or a .npy file with it, which is memory-mapped. None for no barriers
+
+        Raises
+        ------
+        ValueError
+        """
+        if barriers is not None:
+            barriers = load_map_array(barriers, self.terrain.shape)
+            if not ((barriers >= 0) & (barriers <= 1)).all():
+                raise ValueError('The barriers must be between 0 and 1')
+        self._barriers = barriers
+
+    def _entry(self, loc):
+        """The chance that an animal gets into the cell at a location"""
+        return self._barriers[loc[0] - 1, loc[1] - 1]
+
+    def regrow(self):
+        """
+        Lets the fodder of all cells grow back for a new year, in one step for the whole island
+
+        Returns
+        -------
+        2-D array with the fodder of each cell, which is eaten from during the feeding
+        """
+        f_max = self.f_max_map()
+        if self.regrowth is None:
+            self.fodder = f_max
+        else:
+            fodder = np.asarray(self.regrowth(self.fodder, f_max), dtype=float)
+            self.fodder = np.clip(fodder, 0, f_max)
+        return self.fodder
+
+    def _cell(self, loc):
+        """
+        Finds the cell at a location, and makes it if it is the first time animals come there
+
+        Parameters
+        ----------
+        loc: tuple
+            (row, column) of the cell, from 1
+
+        Returns
+        -------
+        The cell, or None if animals can not be in that landscape
+        """
+        cell = self._cells.get(loc)
+        if cell is None:
+            landscape = _LANDSCAPES[self.terrain[loc[0] - 1, loc[1] - 1]]
+            if not landscape.move:
+                return None
+            cell = self._cells[loc] = landscape() if self.bin_width is None else \
+                CohortCell(landscape, Cohorts(Herbivore, self.bin_width),
+                           Cohorts(Carnivore, self.bin_width))
+        return cell
+
+    def to_cohorts(self, bin_width=1.):
+        """
+        Groups the animals in every cell into cohorts, see :mod:`biosim.cohorts`
+
+        The following years are simulated with the cohorts until :meth:`to_animals` is called.
+
+        Parameters
+        ----------
+        bin_width: float
+            width of the weight bins, animals with the same age and weight bin are grouped
+
+        Raises
+        ------
+        ValueError
+        """
+        if bin_width <= 0:
+            raise ValueError('bin_width must be strictly positive')
+        if self.bin_width is not None:
+            self.to_animals()
+        self.bin_width = bin_width
+        self._cells = {loc: CohortCell.from_cell(cell, bin_width)
+                       for loc, cell in self._cells.items()}
+
+    def to_animals(self):
+        """Makes one animal object for each animal in the cohorts again"""
+        if self.bin_width is not None:
+            self.bin_width = None
+            self._cells = {loc: cell.to_cell() for loc, cell in self._cells.items()}
+
     def migrate_season(self):
-        """Moves animals from one cell to another"""
-        for loc, cell in self.map.items():
-            move_to = [(loc[0]-1, loc[1]), (loc[0], loc[1]-1), (loc[0]+1, loc[1]), (loc[0], loc[1]+1)]
+        """
+        Moves animals from one cell to another
+
+        Returns
+        -------
+        int, how many animals moved to another cell
+        """
+        migrants = 0
+        entry = self._entry if self._barriers is not None else None
+        for loc, cell in list(self._cells.items()):    # cells may be made while animals are moving
             # The cells Animals can move to
-            herbivores, carnivores = cell.migration()   # gets the animals that are emigrating
-
-            for herbi in herbivores:
-                if (new_cell := self.map[random.choice(move_to)]).move:     # Checks if the animal can move to that cell
-                    new_cell.immigrating_herbivores.append(herbi)
-                else:
-                    cell.immigrating_herbivores.append(herbi)
-
-            for carni in carnivores:
-                if (new_cell := self.map[random.choice(move_to)]).move:
-                    new_cell.immigrating_carnivores.append(carni)
-                else:
-                    cell.immigrating_carnivores.append(carni)
-        for cell in self.map.values():
+            move_to = [(loc[0]-1, loc[1]), (loc[0], loc[1]-1),
+                       (loc[0]+1, loc[1]), (loc[0], loc[1]+1)]
+            if self.sampling == 'binomial':
+                migrants += cell.emigrate_binomial(move_to, self._cell, entry=entry)
+            else:
+                migrants += cell.emigrate(move_to, self._cell, entry=entry)
+        for cell in self._cells.values():
             cell.immigration()      # Immigrate the immigrating animals in each cell
-
-    def season(self):
-        """Everything that happens each year in correct order"""
-        for cell in self.map.values():
-            cell.feeding()
-
-        for cell in self.map.values():
+        return migrants
+
+    def feeding_season(self):
+        """Feeds the herbivores in every cell"""
+        fodder = self.regrow()
+        for (row, col), cell in self._cells.items():
+            cell.feeding(float(fodder[row - 1, col - 1]))
+            fodder[row - 1, col - 1] = cell.fodder   # what is left for next year
+
+    def carnivore_feeding_season(self):
+        """Feeds the carnivores in every cell"""
+        for cell in self._cells.values():
             cell.carnivore_feeding()
 
-        for cell in self.map.values():
+    def reproduction_season(self):
+        """Adds the new babies in every cell"""
+        for cell in self._cells.values():
             cell.reproduction()
 
-        self.migrate_season()
-
-        for cell in self.map.values():
+    def aging_season(self):
+        """Makes all the animals one year older"""
+        for cell in self._cells.values():
             cell.aging_animals()
 
-        for cell in self.map.values():
+    def weight_loss_season(self):
+        """Makes all the animals lose the yearly weight"""
+        for cell in self._cells.values():
             cell.weight_loss()
 
-        for cell in self.map.values():
-            cell.pop_reduction()
+    def death_season(self):
+        """Removes the animals that die in every cell"""
+        if self.sampling == 'binomial':
+            for cell in self._cells.values():
+                cell.pop_reduction_binomial()
+        else:
+            for cell in self._cells.values():
+                cell.pop_reduction()
+
+    # The methods for each part of the year, in the order they happen
+    PHASES = ('feeding_season', 'carnivore_feeding_season', 'reproduction_season', 'migrate_season',
+              'aging_season', 'weight_loss_season', 'death_season')
+
+    def season(self):
+        """Everything that happens each year in correct order"""
+        if self.instrument is not None:
+            self.instrument.run_season(self)
+        else:
+            for phase in self.PHASES:
+                getattr(self, phase)()
 
         self.year += 1
 
+    def run_years(self, num_years):
+        """
+        Runs many years in a row with as little work between the years as possible
+
+        Parameters
+        ----------
+        num_years: int
+            how many years to run
+        """
+        if self.instrument is not None:
+            for _ in range(num_years):
+                self.season()
+            return
+        phases = [getattr(self, phase) for phase in self.PHASES]
+        for _ in range(num_years):
+            for phase in phases:
+                phase()
+        self.year += num_years
+
     def amount_of_herbivores(self):
         """Count how many herbivores it is"""
-        return sum(cell.num_herbivores() for cell in self.map.values())
+        return sum(cell.num_herbivores() for cell in self._cells.values())
 
     def amount_of_carnivores(self):
         """Count how many carnivores it is"""
-        return sum(cell.num_carnivores() for cell in self.map.values())
+        return sum(cell.num_carnivores() for cell in self._cells.values())
 
     def new_animals(self, ani_pop):
         """
@@ -112,67 +531,120 @@ class Island:
         Parameters
         ----------
         ani_pop: list with dict
-            new animals that should be added to the Island
+            new animals that should be added to the Island. The pop of each location can also
+            be columns, see :meth:`Landscape.pop_animals`. Can also be a structured array with the
+            fields row, col, species, age and weight, or a CSV file with these columns
 
         Raises
         ------
         ValueError
         """
 
+        if isinstance(ani_pop, (str, os.PathLike)):
+            ani_pop = load_population(ani_pop)
+        if isinstance(ani_pop, np.ndarray):
+            ani_pop = self._split_locations(ani_pop)
+
         for animals in ani_pop:
-            loc_start = animals['loc']
-            if self.map[loc_start].move:
-                pop = animals['pop']
-                self.map[loc_start].pop_animals(pop)
-            else:
+            row, col = loc_start = animals['loc']
+            if not (1 <= row <= self.height and 1 <= col <= self.length):
+                raise ValueError(f'Location {loc_start} is not on the island')
+            if (cell := self._cell(loc_start)) is None:
                 raise ValueError('You can not place animals in Water')
+            cell.pop_animals(animals['pop'])
+
+    @staticmethod
+    def _split_locations(table):
+        """
+        Splits a table of animals into the list with one dict for each location
+
+        Parameters
+        ----------
+        table: structured array
+            with the fields row, col, species, age and weight
+
+        Returns
+        -------
+        list with dict, with the animals of each location as columns
+        """
+        table = table[np.lexsort((table['col'], table['row']))]
+        new_loc = (np.diff(table['row']) != 0) | (np.diff(table['col']) != 0)
+        return [{'loc': (int(animals['row'][0]), int(animals['col'][0])), 'pop': animals}
+                for animals in np.split(table, np.flatnonzero(new_loc) + 1) if len(animals) > 0]
 
     def herbivore_map(self):
         """Checks how many herbivores are on each coordinate and put them in a list"""
-        return [[self.map[(j, i)].num_herbivores() for i in range(1, self.length+1)] for j in range(1, self.height+1)]
+        return self.herbivore_counts().tolist()
 
     def carnivore_map(self):
         """Checks how many carnivores ar on each coordinate and put them in a list"""
-        return [[self.map[(j, i)].num_carnivores() for i in range(1, self.length+1)] for j in range(1, self.height+1)]
+        return self.carnivore_counts().tolist()
+
+    def herbivore_counts(self):
+        """
+        Returns
+        -------
+        2-D array with how many herbivores there are in each cell
+        """
+        counts = np.zeros((self.height, self.length), dtype=int)
+        rows, cols = self._cell_indices()
+        counts[rows, cols] = [cell.num_herbivores() for cell in self._cells.values()]
+        return counts
+
+    def carnivore_counts(self):
+        """
+        Returns
+        -------
+        2-D array with how many carnivores there are in each cell
+        """
+        counts = np.zeros((self.height, self.length), dtype=int)
+        rows, cols = self._cell_indices()
+        counts[rows, cols] = [cell.num_carnivores() for cell in self._cells.values()]
+        return counts
+
+    def _cell_indices(self):
+        """Row and column (from 0) of the cells in cells, in the same order"""
+        indices = np.array(list(self._cells), dtype=int).reshape(-1, 2) - 1
+        return indices[:, 0], indices[:, 1]
 
     def herbivore_ages(self):
         """Retrieves the age of all herbivores and put them in a list"""
         herbi_ages = []
-        for cell in self.map.values():
+        for cell in self._cells.values():
             herbi_ages.extend(cell.list_herbivores_ages())
         return herbi_ages
 
     def carnivore_ages(self):
         """Retrieves the age of all carnivores and put them in a list"""
         carni_ages = []
-        for cell in self.map.values():
+        for cell in self._cells.values():
             carni_ages.extend(cell.list_carnivores_ages())
         return carni_ages
 
     def herbivore_weights(self):
         """Retrieves the weight of all herbivores and put them in a list"""
         herbi_weights = []
-        for cell in self.map.values():
+        for cell in self._cells.values():
             herbi_weights.extend(cell.list_herbivores_weight())
         return herbi_weights
 
     def carnivore_weights(self):
         """Retrieves the weight of all carnivores and put them in a list"""
         carni_weights = []
-        for cell in self.map.values():
+        for cell in self._cells.values():
             carni_weights.extend(cell.list_carnivores_weight())
         return carni_weights
 
     def herbivore_fitness(self):
         """Retrieves the fitness of all herbivores and put them in a list"""
         herbi_fitness = []
-        for cell in self.map.values():
+        for cell in self._cells.values():
             herbi_fitness.extend(cell.list_herbivores_fitness())
         return herbi_fitness
 
     def carnivore_fitness(self):
         """Retrieves the fitness of all carnivores and put them in a list"""
         carni_fitness = []
-        for cell in self.map.values():
+        for cell in self._cells.values():
             carni_fitness.extend(cell.list_carnivores_fitness())
         return carni_fitness
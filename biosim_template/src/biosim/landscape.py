@@ -1,6 +1,126 @@
+import itertools
 import random
 
-from .animal import Herbivore, Carnivore
+import numpy as np
+
+from . import sampling
+from .animal import Animal, Herbivore, Carnivore
+from .counters import count
+from .sampling import rng
+
+# Species names, the species code of an animal is its index here
+SPECIES = ('Herbivore', 'Carnivore')
+
+# Number of fitness classes used when deaths and migration are drawn binomially
+FITNESS_CLASSES = 100
+
+# Number of directions an animal can move in
+_DIRECTIONS = 4
+
+
+def select_by_class(fitness, probability, classes=FITNESS_CLASSES):
+    """
+    Draws which animals an event happens to, with one binomial draw for each fitness class
+
+    The animals are grouped into classes of equal fitness width, and how many animals in a
+    class the event happens to is drawn from a binomial distribution with the mean probability
+    of the class. Which of the animals in the class it happens to is then drawn without
+    replacement, so there is no random number for each animal, only one draw for each class the
+    event happens in. Animals with a probability of 1 or more are always selected.
+
+    Parameters
+    ----------
+    fitness: array
+        the fitness of each animal
+    probability: array
+        the probability of the event for each animal
+    classes: int
+        number of fitness classes
+
+    Returns
+    -------
+    bool array, True for the animals the event happens to
+    """
+    probability = np.clip(probability, 0, 1)
+    selected = probability >= 1
+    group = np.minimum((np.asarray(fitness) * classes).astype(np.int64), classes - 1)
+    group[selected] = classes     # a class of its own, which is not drawn
+
+    sizes = np.bincount(group, minlength=classes + 1)
+    class_probability = np.bincount(group, weights=probability, minlength=classes + 1) / \
+        np.maximum(sizes, 1)
+    chosen = rng().binomial(sizes, class_probability)
+    chosen[classes] = 0
+
+    # The animals sorted by class, so the members of a class are a slice of order
+    order = np.argsort(group, kind='stable')
+    starts = np.cumsum(sizes) - sizes
+    for cls in np.flatnonzero(chosen):
+        members = order[starts[cls]:starts[cls] + sizes[cls]]
+        selected[members[rng().choice(sizes[cls], chosen[cls], replace=False)]] = True
+    return selected
+
+
+def passes_barrier(entry, loc):
+    """
+    Draws if an animal gets into the cell at a location
+
+    Parameters
+    ----------
+    entry: callable
+        gives the chance that an animal gets into the cell at a location, None if there are
+        no barriers
+    loc: tuple
+        the location the animal moves to
+
+    Returns
+    -------
+    True if the animal gets in. A random number is only drawn if the chance is between 0 and 1
+    """
+    if entry is None:
+        return True
+    chance = entry(loc)
+    return chance >= 1 or (chance > 0 and sampling.random() < chance)
+
+
+def split_species(species, ages, weights):
+    """
+    Splits columns of animals into the herbivores and the carnivores
+
+    Parameters
+    ----------
+    species: array
+        name or species code (index in SPECIES) of each animal
+    ages: array
+        age of each animal
+    weights: array
+        weight of each animal
+
+    Returns
+    -------
+    The ages and weights of the herbivores, and the ages and weights of the carnivores
+
+    Raises
+    ------
+    ValueError
+    """
+    species = np.asarray(species)
+    ages = np.asarray(ages)
+    weights = np.asarray(weights, dtype=float)
+    if not len(species) == len(ages) == len(weights):
+        raise ValueError('species, age and weight must have the same length')
+
+    if species.dtype.kind in 'iu':
+        if species.size and (species.min() < 0 or species.max() >= len(SPECIES)):
+            raise ValueError('Species code must be 0 (Herbivore) or 1 (Carnivore)')
+        is_herbi, is_carni = species == 0, species == 1
+    else:
+        is_herbi, is_carni = species == 'Herbivore', species == 'Carnivore'
+        if not (is_herbi | is_carni).all():
+            wrong = species[~(is_herbi | is_carni)][0]
+            raise ValueError(f"Species must be Herbivore or Carnivore, not {wrong}")
+
+    return ages[is_herbi], weights[is_herbi], ages[is_carni], weights[is_carni]
 
 
 class Landscape:
@@ -26,11 +146,13 @@ class Landscape:
                 raise KeyError(f'Invalid parameter name: {key}')
 
     def __init__(self, herbivores=None, carnivores=None):
+        count('allocations')
         self.herbivores = herbivores if herbivores is not None else []  # Empty list if no list are given
         self.carnivores = carnivores if carnivores is not None else []  # Empty list if no list are given
         self.immigrating_herbivores = []    # Lists of animals immigrating
         self.immigrating_carnivores = []
         self.fodder = self.f_max    # How much food that is available
+        self._fed_in_order = False  # herbivores still from the highest fitness after feeding
 
     def pop_animals(self, pop):
         """
@@ -38,11 +160,16 @@ class Landscape:
         Parameters
         ----------
         pop : list With Herbivore or Carnivore
+            one dict for each animal, or all the animals as columns, see :meth:`pop_columns`
 
         Raises
         ------
         ValueError
         """
+        if isinstance(pop, (dict, np.ndarray)):
+            self.pop_columns(pop['species'], pop['age'], pop['weight'])
+            return
+
         for animal in pop:
             if animal['species'] == 'Herbivore':
                 self.herbivores.append(Herbivore(animal['age'], animal['weight']))
@@ -52,6 +179,40 @@ class Landscape:
             else:       # Raises ValueError if the species are not Herbivore or Carnivore
                 raise ValueError(f"Species must be Herbivore or Carnivore, not {animal['species']}")
 
+    def copy(self):
+        """
+        Copies the cell and all the animals living in it
+
+        Returns
+        -------
+        A new cell of the same landscape type, independent of this one
+        """
+        cell = type(self)([herbi.copy() for herbi in self.herbivores],
+                          [carni.copy() for carni in self.carnivores])
+        cell.fodder = self.fodder
+        return cell
+
+    def pop_columns(self, species, ages, weights):
+        """
+        Sets many animals on the Island at once
+
+        Parameters
+        ----------
+        species: array
+            name or species code (index in SPECIES) of each animal
+        ages: array
+            age of each animal
+        weights: array
+            weight of each animal
+
+        Raises
+        ------
+        ValueError
+        """
+        herbi_ages, herbi_weights, carni_ages, carni_weights = split_species(species, ages, weights)
+        self.herbivores.extend(Herbivore.from_arrays(herbi_ages, herbi_weights))
+        self.carnivores.extend(Carnivore.from_arrays(carni_ages, carni_weights))
+
     def num_herbivores(self):
         """Finds the number of herbivores"""
         return len(self.herbivores)
@@ -60,15 +221,24 @@ class Landscape:
         """Finds the number of carnivores"""
         return len(self.carnivores)
 
-    def feeding(self):
-        """Feeds the herbivores in the landscape"""
-        self.fodder = self.f_max
-        self.herbivores = sorted(self.herbivores, key=lambda x: x.fitness, reverse=True)  # Sort herbivores by fitness
+    def feeding(self, fodder=None):
+        """
+        Feeds the herbivores in the landscape
+
+        Parameters
+        ----------
+        fodder: float
+            how much fodder there is, f_max if not given
+        """
+        self.fodder = self.f_max if fodder is None else fodder
+        Animal.sort_by_fitness(self.herbivores, descending=True)  # Sort herbivores by fitness
+        fed = 0
         for herbi in self.herbivores:
 
             if self.fodder >= herbi.params['F']:
                 self.fodder -= herbi.params['F']
                 herbi.add_weight(herbi.params['F'])
+                fed += 1
 
             elif self.fodder == 0:  # The herbivores dont get food, because there are no food left
                 break
@@ -76,18 +246,32 @@ class Landscape:
             else:  # If there are less food then a herbivore can eat
                 herbi.add_weight(self.fodder)  # the herbivore get the rest of the food
                 self.fodder = 0
+                fed += 1
                 break
 
+        # Only the fitness of the fed herbivores at the start has gone up, so the order holds
+        # if they are still in order, and the first herbivore that did not eat is not fitter
+        fitness = Animal.fitness_array(self.herbivores[:fed + 1])
+        self._fed_in_order = bool((fitness[:-1] >= fitness[1:]).all())
+
     def carnivore_feeding(self):
         """Feeds the carnivores if there are any herbivores"""
-        self.herbivores = sorted(self.herbivores, key=lambda x: x.fitness)
-        random.shuffle(self.carnivores)
+        # Usually still sorted the other way after feeding, and then it is enough to reverse.
+        # Herbivores with the same fitness come in the opposite order of a sort, but they
+        # nearly always have the same age and weight too
+        if self._fed_in_order:
+            self.herbivores.reverse()
+            self._fed_in_order = False
+        else:
+            Animal.sort_by_fitness(self.herbivores)
+        sampling.shuffle(self.carnivores)
 
         for carni in self.carnivores:
             alive_herbivores = self.herbivores
             hunger = carni.params['F']      # How much the carnivore can eat
 
-            for herbi in alive_herbivores:
+            tries = 0
+            for tries, herbi in enumerate(alive_herbivores, 1):
                 # Checks if the carnivore catch the herbivore
                 if (carni.fitness - herbi.fitness)/carni.params['DeltaPhiMax'] > random.random():
 
@@ -102,6 +286,7 @@ class Landscape:
                         hunger -= herbi.weight
                         carni.add_weight(herbi.weight)
                         self.herbivores.remove(herbi)
+            count('rng_draws', tries)     # one draw for each herbivore tried
 
     def reproduction(self):
         """Checks hoe many new babies there are and add them to the landscape"""
@@ -135,6 +320,117 @@ class Landscape:
         alive_carni = [carni for carni in self.carnivores if not carni.death()]
         self.carnivores = alive_carni
 
+    def pop_reduction_binomial(self, classes=FITNESS_CLASSES):
+        """
+        Removes the animals that die, drawn binomially for each fitness class
+
+        Parameters
+        ----------
+        classes: int
+            number of fitness classes, see :func:`select_by_class`
+        """
+        for species in ('herbivores', 'carnivores'):
+            animals = getattr(self, species)
+            if not animals:
+                continue
+            fitness = Animal.fitness_array(animals)
+            probability = np.where(Animal.weight_array(animals) == 0, 1.,
+                                   animals[0].params['omega'] * (1 - fitness))
+            dies = select_by_class(fitness, probability, classes)
+            setattr(self, species, list(itertools.compress(animals, (~dies).tolist())))
+
+    def emigrate_binomial(self, neighbours, cell_at, classes=FITNESS_CLASSES, entry=None):
+        """
+        Moves the animals that migrate, drawn binomially for each fitness class
+
+        The animals that leave are split over the four neighbours with one multinomial draw.
+
+        Parameters
+        ----------
+        neighbours: list
+            the four locations the animals can move to
+        cell_at: callable
+            gives the cell at a location, or None if animals can not move there
+        classes: int
+            number of fitness classes, see :func:`select_by_class`
+        entry: callable
+            gives the chance that an animal gets into the cell at a location, see
+            :func:`passes_barrier`. How many of the animals moving to a cell get in is drawn
+            binomially
+
+        Returns
+        -------
+        int, how many animals moved to another cell
+        """
+        migrants = 0
+        for species in ('herbivores', 'carnivores'):
+            animals = getattr(self, species)
+            if not animals:
+                continue
+            fitness = Animal.fitness_array(animals)
+            moves = select_by_class(fitness, animals[0].params['mu'] * fitness, classes)
+            if not moves.any():
+                continue
+            setattr(self, species, list(itertools.compress(animals, (~moves).tolist())))
+
+            # The movers in random order, and how many of them go in each direction
+            movers = [animals[i] for i in rng().permutation(np.flatnonzero(moves)).tolist()]
+            ends = np.cumsum(rng().multinomial(len(movers),
+                                               [1 / _DIRECTIONS] * _DIRECTIONS)).tolist()
+            for loc, start, end in zip(neighbours, [0] + ends[:-1], ends):
+                if start == end:
+                    continue
+                if (new_cell := cell_at(loc)) is None:
+                    new_cell = self     # can not move into water, so they stay
+                else:
+                    if entry is not None and (chance := entry(loc)) < 1:
+                        # The movers stopped by the barrier stay
+                        stopped = start + rng().binomial(end - start, max(chance, 0))
+                        getattr(self, 'immigrating_' + species).extend(movers[stopped:end])
+                        end = stopped
+                    migrants += end - start
+                getattr(new_cell, 'immigrating_' + species).extend(movers[start:end])
+        return migrants
+
+    def emigrate(self, neighbours, cell_at, entry=None):
+        """
+        Moves the animals that migrate to the immigration lists of the neighbour cells
+
+        Parameters
+        ----------
+        neighbours: list
+            the locations the animals can move to
+        cell_at: callable
+            gives the cell at a location, or None if animals can not move there
+        entry: callable
+            gives the chance that an animal gets into the cell at a location, see
+            :func:`passes_barrier`
+
+        Returns
+        -------
+        int, how many animals moved to another cell
+        """
+        migrants = 0
+        herbivores, carnivores = self.migration()   # gets the animals that are emigrating
+
+        for herbi in herbivores:
+            # Checks if the animal can move to that cell
+            if (new_cell := cell_at(loc := sampling.choice(neighbours))) is not None and \
+                    passes_barrier(entry, loc):
+                new_cell.immigrating_herbivores.append(herbi)
+                migrants += 1
+            else:
+                self.immigrating_herbivores.append(herbi)
+
+        for carni in carnivores:
+            if (new_cell := cell_at(loc := sampling.choice(neighbours))) is not None and \
+                    passes_barrier(entry, loc):
+                new_cell.immigrating_carnivores.append(carni)
+                migrants += 1
+            else:
+                self.immigrating_carnivores.append(carni)
+        return migrants
+
     def migration(self):
         """
         Sorts the animal that are going to migrate and those who will stand still
@@ -0,0 +1,97 @@
+"""
+Random number generator for the parts of the simulation that work on arrays.
+
+The animals drawn one by one use the ``random`` module through the functions here, while the
+parts that draw many numbers at once, like the cohorts in :mod:`biosim.cohorts`, use the numpy
+generator. :class:`biosim.simulation.BioSim` seeds both with the same seed. Each call is counted
+as a draw by :mod:`biosim.counters`.
+"""
+
+import random as _random
+
+import numpy as np
+
+from . import counters
+from .counters import count
+
+_rng = np.random.default_rng()
+
+
+def seed(value):
+    """
+    Seeds the generator
+
+    Parameters
+    ----------
+    value: int
+        the seed
+    """
+    global _rng
+    _rng = np.random.default_rng(value)
+
+
+def rng():
+    """
+    Returns
+    -------
+    The numpy Generator used by the simulation, call once for each draw so it is counted
+    """
+    count('rng_draws')
+    return _rng
+
+
+def random():
+    """
+    Returns
+    -------
+    A random number between 0 and 1 from the random module
+    """
+    if counters.num_enabled:
+        count('rng_draws')
+    return _random.random()
+
+
+def gauss(mu, sigma):
+    """
+    Parameters
+    ----------
+    mu: float
+        the mean
+    sigma: float
+        the standard deviation
+
+    Returns
+    -------
+    A normally distributed random number from the random module
+    """
+    if counters.num_enabled:
+        count('rng_draws')
+    return _random.gauss(mu, sigma)
+
+
+def choice(seq):
+    """
+    Parameters
+    ----------
+    seq: sequence
+        what to choose from
+
+    Returns
+    -------
+    A random element of seq, chosen with the random module
+    """
+    count('rng_draws')
+    return _random.choice(seq)
+
+
+def shuffle(seq):
+    """
+    Shuffles a list in place with the random module
+
+    Parameters
+    ----------
+    seq: list
+        the list
+    """
+    count('rng_draws')
+    _random.shuffle(seq)
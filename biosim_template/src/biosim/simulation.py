@@ -38,25 +38,362 @@ Example
                  img_base='sample', vis_years=1)
     sim.simulate(50)
     sim.make_movie()
+
+Headless mode
+-------------
+With ``vis_years=0`` nothing is visualised and no images are saved, and the
+simulation runs without ever importing the graphics module or matplotlib.
+This keeps the import and start-up time low for batch runs, e.g. when every
+simulation is run in its own process::
+
+    sim = BioSim(geogr, ini_herbs + ini_carns, seed=1, vis_years=0,
+                 log_file='counts.csv')
+    sim.simulate(500)
+
+For long runs where only the numbers of animals now and then are needed, ``run_batch``
+runs the years between two reports without any work between the years::
+
+    counts = sim.run_batch(100000, report_every=1000)
+
+Streaming the results
+---------------------
+``iter_years`` gives a small record for each year as the simulation runs, so the results can
+be used as they come, without graphics or reading the log file. Only the fields asked for are
+computed::
+
+    for record in sim.iter_years(500, fields=('counts', 'age')):
+        herbivores = record['counts']['Herbivore']
+        ages, bins = record['age']['Herbivore'], record['age']['bins']
+
+In an asyncio program, such as a web service running many simulations, ``aiter_years`` gives
+the same records without blocking the event loop, as the years are simulated in a thread::
+
+    async for record in sim.aiter_years(500):
+        await send(record['counts'])
+
+Fast-forward
+------------
+Long runs spend most of their time in a statistical equilibrium. With ``fast_forward`` the
+simulation watches the number of animals in each cell and the mean age and weight, and
+when they have stopped changing the animals are grouped into cohorts of the same age and
+weight, see :mod:`biosim.cohorts`. Dense cells are then simulated many times faster::
+
+    sim.simulate(100000, fast_forward={'window': 50, 'tolerance': 0.1})
+    sim.Island.to_animals()     # single animals again
+
+Parameter schedules
+-------------------
+Seasons or a changing climate can be given to ``simulate`` as a schedule, instead of
+changing the parameters between many short runs. For each species or landscape letter, a
+parameter is given one value for each year, or a dict with the year (from the start of the
+run) each value starts in::
+
+    sim.simulate(300, schedule={'L': {'f_max': {0: 800, 100: 300, 200: 800}},
+                                'Herbivore': {'mu': np.linspace(0.25, 0.5, 300)}})
+
+The schedule is turned into the few years where a parameter changes before the run starts,
+and the parameters keep their last values after the run.
 """
 from .island import Island
 from .animal import Herbivore, Carnivore
+from .counters import EventCounters
+from .sampling import seed as seed_generator
 from .landscape import Dessert, Highland, Lowland, Water
+import collections
+import contextlib
+import copy
 import random
-from .graphics import Graphics
+import warnings
+
+import numpy as np
+
+# The classes changed by set_animal_parameters and set_landscape_parameters
+_ANIMALS = {'Herbivore': Herbivore, 'Carnivore': Carnivore}
+_LANDSCAPES = {'L': Lowland, 'H': Highland, 'D': Dessert}
 
+# The fields iter_years can give for each year
+FIELDS = ('counts', 'count_maps', 'age', 'weight', 'fitness')
+
+# bins used for the histograms if no hist_specs are given, the same as in the graphics
+_DEFAULT_HIST_SPECS = {'age': {'max': 60.0, 'delta': 2},
+                       'weight': {'max': 60.0, 'delta': 2},
+                       'fitness': {'max': 1.0, 'delta': 0.05}}
 
 # The material in this file is licensed under the BSD 3-clause license
 # https://opensource.org/licenses/BSD-3-Clause
 # (C) Copyright 2021 Hans Ekkehard Plesser / NMBU
 
 
+def _check_stop(stop):
+    """
+    Checks that the stop conditions of simulate are valid
+
+    Raises
+    ------
+    ValueError, KeyError
+    """
+    if stop is None:
+        return
+    for key, value in stop.items():
+        if key == 'extinct':
+            if value not in ('all', 'any', 'Herbivore', 'Carnivore'):
+                raise ValueError(f'extinct must be all, any, Herbivore or Carnivore, not {value}')
+        elif key in ('below', 'above'):
+            for species in value:
+                if species not in ('Herbivore', 'Carnivore'):
+                    raise KeyError(f'Species in {key} must be Herbivore or Carnivore, '
+                                   f'not {species}')
+        elif key == 'steady':
+            if value.get('window', 0) < 2 or value.get('tolerance', -1) < 0:
+                raise ValueError('steady needs a window of at least 2 years and a tolerance of 0 '
+                                 'or more')
+        else:
+            raise KeyError(f'Key in stop must be extinct, below, above or steady, not {key}')
+
+
+def _stop_reason(stop, counts, history):
+    """
+    Checks if the simulation should stop
+
+    Parameters
+    ----------
+    stop: dict
+        the stop conditions, see :meth:`BioSim.simulate`
+    counts: dict
+        number of animals of each species this year
+    history: deque
+        the counts of the last years, this year is added to it. None if steady is not used
+
+    Returns
+    -------
+    str with the reason to stop, or None to go on
+    """
+    extinct = stop.get('extinct')
+    if extinct == 'all' and not any(counts.values()):
+        return 'extinct'
+    if extinct == 'any' and not all(counts.values()):
+        return 'extinct'
+    if extinct in counts and counts[extinct] == 0:
+        return f'{extinct} extinct'
+
+    for species, limit in stop.get('below', {}).items():
+        if counts[species] < limit:
+            return f'{species} below {limit}'
+    for species, limit in stop.get('above', {}).items():
+        if counts[species] > limit:
+            return f'{species} above {limit}'
+
+    if history is not None:
+        history.append(counts)
+        if len(history) == history.maxlen:
+            tolerance = stop['steady']['tolerance']
+            for species in counts:
+                numbers = [year[species] for year in history]
+                if max(numbers) - min(numbers) > tolerance * sum(numbers) / len(numbers):
+                    return None
+            return 'steady'
+    return None
+
+
+def _check_parameters(key, params):
+    """
+    Raises the errors set_animal_parameters or set_landscape_parameters would raise, without
+    changing any parameters
+
+    Raises
+    ------
+    KeyError, ValueError
+    """
+    if key in _ANIMALS:
+        cls = _ANIMALS[key]
+        type(key, (cls,), {'params': dict(cls.params)}).set_params(params)
+    elif key in _LANDSCAPES:
+        type(key, (_LANDSCAPES[key],), {}).food_params(params)
+    else:
+        raise KeyError(f'Schedule keys must be Herbivore, Carnivore, L, H or D, not {key}')
+
+
+def _compile_schedule(schedule, num_years):
+    """
+    Finds the years of a run where the schedule changes a parameter
+
+    Parameters
+    ----------
+    schedule: dict
+        see :meth:`BioSim.simulate`
+    num_years: int
+        number of years in the run
+
+    Returns
+    -------
+    dict with the year (from 0) as key, and a dict with the new parameters of each species
+    and landscape in that year
+
+    Raises
+    ------
+    KeyError, ValueError
+    """
+    changes = {}
+    for key, parameters in schedule.items():
+        for name, values in parameters.items():
+            if isinstance(values, dict):
+                if any(year < 0 for year in values):
+                    raise ValueError(f'The years of the schedule for {name} can not be negative')
+                steps = sorted(values.items())
+            else:
+                values = np.asarray(values, dtype=float)
+                if values.ndim != 1 or values.size == 0:
+                    raise ValueError(f'The schedule for {name} must be a list with one value for '
+                                     f'each year')
+                # Only the years where the value changes, the last value is kept after the list
+                years = np.concatenate(([0], np.flatnonzero(np.diff(values)) + 1))
+                steps = zip(years.tolist(), values[years].tolist())
+            for year, value in steps:
+                if year < num_years:
+                    changes.setdefault(year, {}).setdefault(key, {})[name] = value
+
+    for year_changes in changes.values():
+        for key, params in year_changes.items():
+            _check_parameters(key, params)
+    return changes
+
+
+def _check_fields(fields):
+    """
+    Checks the fields asked for from iter_years
+
+    Parameters
+    ----------
+    fields: str or sequence
+        one field or several fields from FIELDS
+
+    Returns
+    -------
+    tuple with the fields
+
+    Raises
+    ------
+    KeyError
+    """
+    fields = (fields,) if isinstance(fields, str) else tuple(fields)
+    for field in fields:
+        if field not in FIELDS:
+            raise KeyError(f'Field must be one of {", ".join(FIELDS)}, not {field}')
+    return fields
+
+
+def _year_seed(base, step):
+    """
+    The seed of the kernels of the array engine for one year of iter_years
+
+    Parameters
+    ----------
+    base: int
+        seed drawn at the start of the run, or None for the object engine
+    step: int
+        the year from the start of the run
+
+    Returns
+    -------
+    int, or None if base is None
+    """
+    if base is None:
+        return None
+    return int(np.random.SeedSequence([base, step]).generate_state(1)[0])
+
+
+def _choose_engine(engine, bin_width, sampling, counters):
+    """
+    Checks the engine, and falls back to the object engine if numba is not installed
+
+    Returns
+    -------
+    str, the engine to use
+
+    Raises
+    ------
+    ValueError
+    """
+    if engine not in ('object', 'array'):
+        raise ValueError(f'engine must be object or array, not {engine}')
+    if engine == 'array':
+        if bin_width is not None:
+            raise ValueError('bin_width can not be used with the array engine')
+        if sampling != 'animal':
+            raise ValueError('sampling can not be used with the array engine')
+        if counters:
+            raise ValueError('The counters do not count the kernels of the array engine')
+        from .array_engine import HAVE_NUMBA
+        if not HAVE_NUMBA:
+            warnings.warn('numba is not installed, the object engine is used instead of the array '
+                          'engine', RuntimeWarning, stacklevel=3)
+            return 'object'
+    return engine
+
+
+def _fast_forward_settings(fast_forward):
+    """
+    Fills in the default settings of fast_forward
+
+    Raises
+    ------
+    KeyError, ValueError
+    """
+    settings = {'window': 50, 'tolerance': 0.1, 'bin_width': 1.}
+    for key, value in fast_forward.items():
+        if key not in settings:
+            raise KeyError(f'Key in fast_forward must be window, tolerance or bin_width, not {key}')
+        settings[key] = value
+    if settings['window'] < 2 or settings['tolerance'] < 0 or settings['bin_width'] <= 0:
+        raise ValueError('fast_forward needs a window of at least 2, tolerance of 0 or more and '
+                         'a strictly positive bin_width')
+    return settings
+
+
+def _summary(island):
+    """
+    The numbers compared to find out if the simulation has converged
+
+    Returns
+    -------
+    tuple with the number of animals in each cell, and the mean age and weight of each species
+    """
+    counts = np.concatenate((island.herbivore_counts().ravel(), island.carnivore_counts().ravel()))
+    means = [np.mean(values) if len(values) else 0. for values in
+             (island.herbivore_ages(), island.carnivore_ages(),
+              island.herbivore_weights(), island.carnivore_weights())]
+    return counts, np.array(means)
+
+
+def _converged(summaries, tolerance):
+    """
+    Checks if the first and second half of the summaries have the same mean
+
+    The sum of the changes of the mean number of animals in each cell must be less than
+    tolerance times the number of animals, and the mean age and weight of each species must
+    change less than tolerance times their value.
+
+    Returns
+    -------
+    True if the simulation has converged
+    """
+    half = len(summaries) // 2
+    counts = np.array([summary[0] for summary in summaries])
+    means = np.array([summary[1] for summary in summaries])
+    count_change = np.abs(counts[:half].mean(axis=0) - counts[half:].mean(axis=0)).sum()
+    mean_change = np.abs(means[:half].mean(axis=0) - means[half:].mean(axis=0))
+    return bool(count_change <= tolerance * max(counts.mean(axis=0).sum(), 1) and
+                (mean_change <= tolerance * np.abs(means.mean(axis=0))).all())
+
+
 class BioSim:
     """Simulation class for BioSim"""
     def __init__(self, island_map, ini_pop, seed,
                  vis_years=1, ymax_animals=None, cmax_animals=None, hist_specs=None,
                  img_dir=None, img_base=None, img_fmt='png', img_years=None,
-                 log_file=None):
+                 log_file=None, async_graphics=None, stream_movie=False, img_workers=None,
+                 instrument=None, counters=False, bin_width=None, sampling='animal',
+                 engine='object', regrowth=None, f_max=None, barriers=None):
         """
 
         Parameters
@@ -64,11 +401,12 @@ class BioSim:
         island_map: string
             Multi-line string that describe the Island and ist terrain
         ini_pop: list
-            list with dictionaries that describes the initial population on the island
+            list with dictionaries that describes the initial population on the island, or the
+            animals as a table, see :meth:`add_population`
         seed: int
             decide which random number to use
         vis_years: int
-            years between each visualization update
+            years between each visualization update, 0 gives headless mode without graphics
         ymax_animals: int
             sets the y-max limit on the animal graph
         cmax_animals: dict
@@ -85,14 +423,68 @@ class BioSim:
             years between the images is saved
         log_file:
             if given, write animal counts to the file
+        async_graphics: dict
+            if given, the graphics are drawn and saved in a separate thread. Can have the keys
+            queue_size (int) and policy ('block', 'drop' or 'coalesce'), see
+            :class:`biosim.graphics.AsyncGraphics`. Needs a matplotlib backend without a
+            window, such as Agg
+        stream_movie: bool
+            if True, the frames are sent straight to ffmpeg instead of being saved as images,
+            and the movie is ready when simulate returns. Needs img_dir
+        img_workers: int
+            if given, the images are drawn and saved by this many processes in parallel,
+            make_movie() then waits for them before making the movie
+        instrument: Instrumentation
+            if given, the time and the births, deaths, kills and migrants of each phase of
+            every year are recorded, see :mod:`biosim.instrumentation`
+        counters: bool
+            if True, the fitness updates, random numbers, sorts and allocations of each
+            simulate() call are counted, see :meth:`stats`. Off by default, as counting makes
+            the simulation slower
+        bin_width: float
+            if given, the animals are counted in cohorts of the same age and weight bin of this
+            width instead of one object for each animal, see :mod:`biosim.cohorts`. Much faster
+            for dense cells, but an approximation
+        sampling: str
+            'binomial' to draw deaths and migration for each fitness class of a cell at once
+            instead of one random number for each animal ('animal'), which uses far fewer
+            calls to the random number generator
+        engine: str
+            'object' for one Python object for each animal, or 'array' to keep the animals in
+            arrays and run the year with kernels compiled by numba, see
+            :mod:`biosim.array_engine`. Uses the object engine with a warning if numba is not
+            installed. The array engine can not be used with bin_width, sampling, counters
+            or fast_forward
+        regrowth: callable
+            if given, the fodder left in a cell is kept to the next year and grows back by
+            this rule instead of being reset to f_max, see :class:`biosim.island.Island`
+        f_max: array or str
+            if given, a 2-D array with the most fodder of each cell, or a .npy file with it which
+            is memory-mapped. Cells with nan use the f_max of their landscape
+        barriers: array or str
+            if given, a 2-D array or .npy file with the chance between 0 and 1 that an animal
+            gets into each cell when it migrates
 
         Raises
         ------
-        KeyError
+        KeyError, ValueError
         """
 
+        if stream_movie and img_dir is None:
+            raise ValueError('img_dir must be given to stream the movie')
         random.seed(seed)
-        self.Island = Island(island_map, ini_pop)
+        seed_generator(seed)
+        self.engine = _choose_engine(engine, bin_width, sampling, counters)
+        if self.engine == 'array':
+            from .array_engine import ArrayIsland
+            self.Island = ArrayIsland(island_map, ini_pop, instrument=instrument, regrowth=regrowth,
+                                      f_max=f_max, barriers=barriers)
+            self.Island.seed(seed)
+        else:
+            self.Island = Island(island_map, ini_pop, instrument=instrument, bin_width=bin_width,
+                                 sampling=sampling, regrowth=regrowth, f_max=f_max,
+                                 barriers=barriers)
+        self._bin_width = bin_width
         self.Island_map = island_map
 
         self.cmax_herbivore = None
@@ -122,10 +514,23 @@ class BioSim:
                 else:
                     raise KeyError(f'Key in hist_specs must be age, fitness or weight, not {ani}')
 
-        self._graphics = Graphics(self.Island_map, vis_years=vis_years, img_fmt=img_fmt, ymax_animals=ymax_animals,
-                                  cmax_herbi=self.cmax_herbivore, cmax_carni=self.cmax_carnivore,
-                                  hist_specs_age=self.hist_specs_age, hist_specs_fitness=self.hist_specs_fitness,
-                                  hist_specs_weight=self.hist_specs_weight, img_dir=img_dir, img_name=img_base)
+        # Kept so that branches made by fork() can get their own graphics
+        self._graphics_params = dict(vis_years=vis_years, img_fmt=img_fmt,
+                                     ymax_animals=ymax_animals,
+                                     cmax_herbi=self.cmax_herbivore, cmax_carni=self.cmax_carnivore,
+                                     hist_specs_age=self.hist_specs_age,
+                                     hist_specs_fitness=self.hist_specs_fitness,
+                                     hist_specs_weight=self.hist_specs_weight,
+                                     stream_movie=stream_movie, img_workers=img_workers)
+        self._img_dir = img_dir
+
+        if async_graphics is not None:
+            for key in async_graphics:
+                if key not in ('queue_size', 'policy'):
+                    raise KeyError(f'Key in async_graphics must be queue_size or policy, not {key}')
+        self._async_graphics = async_graphics
+
+        self._graphics = self._make_graphics(img_dir, img_base)
 
         self._year = 0
         self._final_year = None
@@ -133,7 +538,33 @@ class BioSim:
         self.vis_years = vis_years
         self.img_years = img_years
 
+        self._counters = EventCounters() if counters else None
+
         self.log_file = log_file
+        self._start_log()
+
+    def _make_graphics(self, img_dir, img_base):
+        """
+        Makes the graphics for the simulation
+
+        matplotlib is only imported here, so it is never imported in headless mode
+
+        Returns
+        -------
+        Graphics or AsyncGraphics, or None if vis_years is 0
+        """
+        if self._graphics_params['vis_years'] == 0:
+            return None
+
+        from .graphics import Graphics, AsyncGraphics
+        graphics = Graphics(self.Island_map, img_dir=img_dir, img_name=img_base,
+                            **self._graphics_params)
+        if self._async_graphics is not None:
+            return AsyncGraphics(graphics, **self._async_graphics)
+        return graphics
+
+    def _start_log(self):
+        """Writes the header and the current animal counts to the log file, if given"""
         if self.log_file is not None:
             with open(self.log_file, 'w') as f:
                 f.write(f"{'Year'}, {'Num herbivores'}, {'Num carnivores'}, {'Tot animals'} \n"
@@ -190,7 +621,7 @@ class BioSim:
         else:
             raise NameError(f'Landscape has to be L, H or D')
 
-    def simulate(self, num_years):
+    def simulate(self, num_years, stop=None, fast_forward=None, schedule=None):
         """
         Run the simulation while the result are being visualized
 
@@ -198,12 +629,47 @@ class BioSim:
         ----------
         num_years: int
             how many years the simulation are gong to run
+        stop: dict
+            conditions that end the simulation early, checked after each year. Can have the keys
+
+            - extinct: 'all' (no animals left), 'any' (one species gone), 'Herbivore' or 'Carnivore'
+            - below: dict with the species and the number of animals to stop below
+            - above: dict with the species and the number of animals to stop above
+            - steady: dict with window (years) and tolerance, stops when the number of each
+              species has changed less than tolerance times its mean in the last window years
+        fast_forward: dict
+            if given, the animals are grouped into cohorts (see :mod:`biosim.cohorts`) when the
+            simulation has converged, and the rest of the years run much faster with cohorts. Can
+            have the keys window (years to compare, 50 if not given), tolerance (largest relative
+            change between the first and second half of the window, 0.1 if not given) and
+            bin_width (width of the weight bins of the cohorts, 1 if not given). The animals
+            stay in cohorts until simulate is called without fast_forward, or
+            ``Island.to_animals()`` is called. Does nothing if the simulation was made with
+            bin_width
+        schedule: dict
+            parameters that change during the run. The keys are species names or landscape
+            letters, like in :meth:`set_animal_parameters` and :meth:`set_landscape_parameters`,
+            and the values dicts with a schedule for each parameter. A schedule is a list or
+            array with the value of each year (the last value is kept if it is shorter than the
+            run), or a dict with the year from the start of the run where each value starts
+
+        Returns
+        -------
+        str with the reason the simulation stopped early, or None if it ran all the years
 
         Raises
         ------
-        ValueError
+        ValueError, KeyError
         """
 
+        _check_stop(stop)
+        changes = _compile_schedule(schedule, num_years) if schedule is not None else None
+        if fast_forward is not None:
+            if self.engine == 'array':
+                raise ValueError('fast_forward can not be used with the array engine')
+            fast_forward = _fast_forward_settings(fast_forward)
+        elif self._bin_width is None:
+            self.Island.to_animals()
         self._final_year = self._year + num_years
 
         if self.img_years is None:
@@ -215,17 +681,57 @@ class BioSim:
 
             self._graphics.setup(self._final_year, self.img_years)
 
+        if self._counters is not None:
+            self._counters.reset()
+            self._counters.enable()
+        try:
+            reason = self._simulate_years(stop, fast_forward, changes)
+        finally:
+            if self._counters is not None:
+                self._counters.disable()
+
+        if self.vis_years != 0:
+            self._graphics.finish()     # waits for frames still being drawn
+        return reason
+
+    def _simulate_years(self, stop=None, fast_forward=None, changes=None):
+        """
+        Simulates until the final year or a stop condition, with visualization and logging
+
+        When fast_forward is given, the animals are grouped into cohorts when the simulation
+        has converged. changes has the parameters to set at the start of some of the years,
+        see :func:`_compile_schedule`
+
+        Returns
+        -------
+        str with the reason for stopping early, or None
+        """
+        history = collections.deque(maxlen=stop['steady']['window']) \
+            if stop is not None and 'steady' in stop else None
+        summaries = collections.deque(maxlen=fast_forward['window']) \
+            if fast_forward is not None else None
+        start = self._year
         while self._year < self._final_year:
+            if changes and (year_changes := changes.get(self._year - start)) is not None:
+                self._set_parameters(year_changes)
             self.Island.season()
             self._year += 1
 
+            if summaries is not None and self.Island.bin_width is None:
+                summaries.append(_summary(self.Island))
+                if len(summaries) == summaries.maxlen and \
+                        _converged(summaries, fast_forward['tolerance']):
+                    self.Island.to_cohorts(fast_forward['bin_width'])
+            if self._counters is not None:
+                self._counters.end_year()
+
             if self.vis_years != 0:
                 if self._year % self.vis_years == 0:
                     self._graphics.update(self._year,
                                           self.Island.amount_of_herbivores(),
                                           self.Island.amount_of_carnivores(),
-                                          self.Island.herbivore_map(),
-                                          self.Island.carnivore_map(),
+                                          self.Island.herbivore_counts(),
+                                          self.Island.carnivore_counts(),
                                           self.Island.herbivore_ages(),
                                           self.Island.carnivore_ages(),
                                           self.Island.herbivore_weights(),
@@ -233,10 +739,311 @@ class BioSim:
                                           self.Island.herbivore_fitness(),
                                           self.Island.carnivore_fitness())
 
-            if self.log_file is not None:
-                with open(self.log_file, 'a') as f:
-                    f.write(f"{self.year}, {self.Island.amount_of_herbivores()}, "
-                            f"{self.Island.amount_of_carnivores()}, {self.num_animals}\n")
+            self._log_year()
+
+            if stop is not None:
+                reason = _stop_reason(stop, self.num_animals_per_species, history)
+                if reason is not None:
+                    return reason
+        return None
+
+    def _log_year(self, line=None):
+        """Writes the animal counts of this year, or the line given, to the log file, if given"""
+        if self.log_file is not None:
+            with open(self.log_file, 'a') as f:
+                f.write(self._log_line() if line is None else line)
+
+    def _log_line(self):
+        """The line of the log file with the animal counts of this year, None without a log"""
+        if self.log_file is None:
+            return None
+        return (f"{self.year}, {self.Island.amount_of_herbivores()}, "
+                f"{self.Island.amount_of_carnivores()}, {self.num_animals}\n")
+
+    def _set_parameters(self, year_changes):
+        """Sets the parameters of species and landscapes, from a dict with a dict for each"""
+        for key, params in year_changes.items():
+            if key in _ANIMALS:
+                self.set_animal_parameters(key, params)
+            else:
+                self.set_landscape_parameters(key, params)
+
+    def run_batch(self, num_years, report_every=None, schedule=None):
+        """
+        Runs many years as fast as possible, and only finds the number of animals now and then
+
+        Nothing is drawn, and there are no stop conditions. The island runs all the years
+        between two reports in one call to :meth:`Island.run_years`, without any work between
+        the years. Fastest with ``engine='array'``. With counters, the years are run one at a
+        time, so :meth:`stats` has the counts of each year like after :meth:`simulate`.
+
+        Parameters
+        ----------
+        num_years: int
+            how many years to run
+        report_every: int
+            years between each time the animals are counted, only the last year if not given.
+            The counts are also written to the log file, if given
+        schedule: dict
+            parameters that change during the run, see :meth:`simulate`
+
+        Returns
+        -------
+        dict with the arrays year, Herbivore and Carnivore, with the number of animals at the
+        end of each reported year
+
+        Raises
+        ------
+        KeyError, ValueError
+        """
+        if num_years < 0:
+            raise ValueError('num_years can not be negative')
+        if report_every is not None and report_every <= 0:
+            raise ValueError('report_every must be strictly positive')
+        report_every = report_every or num_years or 1
+        changes = _compile_schedule(schedule, num_years) if schedule is not None else {}
+        if self._bin_width is None:
+            self.Island.to_animals()
+
+        reports = set(range(report_every, num_years, report_every)) | {num_years}
+        records = {'year': [], 'Herbivore': [], 'Carnivore': []}
+        if self._counters is not None:
+            self._counters.reset()
+            self._counters.enable()
+        try:
+            done = 0
+            for step in sorted(reports | set(changes)):
+                if self._counters is None:
+                    self.Island.run_years(step - done)
+                else:
+                    # one year at a time, so the counts of each year are kept like in simulate
+                    for _ in range(step - done):
+                        self.Island.run_years(1)
+                        self._counters.end_year()
+                self._year += step - done
+                done = step
+                if step in changes:
+                    self._set_parameters(changes[step])
+                if step in reports:
+                    records['year'].append(self._year)
+                    records['Herbivore'].append(self.Island.amount_of_herbivores())
+                    records['Carnivore'].append(self.Island.amount_of_carnivores())
+        finally:
+            if self._counters is not None:
+                self._counters.disable()
+
+        if self.log_file is not None:
+            with open(self.log_file, 'a') as f:
+                for year, herbivores, carnivores in zip(*records.values()):
+                    f.write(f"{year}, {herbivores}, {carnivores}, {herbivores + carnivores}\n")
+        return {key: np.array(values, dtype=int) for key, values in records.items()}
+
+    def iter_years(self, num_years, fields=('counts',), schedule=None):
+        """
+        Runs the simulation one year at a time, and gives a record of each year
+
+        The next year is only simulated when the next record is asked for, so the records
+        can be used as they come and the loop can be stopped at any time. Nothing is drawn,
+        but the counts are written to the log file, if given.
+
+        Parameters
+        ----------
+        num_years: int
+            how many years to run at most
+        fields: str or sequence
+            what each record has, from FIELDS. 'counts' is the number of each species,
+            'count_maps' a 2-D array with the number of each species in each cell, and 'age',
+            'weight' and 'fitness' histograms of each species, with the bins from hist_specs
+        schedule: dict
+            parameters that change during the run, see :meth:`simulate`
+
+        Returns
+        -------
+        generator giving a dict for each year, with the year and the fields asked for.
+        'counts' and 'count_maps' are dicts with a value for each species, and the
+        histograms dicts with the counts of each species and the edges of the bins in 'bins'
+
+        Raises
+        ------
+        KeyError, ValueError
+        """
+        fields, changes, bins, kernel_seed = self._start_years(num_years, fields, schedule)
+        return self._iter_years(num_years, fields, changes, bins, kernel_seed)
+
+    def aiter_years(self, num_years, fields=('counts',), schedule=None, executor=None,
+                    prefetch=False):
+        """
+        Runs the simulation one year at a time in an executor, for use with ``async for``
+
+        Gives the same records as :meth:`iter_years`, but the years are simulated in a thread
+        so the event loop can do other work in the meantime. At most one year is simulated
+        before its record is taken, so a slow consumer slows down the simulation. When the
+        loop is cancelled or stopped, the year being simulated is finished first, so the
+        simulation is always left between two years. Without prefetch, that is the year of the
+        last record.
+
+        Several simulations can be run at the same time, but they share the random number
+        generators and the parameters of the species and landscapes, so their results can not
+        be repeated from the seeds, and they should not change parameters or use counters.
+
+        Parameters
+        ----------
+        num_years: int
+            how many years to run at most
+        fields: str or sequence
+            what each record has, see :meth:`iter_years`
+        schedule: dict
+            parameters that change during the run, see :meth:`simulate`
+        executor: concurrent.futures.Executor
+            where the years are simulated, a new thread for this run if not given. Must run
+            in this process, as the island is not copied
+        prefetch: bool
+            if True, the next year is simulated while the record of the year before is used.
+            If the loop is then stopped early, the simulation is left one year after the last
+            record, but that year is not written to the log file
+
+        Returns
+        -------
+        asynchronous generator giving a dict for each year
+
+        Raises
+        ------
+        KeyError, ValueError
+        """
+        import concurrent.futures
+
+        if isinstance(executor, concurrent.futures.ProcessPoolExecutor):
+            raise ValueError('The years must be simulated in this process, use a '
+                             'ThreadPoolExecutor')
+        fields, changes, bins, kernel_seed = self._start_years(num_years, fields, schedule)
+        return self._aiter_years(num_years, fields, changes, bins, kernel_seed, executor, prefetch)
+
+    async def _aiter_years(self, num_years, fields, changes, bins, kernel_seed, executor, prefetch):
+        """Asynchronous generator behind aiter_years, simulates one year for each record"""
+        # Only imported here, as asyncio takes long to import and is not needed for other runs
+        import asyncio
+        import concurrent.futures
+
+        own_executor = executor is None
+        if own_executor:
+            executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        pending = None      # the year being simulated
+        try:
+            for step in range(num_years):
+                if pending is None:
+                    pending = executor.submit(self._next_year, fields, changes.get(step), bins,
+                                              _year_seed(kernel_seed, step))
+                record, line = await asyncio.wrap_future(pending)
+                pending = None
+                if prefetch and step + 1 < num_years:
+                    pending = executor.submit(self._next_year, fields, changes.get(step + 1), bins,
+                                              _year_seed(kernel_seed, step + 1))
+                self._log_year(line)
+                yield record
+        finally:
+            # a season can not be stopped halfway, so wait for the one being simulated
+            if pending is not None and not pending.cancel():
+                with contextlib.suppress(Exception):
+                    await asyncio.wrap_future(pending)
+            if own_executor:
+                executor.shutdown(wait=False)
+
+    def _start_years(self, num_years, fields, schedule):
+        """
+        Checks the arguments of iter_years, and makes ready to simulate one year at a time
+
+        The array engine draws a seed for the run here, and its kernels are seeded again from
+        it each year, as numba has one random number generator for each thread and the years
+        can be simulated in any thread
+
+        Returns
+        -------
+        tuple with the fields, the parameter changes, the bins of the histograms and the seed
+        of the kernels (None for the object engine)
+        """
+        if num_years < 0:
+            raise ValueError('num_years can not be negative')
+        fields = _check_fields(fields)
+        changes = _compile_schedule(schedule, num_years) if schedule is not None else {}
+        hist_specs = {'age': self.hist_specs_age, 'weight': self.hist_specs_weight,
+                      'fitness': self.hist_specs_fitness}
+        bins = {}
+        for field in fields:
+            if field in hist_specs:
+                specs = hist_specs[field] or _DEFAULT_HIST_SPECS[field]
+                bins[field] = np.arange(0, specs['max'] + specs['delta'], specs['delta'])
+        if self._bin_width is None:
+            self.Island.to_animals()
+        if self._counters is not None:
+            self._counters.reset()
+        kernel_seed = self.Island.draw_seed() if self.engine == 'array' else None
+        return fields, changes, bins, kernel_seed
+
+    def _iter_years(self, num_years, fields, changes, bins, kernel_seed):
+        """Generator behind iter_years, simulates one year for each record"""
+        for step in range(num_years):
+            record, line = self._next_year(fields, changes.get(step), bins,
+                                           _year_seed(kernel_seed, step))
+            self._log_year(line)
+            yield record
+
+    def _next_year(self, fields, year_changes, bins, year_seed=None):
+        """
+        Simulates one year
+
+        The counters are only enabled during the season, as other code can run between the
+        years of iter_years. The line of the log file is given back instead of written, so it
+        is only written when the record is used.
+
+        Parameters
+        ----------
+        fields: tuple
+            the fields of the record
+        year_changes: dict
+            parameters to set before the year, or None
+        bins: dict
+            edges of the bins of each histogram in fields
+        year_seed: int
+            if given, the kernels of the array engine are seeded with it in this thread
+
+        Returns
+        -------
+        dict with the record of the year, and the line of the log file (None without a log)
+        """
+        if year_seed is not None:
+            self.Island.seed(year_seed)
+        if year_changes is not None:
+            self._set_parameters(year_changes)
+        if self._counters is not None:
+            self._counters.enable()
+            try:
+                self.Island.season()
+            finally:
+                self._counters.disable()
+            self._counters.end_year()
+        else:
+            self.Island.season()
+        self._year += 1
+        return self._record(fields, bins), self._log_line()
+
+    def _record(self, fields, bins):
+        """The record of the current year, with only the fields asked for"""
+        island = self.Island
+        record = {'year': self._year}
+        for field in fields:
+            if field == 'counts':
+                record[field] = self.num_animals_per_species
+            elif field == 'count_maps':
+                record[field] = {'Herbivore': island.herbivore_counts(),
+                                 'Carnivore': island.carnivore_counts()}
+            else:
+                values = {'age': (island.herbivore_ages, island.carnivore_ages),
+                          'weight': (island.herbivore_weights, island.carnivore_weights),
+                          'fitness': (island.herbivore_fitness, island.carnivore_fitness)}[field]
+                record[field] = {'Herbivore': np.histogram(values[0](), bins[field])[0],
+                                 'Carnivore': np.histogram(values[1](), bins[field])[0],
+                                 'bins': bins[field]}
+        return record
 
     def add_population(self, population):
         """
@@ -245,11 +1052,73 @@ class BioSim:
         Parameters
         ----------
         population: list
-            list of dictionaries specifying the population
+            list of dictionaries specifying the population. The pop of a location can also be
+            a dict with the columns species, age and weight (arrays), and the whole population
+            can be a structured array or a CSV file with the columns row, col, species, age
+            and weight, which are added much faster than one dict for each animal
         """
 
         self.Island.new_animals(population)
 
+    def fork(self, seed=None, img_base=None, log_file=None, instrument=None):
+        """
+        Make an independent branch of the simulation from its current state
+
+        The island and all the animals are copied in memory, so a long burn-in only has
+        to be simulated once before trying out different interventions on each branch.
+
+        Parameters
+        ----------
+        seed: int
+            if given, the random number generator is seeded again, like in the constructor
+        img_base: string
+            filename for the images of the branch, saved in the same directory as the images
+            of this simulation. The branch saves no images if not given
+        log_file: string
+            if given, the branch writes its animal counts to this file
+        instrument: Instrumentation
+            if given, the phases of the branch are recorded. The branch is not recorded by
+            the instrumentation of this simulation
+
+        Returns
+        -------
+        A new BioSim which can be simulated and changed without affecting this one
+        """
+
+        if seed is not None:
+            random.seed(seed)
+            seed_generator(seed)
+            if self.engine == 'array':
+                self.Island.seed(seed)
+
+        branch = copy.copy(self)
+        branch.Island = self.Island.copy()
+        branch.Island.instrument = instrument
+        branch._graphics = branch._make_graphics(self._img_dir if img_base is not None else None,
+                                                 img_base)
+        branch.log_file = log_file
+        branch._start_log()
+        if self._counters is not None:
+            branch._counters = EventCounters()
+        return branch
+
+    def stats(self):
+        """
+        Counts of the work done in the last call to simulate
+
+        Returns
+        -------
+        dict with the number of fitness updates, random number calls, sorts and allocations
+        of animals and cells, and the same counts for each year in the list 'years'
+
+        Raises
+        ------
+        RuntimeError
+        """
+        if self._counters is None:
+            raise RuntimeError('The counters are only used with counters=True')
+        return self._counters.stats()
+
     @property
     def year(self):
         """Last year simulated."""
@@ -272,5 +1141,11 @@ class BioSim:
         ----------
         movie_fmt: str
             Movie format the movie should be made in
+
+        Raises
+        ------
+        RuntimeError
         """
+        if self._graphics is None:
+            raise RuntimeError('No images are saved in headless mode (vis_years=0)')
         self._graphics.make_movie(movie_fmt)
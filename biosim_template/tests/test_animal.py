@@ -165,3 +165,31 @@ def test_baby_weight_negative(mocker):
     herbivore = Herbivore(10, 40)
 
     assert not herbivore.birth(10)
+
+
+def test_from_arrays():
+    """Test if the animals made together get the same fitness as when made one by one"""
+    herbivores = Herbivore.from_arrays([1, 5, 30], [8., 20., 35.])
+    assert [herbi.age for herbi in herbivores] == [1, 5, 30]
+    assert [herbi.fitness for herbi in herbivores] == pytest.approx([Herbivore(1, 8.).fitness,
+                                                                     Herbivore(5, 20.).fitness,
+                                                                     Herbivore(30, 35.).fitness])
+
+
+def test_from_arrays_negative_weight():
+    """Test if from_arrays raises ValueError if a weight is not strictly positive"""
+    with pytest.raises(ValueError):
+        Carnivore.from_arrays([1, 2], [5., 0.])
+
+
+def test_sort_by_fitness():
+    """Test if the animals are sorted in place, and animals with the same fitness keep order"""
+    first, second = Herbivore(5, 20), Herbivore(5, 20)
+    herbivores = [Herbivore(5, 40), first, Herbivore(5, 5), second]
+    Herbivore.sort_by_fitness(herbivores)
+    assert [herbi.weight for herbi in herbivores] == [5, 20, 20, 40]
+    assert herbivores[1] is first and herbivores[2] is second
+
+    Herbivore.sort_by_fitness(herbivores, descending=True)
+    assert [herbi.weight for herbi in herbivores] == [40, 20, 20, 5]
+    assert herbivores[1] is first and herbivores[2] is second
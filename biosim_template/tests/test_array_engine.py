@@ -0,0 +1,125 @@
+"""Test for the array engine"""
+import textwrap
+
+import numpy as np
+import pytest
+
+from biosim import array_engine
+from biosim.animal import Herbivore
+from biosim.array_engine import ArrayIsland, feed_herbivores, survive, migrate
+from biosim.island import Island
+from biosim.simulation import BioSim
+
+geogr = textwrap.dedent("""\
+                        WWWWW
+                        WLLHW
+                        WDLLW
+                        WWWWW""")
+
+ini_pop = [{'loc': (2, 2),
+            'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20} for _ in range(50)]
+            + [{'species': 'Carnivore', 'age': 5, 'weight': 20} for _ in range(20)]}]
+
+FITNESS_PARAMS = np.array([0.6, 40., 0.1, 10.])
+
+
+def python_kernel(kernel):
+    """The kernel as a Python function, also when numba is installed"""
+    return getattr(kernel, 'py_func', kernel)
+
+
+def test_feed_fittest_first():
+    """Tests if the fittest herbivore eats first, and the next one gets what is left"""
+    weight = np.array([10., 30., 20.])
+    fitness = np.array([0.1, 0.9, 0.5])
+    fodder = np.array([15.])
+    python_kernel(feed_herbivores)(np.array([1, 2, 0]), np.zeros(3, dtype=np.int64), np.full(3, 5),
+                                   weight, fitness, fodder, 10., 1., FITNESS_PARAMS)
+    assert weight.tolist() == [10., 40., 25.] and fodder[0] == 0
+
+
+def test_fitness_kernel():
+    """Tests if the fitness kernel gives the same fitness as Animal.fitness_values"""
+    ages, weights = np.array([0, 5, 40]), np.array([8., 0., 35.])
+    fitness = python_kernel(array_engine.fitness_all)(ages, weights,
+                                                      array_engine._fitness_params(Herbivore))
+    assert fitness == pytest.approx(Herbivore.fitness_values(ages, weights))
+
+
+def test_survive_weight_zero():
+    """Tests if animals without weight die and fit animals survive when omega is 0"""
+    alive = python_kernel(survive)(np.array([0., 20.]), np.array([0., 1.]), 0.)
+    assert alive.tolist() == [False, True]
+
+
+def test_migrate_blocked():
+    """Tests if no animal moves when no cell can be moved to"""
+    row, col = np.ones(10, dtype=np.int64), np.ones(10, dtype=np.int64)
+    moved = python_kernel(migrate)(row, col, np.ones(10), 1., np.zeros((3, 3), dtype=np.bool_),
+                                   array_engine._STEPS)
+    assert moved == 0 and row.tolist() == [1] * 10
+
+
+def test_uncompiled_island():
+    """Tests if the array island runs with the kernels as Python functions"""
+    island = ArrayIsland(geogr, ini_pop, compiled=False)
+    island.seed(1)
+    for _ in range(3):
+        island.season()
+    assert island.herbivore_counts().sum() == island.amount_of_herbivores() > 0
+    assert len(island.carnivore_weights()) == island.amount_of_carnivores()
+
+
+def test_fodder_left_in_array():
+    """Tests if the array island eats from its fodder array, and uses the f_max of single cells"""
+    island = ArrayIsland(geogr, ini_pop, compiled=False)
+    island.set_f_max((2, 2), 50)
+    island.feeding_season()
+    assert island.fodder[1, 1] == 0 and island.fodder[1, 2] == 800
+
+
+def test_barriers():
+    """Tests if no animals get into a cell with a closed barrier"""
+    barriers = np.ones((4, 5))
+    barriers[1, 2] = 0
+    island = ArrayIsland(geogr, ini_pop, compiled=False, barriers=barriers)
+    island.seed(1)
+    for _ in range(10):
+        island.migrate_season()
+    assert island.herbivore_counts()[1, 2] == 0 and island.carnivore_counts()[1, 2] == 0
+
+
+def test_water_not_allowed():
+    """Tests if it raises ValueError when animals are placed in water"""
+    with pytest.raises(ValueError):
+        ArrayIsland(geogr, [{'loc': (1, 1), 'pop': ini_pop[0]['pop']}], compiled=False)
+
+
+def test_fallback_without_numba(monkeypatch):
+    """Tests if BioSim warns and uses the object engine when numba is not installed"""
+    monkeypatch.setattr(array_engine, 'HAVE_NUMBA', False)
+    with pytest.warns(RuntimeWarning):
+        sim = BioSim(geogr, ini_pop, seed=1, vis_years=0, engine='array')
+    assert sim.engine == 'object' and type(sim.Island) is Island
+
+
+@pytest.mark.parametrize('option', [{'bin_width': 1.}, {'sampling': 'binomial'},
+                                    {'counters': True}])
+def test_object_engine_options(option):
+    """Tests if options of the object engine raise ValueError with the array engine"""
+    with pytest.raises(ValueError):
+        BioSim(geogr, ini_pop, seed=1, vis_years=0, engine='array', **option)
+
+
+def test_same_mean_as_object_engine():
+    """Tests if the array engine gives about the same mean number of herbivores"""
+    pytest.importorskip('numba')
+    means = {}
+    for engine in ('object', 'array'):
+        counts = []
+        for seed in range(10):
+            sim = BioSim(geogr, ini_pop, seed=seed, vis_years=0, engine=engine)
+            sim.simulate(20)
+            counts.append(sim.num_animals_per_species['Herbivore'])
+        means[engine] = np.mean(counts)
+    assert means['array'] == pytest.approx(means['object'], rel=0.2)
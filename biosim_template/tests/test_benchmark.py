@@ -0,0 +1,43 @@
+"""Test for the benchmarks"""
+import json
+
+import pytest
+
+from biosim.animal import Herbivore
+from biosim.benchmark import run_scenario, run_benchmarks
+from biosim.benchmark.__main__ import main
+from biosim.landscape import Lowland
+
+
+def test_run_scenario():
+    """Tests if a scenario reports the time of every phase of the year"""
+    result = run_scenario('mono_hc', years=3)
+    assert result['years'] == 3 and result['herbivores'] > 0
+    assert 0 < sum(result['phases'].values()) <= result['seconds']
+
+
+def test_parameters_reset():
+    """Tests if the parameters of a scenario are set back after it is run"""
+    mu, f_max = Herbivore.params['mu'], Lowland.f_max
+    run_scenario('check_migration', years=1)
+    assert Herbivore.params['mu'] == mu and Lowland.f_max == f_max
+
+
+def test_same_seed_same_result():
+    """Tests if a scenario gives the same animals when it is run with the same seed"""
+    report = run_benchmarks(['mono_ho'], seed=1, years=20, repeat=2)
+    result = run_scenario('mono_ho', seed=1, years=20)
+    assert report['results']['mono_ho']['herbivores'] == result['herbivores']
+
+
+def test_unknown_scenario():
+    """Tests if it raises KeyError if the scenario does not exist"""
+    with pytest.raises(KeyError):
+        run_scenario('no_scenario')
+
+
+def test_main_json(capsys):
+    """Tests if the command line interface writes the results as JSON"""
+    main(['mono_ho', '--years', '2', '--json', '-'])
+    report = json.loads(capsys.readouterr().out)
+    assert report['results']['mono_ho']['years'] == 2
@@ -0,0 +1,114 @@
+"""Test for the cohorts"""
+
+import pytest
+
+from biosim import sampling
+from biosim.animal import Herbivore
+from biosim.cohorts import Cohorts, CohortCell
+from biosim.landscape import Lowland
+
+
+@pytest.fixture(autouse=True)
+def seed():
+    """Seeds the generator of the cohorts"""
+    sampling.seed(1234)
+
+
+def make_cell(herbivores=100, carnivores=0):
+    """Makes a lowland cell with cohorts of animals of age 5 and weight 20"""
+    cell = Lowland()
+    cell.pop_animals([{'species': 'Herbivore', 'age': 5, 'weight': 20} for _ in range(herbivores)] +
+                     [{'species': 'Carnivore', 'age': 5, 'weight': 20} for _ in range(carnivores)])
+    return CohortCell.from_cell(cell, bin_width=1.)
+
+
+def test_merge_same_bin():
+    """Tests if animals with the same age and weight bin are one cohort with the mean weight"""
+    cohorts = Cohorts(Herbivore, 1., [5, 5, 6], [20.2, 20.6, 20.2], [1, 3, 2])
+    assert cohorts.counts.tolist() == [4, 2]
+    assert cohorts.weights[0] == pytest.approx((20.2 + 3 * 20.6) / 4)
+
+
+def test_round_trip():
+    """Tests if the animals are the same after being grouped and made into animals again"""
+    cell = make_cell(30, 5)
+    assert len(cell.to_cell().herbivores) == 30 and cell.num_carnivores() == 5
+    assert cell.list_herbivores_weight() == [20.] * 30
+
+
+def test_feeding_uses_fodder():
+    """Tests if the herbivores eat all the fodder when there are more than enough of them"""
+    cell = make_cell(100)
+    cell.feeding()
+    assert cell.fodder == 0
+    gained = sum(cell.list_herbivores_weight()) - 100 * 20
+    assert gained == pytest.approx(Lowland.f_max * Herbivore.params['beta'])
+
+
+def test_carnivores_eat():
+    """Tests if strong carnivores kill herbivores and get heavier"""
+    cell = make_cell(50, 10)
+    cell.herbivores.weights[:] = 5.
+    cell.carnivore_feeding()
+    assert cell.num_herbivores() < 50
+    assert sum(cell.list_carnivores_weight()) > 10 * 20
+
+
+def test_reproduction():
+    """Tests if there are newborn animals of age 0"""
+    cell = make_cell(100)
+    cell.herbivores.weights[:] = 50.
+    cell.reproduction()
+    babies = cell.list_herbivores_ages().count(0)
+    assert babies > 0 and cell.num_herbivores() == 100 + babies
+
+
+def test_deaths_binomial():
+    """Tests if the number of dead animals is close to the expected number"""
+    cohorts = Cohorts(Herbivore, 1., [5], [20.], [10000])
+    expected = 10000 * Herbivore.params['omega'] * (1 - cohorts.fitness[0])
+    cohorts.deaths()
+    assert 10000 - cohorts.total() == pytest.approx(expected, rel=0.1)
+
+
+def test_emigrants_split():
+    """Tests if the emigrants are split in four directions and leave the cell"""
+    cell = make_cell(1000)
+    herbivores, carnivores = cell.migration()
+    moved = sum(group.total() for group in herbivores if group is not None)
+    assert len(herbivores) == 4 and moved > 0
+    assert cell.num_herbivores() + moved == 1000
+
+
+def test_identical_block_one_cohort():
+    """Tests if a block of animals with the same age and weight is one cohort"""
+    cell = make_cell(200, 20)
+    assert len(cell.herbivores.counts) == 1 and cell.herbivores.counts[0] == 200
+    assert len(cell.carnivores.counts) == 1
+
+
+def test_pop_animals_invalid():
+    """Tests if it raises ValueError for a species that does not exist or a weight of 0"""
+    cell = make_cell(0)
+    with pytest.raises(ValueError):
+        cell.pop_animals([{'species': 'Bear', 'age': 5, 'weight': 20}])
+    with pytest.raises(ValueError):
+        cell.pop_animals({'species': ['Herbivore'], 'age': [5], 'weight': [0]})
+
+
+def test_emigrate_water():
+    """Tests if the animals that would move into water stay in the cell"""
+    cell = make_cell(1000)
+    moved = cell.emigrate([(1, 1)] * 4, lambda loc: None)
+    cell.immigration()
+    assert moved == 0 and cell.num_herbivores() == 1000
+
+
+def test_split():
+    """Tests if splitting keeps all the animals, and a chance of 0 lets none through"""
+    sampling.seed(1)
+    cohorts = Cohorts(Herbivore, 1., [1, 2], [10., 20.], [30, 40])
+    passed, stopped = cohorts.split(0.5)
+    assert passed.total() + stopped.total() == 70
+    passed, stopped = cohorts.split(0.)
+    assert passed is None and stopped.total() == 70
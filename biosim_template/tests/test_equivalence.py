@@ -0,0 +1,83 @@
+"""Test for the statistical comparison of the engines"""
+import json
+
+import numpy as np
+import pytest
+
+from biosim.animal import Herbivore
+from biosim.benchmark.equivalence import (welch_ttest, ks_2samp, holm, run_sample, compare_engines,
+                                          main)
+
+
+def test_welch_ttest_known_value():
+    """Tests the t statistic and p-value against a value from a t table (df=8)"""
+    t, p = welch_ttest([1, 2, 3, 4, 5], [2, 3, 4, 5, 6])
+    assert t == pytest.approx(-1.)
+    assert p == pytest.approx(0.3466, abs=1e-4)
+
+
+def test_welch_ttest_constant_samples():
+    """Tests if equal constant samples have p-value 1, and different ones p-value 0"""
+    assert welch_ttest([3, 3], [3, 3, 3])[1] == 1.
+    assert welch_ttest([3, 3], [4, 4, 4])[1] == 0.
+
+
+def test_welch_ttest_too_small():
+    """Tests if it raises ValueError when a sample has only one value"""
+    with pytest.raises(ValueError):
+        welch_ttest([1], [1, 2])
+
+
+def test_ks_2samp():
+    """Tests if the same distribution is not rejected, and a shifted one is"""
+    rng = np.random.default_rng(1)
+    assert ks_2samp([1, 2, 3], [1, 2, 3]) == (0., 1.)
+    assert ks_2samp(rng.normal(size=200), rng.normal(size=300))[1] > 0.05
+    assert ks_2samp(rng.normal(size=200), rng.normal(0.5, size=300))[1] < 0.001
+
+
+def test_holm():
+    """Tests the Holm correction, which keeps the order of the p-values"""
+    assert holm([0.01, 0.04, 0.03, 0.5]) == pytest.approx([0.04, 0.09, 0.09, 0.5])
+
+
+def test_run_sample():
+    """Tests if there is one value for each seed, and the checkpoints end with the last year"""
+    sample = run_sample('mono_hc', range(3), years=10, checkpoints=2)
+    assert sample['checkpoints'] == [5, 10]
+    assert sample['Herbivore count year 10'].shape == (3,)
+    assert sample['Herbivore weight mean'].shape == (3,)
+
+
+def test_run_sample_unknown_option():
+    """Tests if it raises KeyError for an option that does not exist"""
+    with pytest.raises(KeyError):
+        run_sample('mono_ho', range(2), years=1, options={'speed': 'fast'})
+
+
+def test_same_engine_passes():
+    """Tests if the object engine is not found different from itself"""
+    result = compare_engines('mono_ho', {}, seeds=8, years=15)
+    assert result['passed'] and result['tests']
+
+
+def test_different_parameters_fail():
+    """Tests if a real difference in the model is found"""
+    beta = Herbivore.params['beta']
+    result = compare_engines('mono_ho', {'animal_params': {'Herbivore': {'beta': 0.8}}},
+                             seeds=10, years=30)
+    assert not result['passed']
+    assert Herbivore.params['beta'] == beta
+
+
+def test_array_engine_passes():
+    """Tests if the array engine gives the same populations as the object engine"""
+    assert compare_engines('mono_hc', 'array', seeds=10, years=30)['passed']
+
+
+def test_main_json(capsys):
+    """Tests if the command line interface writes the results as JSON and returns 0 when passed"""
+    assert main(['mono_ho', '--candidate', 'cohorts', '--seeds', '5', '--years', '5',
+                 '--json', '-']) == 0
+    results = json.loads(capsys.readouterr().out)
+    assert results[0]['scenario'] == 'mono_ho' and results[0]['candidate'] == {'bin_width': 1.}
@@ -0,0 +1,256 @@
+"""Test for Graphics class"""
+import threading
+
+import matplotlib.pyplot as plt
+import pytest
+
+from biosim.graphics import AsyncGraphics, Graphics
+
+
+class SlowGraphics:
+    """Graphics that waits with drawing until it is allowed to"""
+
+    def __init__(self):
+        self.gui_events = True
+        self.years = []
+        self.counts = []
+        self.allow_drawing = threading.Event()
+
+    def setup(self, final_step, img_year):
+        pass
+
+    def update(self, year, *snapshot):
+        self.allow_drawing.wait()
+        self.years.append(year)
+
+    def _update_animal_graph(self, year, herbivore, carnivore):
+        self.counts.append(year)
+
+    def finish(self):
+        self.finished = True
+
+
+class FailingGraphics(SlowGraphics):
+    """Graphics that can not save its frames"""
+
+    def update(self, year, *snapshot):
+        raise OSError('No space left on device')
+
+
+@pytest.fixture(autouse=True)
+def close_figures():
+    yield
+    plt.close("all")
+
+
+def run_frames(policy, num_frames=10):
+    """Sends frames to an AsyncGraphics with room for one frame and returns the graphics"""
+    graphics = SlowGraphics()
+    renderer = AsyncGraphics(graphics, queue_size=1, policy=policy)
+    renderer.setup(num_frames, 1)
+    for year in range(1, num_frames + 1):
+        if policy == 'block':
+            graphics.allow_drawing.set()
+        renderer.update(year, 10, 5, None, None)
+    graphics.allow_drawing.set()
+    renderer.finish()
+    return graphics, renderer
+
+
+def test_async_block():
+    """Tests if every frame is drawn in order when the policy is block"""
+    graphics, renderer = run_frames('block')
+    assert graphics.years == list(range(1, 11)) and renderer.dropped == 0
+
+
+@pytest.mark.parametrize('policy', ['drop', 'coalesce'])
+def test_async_skips_frames(policy):
+    """Tests if frames are skipped when the queue is full and their counts are kept"""
+    graphics, renderer = run_frames(policy)
+    assert renderer.dropped > 0
+    assert len(graphics.years) + renderer.dropped == 10
+    assert sorted(graphics.counts) == sorted(set(range(1, 11)) - set(graphics.years))
+
+
+def test_async_coalesce_keeps_last():
+    """Tests if the last frame is always drawn when the policy is coalesce"""
+    graphics, renderer = run_frames('coalesce')
+    assert graphics.years[-1] == 10
+
+
+def test_async_render_error():
+    """Tests if an error in the render thread is raised by update and finish instead of hanging"""
+    renderer = AsyncGraphics(FailingGraphics(), queue_size=2)
+    renderer.setup(10, 1)
+    with pytest.raises(OSError):
+        for year in range(1, 11):
+            renderer.update(year, 10, 5, None, None)
+    renderer._graphics.finished = False
+    with pytest.raises(OSError):
+        renderer.finish()
+    assert renderer._graphics.finished
+    renderer.finish()
+
+
+def test_async_gui_backend(monkeypatch):
+    """Tests if it raises ValueError with a backend that can only draw in the main thread"""
+    monkeypatch.setattr(plt, 'get_backend', lambda: 'TkAgg')
+    with pytest.raises(ValueError):
+        AsyncGraphics(SlowGraphics())
+
+
+def test_async_invalid_policy():
+    """Tests if it raises ValueError if the policy does not exist"""
+    with pytest.raises(ValueError):
+        AsyncGraphics(SlowGraphics(), policy='later')
+
+
+def test_update_reuses_artists():
+    """Tests if the histograms and the legend are made once and only get new data"""
+    graphics = Graphics('WWW\nWLW\nWWW')
+    graphics.setup(2, 1)
+    histogram = graphics._ages_histogram
+    legend = graphics._mean_ax.get_legend()
+    for year in (1, 2):
+        graphics.update(year, 2, 1, [[0, 0, 0], [0, 2, 0], [0, 0, 0]],
+                        [[0, 0, 0], [0, 1, 0], [0, 0, 0]], [3, 5], [4], [20, 30], [25], [0.5, 0.7],
+                        [0.6])
+    assert graphics._ages_histogram is histogram and graphics._mean_ax.get_legend() is legend
+    assert list(histogram[0].get_data().values[:3]) == [0, 1, 1]
+
+
+class FakeFfmpeg:
+    """Collects the bytes that are sent to ffmpeg"""
+
+    def __init__(self, args, stdin=None, stderr=None):
+        self.args = args
+        self.stdin = self
+        self.data = bytearray()
+        open(args[-1], 'wb').close()
+
+    def write(self, data):
+        self.data.extend(data)
+        return len(data)
+
+    def close(self):
+        pass
+
+    def wait(self):
+        return 0
+
+
+def test_stream_movie(mocker, tmpdir):
+    """Tests if the frames are streamed as raw pixels to ffmpeg without saving any images"""
+    processes = []
+    mocker.patch('subprocess.Popen',
+                 side_effect=lambda *a, **k: processes.append(FakeFfmpeg(*a, **k)) or processes[-1])
+    mocker.patch('subprocess.check_call', side_effect=lambda args: open(args[-1], 'wb').close())
+
+    graphics = Graphics('WWW\nWLW\nWWW', img_dir=str(tmpdir), img_name='movie', stream_movie=True)
+    graphics.setup(3, 1)
+    for year in (1, 2, 3):
+        graphics.update(year, 2, 1, [[0, 0, 0], [0, 2, 0], [0, 0, 0]],
+                        [[0, 0, 0], [0, 1, 0], [0, 0, 0]], [3, 5], [4], [20, 30], [25], [0.5, 0.7],
+                        [0.6])
+    graphics.finish()
+
+    width, height = graphics._frame_size
+    assert len(processes) == 1 and len(processes[0].data) == 3 * width * height * 4
+    assert [path.basename for path in tmpdir.listdir()] == ['movie.mp4']
+
+
+class CrashingFfmpeg(FakeFfmpeg):
+    """ffmpeg that stops with an error message before it gets any frames"""
+
+    def __init__(self, args, stdin=None, stderr=None):
+        super().__init__(args)
+        stderr.write(b'Unknown encoder')
+        stderr.flush()
+
+    def write(self, data):
+        raise BrokenPipeError(32, 'Broken pipe')
+
+    def kill(self):
+        pass
+
+    def wait(self):
+        return 1
+
+
+def test_stream_movie_ffmpeg_crash(mocker, tmpdir):
+    """Tests if a crashed ffmpeg raises RuntimeError with its error message"""
+    mocker.patch('subprocess.Popen', side_effect=CrashingFfmpeg)
+    graphics = Graphics('WWW\nWLW\nWWW', img_dir=str(tmpdir), img_name='movie', stream_movie=True)
+    graphics.setup(1, 1)
+    with pytest.raises(RuntimeError, match='Unknown encoder'):
+        graphics.update(1, 2, 1, [[0, 0, 0], [0, 2, 0], [0, 0, 0]],
+                        [[0, 0, 0], [0, 1, 0], [0, 0, 0]], [3, 5], [4], [20, 30], [25], [0.5, 0.7],
+                        [0.6])
+    graphics.finish()
+    assert tmpdir.listdir() == []
+
+
+def test_stream_movie_figure_resized(mocker, tmpdir):
+    """Tests if it raises RuntimeError when the figure changes size while streaming"""
+    mocker.patch('subprocess.Popen', side_effect=FakeFfmpeg)
+    graphics = Graphics('WWW\nWLW\nWWW', img_dir=str(tmpdir), img_name='movie', stream_movie=True)
+    graphics.setup(2, 1)
+    snapshot = ([[0, 0, 0], [0, 2, 0], [0, 0, 0]], [[0, 0, 0], [0, 1, 0], [0, 0, 0]], [3, 5],
+                [4], [20, 30], [25], [0.5, 0.7], [0.6])
+    graphics.update(1, 2, 1, *snapshot)
+    graphics._fig.set_size_inches(4, 3)
+    with pytest.raises(RuntimeError, match='size'):
+        graphics.update(2, 2, 1, *snapshot)
+
+
+def test_stream_movie_parts_deleted(mocker, tmpdir):
+    """Tests if each part is joined to the movie made before and then deleted"""
+    mocker.patch('subprocess.Popen', side_effect=FakeFfmpeg)
+    parts_files = []
+
+    def concat(args):
+        with open(args[args.index('-i') + 1]) as f:
+            parts_files.append(len(f.readlines()))
+        open(args[-1], 'wb').close()
+    mocker.patch('subprocess.check_call', side_effect=concat)
+
+    graphics = Graphics('WWW\nWLW\nWWW', img_dir=str(tmpdir), img_name='movie', stream_movie=True)
+    for _ in range(2):
+        graphics.setup(1, 1)
+        graphics.update(1, 2, 1, [[0, 0, 0], [0, 2, 0], [0, 0, 0]],
+                        [[0, 0, 0], [0, 1, 0], [0, 0, 0]], [3, 5], [4], [20, 30], [25], [0.5, 0.7],
+                        [0.6])
+        graphics.finish()
+    assert parts_files == [1, 2]
+    assert [path.basename for path in tmpdir.listdir()] == ['movie.mp4']
+
+
+def test_stream_movie_without_img_dir():
+    """Tests if it raises ValueError if the movie is streamed without img_dir"""
+    with pytest.raises(ValueError):
+        Graphics('WWW\nWLW\nWWW', stream_movie=True)
+
+
+def test_img_workers_same_images(tmpdir):
+    """Tests if the images saved by the worker processes are the same as when saved directly"""
+    frames = [(year, 2 * year, year, [[0, 0, 0], [0, 2 * year, 0], [0, 0, 0]],
+               [[0, 0, 0], [0, year, 0], [0, 0, 0]], [3, 5], [4], [20, 30], [25], [0.5, 0.7], [0.6])
+              for year in (1, 2, 3)]
+    for name, workers in (('serial', None), ('pool', 2)):
+        graphics = Graphics('WWW\nWLW\nWWW', img_dir=str(tmpdir), img_name=name,
+                            img_workers=workers)
+        graphics.setup(3, 1)
+        for frame in frames:
+            graphics.update(*frame)
+        graphics.finish()
+
+    for num in range(3):
+        serial = plt.imread(str(tmpdir.join(f'serial_{num:05d}.png')))
+        pool = plt.imread(str(tmpdir.join(f'pool_{num:05d}.png')))
+        assert (serial == pool).all()
+
+
+def test_img_workers_and_stream():
+    """Tests if it raises ValueError if the frames are both streamed and saved by workers"""
+    with pytest.raises(ValueError):
+        Graphics('WWW\nWLW\nWWW', img_dir='.', stream_movie=True, img_workers=2)
@@ -0,0 +1,77 @@
+"""Test for the instrumentation of the phases"""
+import csv
+import random
+
+from biosim.instrumentation import Instrumentation, MemorySink, CSVSink, CallbackSink, FIELDS
+from biosim.island import Island
+from biosim.simulation import BioSim
+
+ISLAND_MAP = """\
+WWWWW
+WLLLW
+WLHLW
+WWWWW"""
+
+
+def make_island(instrument=None):
+    """Makes a small island with herbivores and carnivores in one cell"""
+    random.seed(3)
+    ini_pop = [{'loc': (2, 2),
+                'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20} for _ in range(50)]
+                + [{'species': 'Carnivore', 'age': 5, 'weight': 20} for _ in range(10)]}]
+    return Island(ISLAND_MAP, ini_pop, instrument=instrument)
+
+
+def test_record_each_phase():
+    """Tests if there is one record for each phase of each year"""
+    sink = MemorySink()
+    island = make_island(Instrumentation(sink))
+    for _ in range(3):
+        island.season()
+    assert len(sink.records) == 3 * len(Island.PHASES)
+    assert [record['phase'] for record in sink.records[:len(Island.PHASES)]] == list(Island.PHASES)
+    assert all(set(record) == set(FIELDS) for record in sink.records)
+
+
+def test_counts_add_up():
+    """Tests if births, deaths and kills explain the change in the number of animals"""
+    sink = MemorySink()
+    island = make_island(Instrumentation(sink))
+    for _ in range(10):
+        island.season()
+    totals = {key: sum(sink.phase_totals(key).values()) for key in ('births', 'deaths', 'kills')}
+    animals = island.amount_of_herbivores() + island.amount_of_carnivores()
+    assert animals == 60 + totals['births'] - totals['deaths'] - totals['kills']
+    assert sink.phase_totals('migrants')['migrate_season'] > 0
+
+
+def test_same_result_as_without():
+    """Tests if the instrumentation does not change the simulation"""
+    plain = make_island()
+    for _ in range(5):
+        plain.season()
+    instrumented = make_island(Instrumentation())
+    for _ in range(5):
+        instrumented.season()
+    assert plain.herbivore_map() == instrumented.herbivore_map()
+
+
+def test_csv_sink(tmp_path):
+    """Tests if the CSV sink writes one line for each phase"""
+    instrument = Instrumentation(CSVSink(tmp_path / 'phases.csv'))
+    island = make_island(instrument)
+    island.season()
+    instrument.close()
+    with open(tmp_path / 'phases.csv') as f:
+        rows = list(csv.DictReader(f))
+    assert len(rows) == len(Island.PHASES) and rows[0]['phase'] == 'feeding_season'
+
+
+def test_callback_sink_in_biosim():
+    """Tests if BioSim sends the records to the callback"""
+    records = []
+    sim = BioSim('WWW\nWLW\nWWW', [], seed=1, vis_years=0,
+                 instrument=Instrumentation(CallbackSink(records.append)))
+    sim.simulate(2)
+    assert len(records) == 2 * len(Island.PHASES)
+    assert sim.fork().Island.instrument is None
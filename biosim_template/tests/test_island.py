@@ -1,7 +1,9 @@
+import numpy as np
 import pytest
 
-from biosim.island import Island
+from biosim.island import Island, terrain_codes, partial_regrowth
 from biosim.animal import Herbivore, Carnivore
+from biosim.landscape import Water, Dessert
 import textwrap
 import random
 
@@ -113,3 +115,195 @@ def test_carnivore_fitness():
     """Test if it returns a list with the fitness of carnivores in one location"""
     cell = Island(geogr, ini_carns)
     assert cell.carnivore_fitness() == [Carnivore(age, weight).fitness for _ in range(20)]
+
+
+def test_terrain_codes():
+    """Test if the map is converted to the index of each letter in TERRAIN"""
+    assert terrain_codes("WWWW\nWLHW\nWDWW\nWWWW").tolist() == [[0, 0, 0, 0], [0, 1, 2, 0],
+                                                                [0, 3, 0, 0], [0, 0, 0, 0]]
+
+
+@pytest.mark.parametrize('island_map', ["WWW\nWLW\nWWL", "WWW\nWXW\nWWW", "WWW\nWLLW\nWWW",
+                                        "WWW\nWÅW\nWWW"])
+def test_terrain_codes_invalid(island_map):
+    """Test if terrain_codes raises ValueError for wrong boundary, letters or line lengths"""
+    with pytest.raises(ValueError):
+        terrain_codes(island_map)
+
+
+def test_terrain_codes_non_ascii_letter():
+    """Test if the error names a letter that is not ASCII as it is"""
+    with pytest.raises(ValueError, match='Å'):
+        terrain_codes("WWW\nWÅW\nWWW")
+
+
+def test_cells_made_when_needed():
+    """Test if only the cells with animals are made"""
+    world = Island("WWWWW\nWLLHW\nWDLLW\nWWWWW", ini_herbs)
+    assert list(world.cells) == [(2, 2)]
+
+
+def test_map_has_every_cell():
+    """Test if map has every cell of the island, and the cells looked up are kept"""
+    world = Island("WWWWW\nWLLHW\nWDLLW\nWWWWW", ini_herbs)
+    assert len(world.map) == 20 and (4, 5) in world.map and (5, 1) not in world.map
+    assert type(world.map[(1, 1)]) is Water and type(world.map[(3, 2)]) is Dessert
+    assert world.map[(1, 1)] is world.map[(1, 1)] and world.map[(3, 2)] is world.map[(3, 2)]
+    assert world.map[(2, 2)].num_herbivores() == 50
+    assert list(world.cells) == [(2, 2), (3, 2)]
+
+
+def test_animal_outside_island():
+    """Test if it raises ValueError if animals are placed outside the island"""
+    with pytest.raises(ValueError):
+        Island(geogr, [{'loc': (5, 2), 'pop': ini_herbs[0]['pop']}])
+
+
+def test_herbivore_counts():
+    """Test if herbivore_counts returns an array with the herbivores in each cell"""
+    cell = Island(geogr, ini_herbs)
+    assert cell.herbivore_counts().tolist() == [[0, 0, 0], [0, 50, 0], [0, 0, 0]]
+
+
+def test_carnivore_counts():
+    """Test if carnivore_counts returns an array with the carnivores in each cell"""
+    cell = Island(geogr, ini_carns)
+    assert cell.carnivore_counts().tolist() == [[0, 0, 0], [0, 20, 0], [0, 0, 0]]
+
+
+def test_new_animals_csv(tmpdir):
+    """Test if animals can be read from a CSV file and placed at the right locations"""
+    filename = tmpdir.join('pop.csv')
+    filename.write('row, col, species, age, weight\n'
+                   '2, 2, Herbivore, 5, 20\n'
+                   '3, 3, Carnivore, 4, 15\n'
+                   '2, 2, Herbivore, 6, 21\n')
+    world = Island("WWWWW\nWLLHW\nWDLLW\nWWWWW", str(filename))
+    assert world.map[(2, 2)].list_herbivores_ages() == [5, 6] and \
+           world.map[(3, 3)].list_carnivores_weight() == [15.]
+
+
+def test_to_cohorts_and_back():
+    """Tests if the island keeps its animals when they are grouped into cohorts and back"""
+    island = Island(geogr, ini_herbs + ini_carns)
+    island.to_cohorts(1.)
+    assert island.amount_of_herbivores() == 50 and island.amount_of_carnivores() == 20
+    island.season()
+    herbivores = island.amount_of_herbivores()
+    island.to_animals()
+    assert island.amount_of_herbivores() == herbivores
+    assert all(isinstance(animal, Herbivore) for animal in island.map[(2, 2)].herbivores)
+
+
+def test_island_with_cohorts():
+    """Tests if an island made with bin_width keeps the animals in cohorts"""
+    island = Island(geogr, ini_herbs, bin_width=2.)
+    assert len(island.map[(2, 2)].herbivores.counts) == 1
+    for _ in range(5):
+        island.season()
+    assert island.amount_of_herbivores() > 0
+
+
+def test_fodder_left_in_array():
+    """Tests if the fodder left after feeding is kept in the fodder array of the island"""
+    island = Island(geogr, ini_herbs)
+    island.feeding_season()
+    assert island.fodder[1, 1] == island.map[(2, 2)].fodder == 800 - 50 * 10
+    island.feeding_season()
+    assert island.fodder[1, 1] == 800 - 50 * 10     # all the fodder grows back by default
+
+
+def test_set_f_max():
+    """Tests if a cell with its own f_max is fed from it, and gets the landscape f_max back"""
+    island = Island(geogr, ini_herbs)
+    island.set_f_max((2, 2), 100)
+    island.feeding_season()
+    assert island.fodder[1, 1] == 0
+    island.set_f_max((2, 2), None)
+    assert island.f_max_map()[1, 1] == 800
+
+
+def test_set_f_max_not_valid():
+    """Tests if it raises ValueError for a location off the island or a negative f_max"""
+    island = Island(geogr)
+    with pytest.raises(ValueError):
+        island.set_f_max((4, 2), 100)
+    with pytest.raises(ValueError):
+        island.set_f_max((2, 2), -1)
+
+
+def test_partial_regrowth():
+    """Tests if only a fraction of the eaten fodder grows back"""
+    island = Island(geogr, ini_herbs, regrowth=partial_regrowth(0.5))
+    island.feeding_season()
+    assert island.regrow()[1, 1] == 300 + 0.5 * 500
+
+
+def test_regrowth_rule():
+    """Tests if a regrowth rule gets the fodder and f_max, and the fodder is kept below f_max"""
+    island = Island(geogr, regrowth=lambda fodder, f_max: fodder + 1000)
+    assert island.regrow()[1, 1] == 800
+    assert island.regrow()[0, 0] == 0
+    with pytest.raises(ValueError):
+        partial_regrowth(2)
+
+
+def test_f_max_map():
+    """Tests if the f_max of a map is used, and nan uses the f_max of the landscape"""
+    f_max = np.full((3, 3), np.nan)
+    f_max[1, 1] = 100
+    island = Island(geogr, ini_herbs, f_max=f_max)
+    island.feeding_season()
+    assert island.fodder[1, 1] == 0
+    island.set_f_max_map(None)
+    assert island.f_max_map()[1, 1] == 800
+
+
+def test_f_max_map_file(tmpdir):
+    """Tests if the f_max can be read from a .npy file, which set_f_max does not change"""
+    filename = str(tmpdir.join('f_max.npy'))
+    np.save(filename, np.full((3, 3), 50.))
+    island = Island(geogr, f_max=filename)
+    assert isinstance(island._f_max_cells.base, np.memmap)     # not read into memory
+    island.set_f_max((2, 2), 10)
+    assert island.f_max_map()[1, 1] == 10 and np.load(filename)[1, 1] == 50
+
+
+def test_map_not_valid():
+    """Tests if it raises ValueError for a map with the wrong shape or values"""
+    with pytest.raises(ValueError):
+        Island(geogr, f_max=np.zeros((2, 3)))
+    with pytest.raises(ValueError):
+        Island(geogr, f_max=np.full((3, 3), -1.))
+    with pytest.raises(ValueError):
+        Island(geogr, barriers=np.full((3, 3), 2.))
+
+
+@pytest.mark.parametrize('options', [{}, {'sampling': 'binomial'}, {'bin_width': 1.}])
+def test_barriers(options):
+    """Tests if no animals get past a closed barrier, and some past a half open one"""
+    random.seed(seed)
+    barriers = np.ones((3, 5))
+    barriers[1, 2] = 0
+    island = Island('WWWWW\nWLLLW\nWWWWW', ini_herbs, barriers=barriers, **options)
+    for _ in range(10):
+        island.migrate_season()
+    assert island.herbivore_counts()[1, 2:].sum() == 0
+
+    barriers[1, 2] = 0.5
+    for _ in range(10):
+        island.migrate_season()
+    assert island.herbivore_counts()[1, 2] > 0
+
+
+def test_run_years():
+    """Tests if run_years gives the same animals as a season each year"""
+    random.seed(seed)
+    island = Island(geogr, ini_herbs + ini_carns)
+    for _ in range(5):
+        island.season()
+    random.seed(seed)
+    batch = Island(geogr, ini_herbs + ini_carns)
+    batch.run_years(5)
+    assert batch.year == island.year == 5
+    assert batch.herbivore_weights() == island.herbivore_weights()
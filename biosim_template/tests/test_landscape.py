@@ -1,8 +1,12 @@
 """Test for Landscape class"""
 import random
 
-from biosim.landscape import Lowland, Highland, Dessert, Water
+import numpy as np
+
+from biosim import sampling
+from biosim.landscape import Lowland, Highland, Water, select_by_class
 from biosim.animal import Herbivore, Carnivore
+from biosim.counters import EventCounters
 import pytest
 seed = 456
 pop_1 = [{'species': 'Herbivore', 'age': 5, 'weight': 20} for _ in range(50)]
@@ -60,6 +64,41 @@ def test_feeding_if_no_fodder():
     assert cell.fodder == 0
 
 
+def test_herbivores_sorted_for_carnivores():
+    """Test if the herbivores are sorted from the lowest fitness after both feeding phases"""
+    random.seed(seed)
+    cell = Lowland([Herbivore(random.randint(0, 20), random.uniform(5, 50)) for _ in range(200)])
+    cell.feeding()
+    cell.carnivore_feeding()
+
+    fitness = [herbi.fitness for herbi in cell.herbivores]
+    assert fitness == sorted(fitness)
+
+
+def test_carnivore_feeding_reuses_order():
+    """Test if the herbivores are only sorted once when the feeding order still holds"""
+    random.seed(seed)
+    cell = Lowland([Herbivore(random.randint(0, 20), random.uniform(5, 50)) for _ in range(200)])
+    counters = EventCounters()
+    counters.enable()
+    try:
+        cell.feeding()
+        cell.carnivore_feeding()
+    finally:
+        counters.disable()
+    assert counters.counts['sorts'] == 1
+
+    cell.herbivores.append(Herbivore(5, 20))
+    counters.enable()
+    try:
+        cell.carnivore_feeding()
+    finally:
+        counters.disable()
+    assert counters.counts['sorts'] == 2
+    fitness = [herbi.fitness for herbi in cell.herbivores]
+    assert fitness == sorted(fitness)
+
+
 def test_feeding_carnivores():
     """Test if the carnivores are going to eat any herbivores by reducing
     herbivore population"""
@@ -212,3 +251,72 @@ def test_list_carnivore_fitness():
     cell = Lowland(carnivores=[Carnivore(3, 50)])
     assert type(cell.list_carnivores_fitness()) == list and \
            cell.list_carnivores_fitness() == [Carnivore(3, 50)._fitness]
+
+
+def test_copy():
+    """Tests if a copied cell has its own animals with the same weight"""
+    cell = Lowland([Herbivore(3, 50)], [Carnivore(3, 30)])
+    twin = cell.copy()
+    twin.weight_loss()
+    assert type(twin) is Lowland and cell.list_herbivores_weight() == [50] and \
+           twin.list_herbivores_weight() == [50 - 50 * Herbivore.params['eta']]
+
+
+@pytest.mark.parametrize('species', [['Herbivore', 'Carnivore', 'Herbivore'], [0, 1, 0]])
+def test_pop_columns(species):
+    """Test if animals given as columns, with names or species codes, are placed in the cell"""
+    cell = Lowland()
+    cell.pop_animals({'species': species, 'age': [1, 2, 3], 'weight': [10., 20., 30.]})
+    assert cell.list_herbivores_ages() == [1, 3] and cell.list_carnivores_weight() == [20.]
+
+
+def test_pop_columns_error():
+    """Test if it raises ValueError if a species in the columns does not exist"""
+    with pytest.raises(ValueError):
+        Lowland().pop_columns(['Herbivore', 'Animal'], [1, 2], [10., 20.])
+
+
+def test_select_by_class_mean():
+    """Tests if the number of selected animals is close to the sum of the probabilities"""
+    sampling.seed(seed)
+    fitness = np.linspace(0, 1, 10000)
+    selected = select_by_class(fitness, 0.5 * fitness)
+    assert selected.sum() == pytest.approx(0.5 * fitness.sum(), rel=0.05)
+    assert selected[fitness > 0.5].sum() > selected[fitness < 0.5].sum()
+
+
+def test_select_by_class_certain():
+    """Tests if animals with probability 1 are always selected, and with 0 never"""
+    sampling.seed(seed)
+    selected = select_by_class(np.full(6, 0.3), np.array([1., 1., 0., 0., 0., 0.]))
+    assert selected.tolist() == [True, True, False, False, False, False]
+
+
+def test_select_by_class_spread():
+    """Tests if the animals of a class are all about as likely to be selected"""
+    sampling.seed(seed)
+    times = np.zeros(10)
+    for _ in range(2000):
+        times += select_by_class(np.full(10, 0.3), np.full(10, 0.2))
+    assert times == pytest.approx(400, rel=0.15)
+
+
+def test_pop_reduction_binomial():
+    """Tests if about the expected number of herbivores die"""
+    sampling.seed(seed)
+    cell = Lowland()
+    cell.pop_animals([{'species': 'Herbivore', 'age': 5, 'weight': 20} for _ in range(2000)])
+    expected = 2000 * Herbivore.params['omega'] * (1 - cell.herbivores[0].fitness)
+    cell.pop_reduction_binomial()
+    assert 2000 - cell.num_herbivores() == pytest.approx(expected, rel=0.15)
+
+
+def test_emigrate_binomial():
+    """Tests if the emigrating animals are split over the neighbours and none are lost"""
+    sampling.seed(seed)
+    cell = Lowland()
+    cell.pop_animals([{'species': 'Herbivore', 'age': 5, 'weight': 20} for _ in range(1000)])
+    neighbours = {loc: Lowland() for loc in ((0, 1), (1, 0), (2, 1), (1, 2))}
+    moved = cell.emigrate_binomial(list(neighbours), neighbours.get)
+    assert moved > 0 and all(new_cell.immigrating_herbivores for new_cell in neighbours.values())
+    assert cell.num_herbivores() + moved == 1000
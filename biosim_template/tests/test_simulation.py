@@ -0,0 +1,488 @@
+"""Test for BioSim class"""
+import asyncio
+import concurrent.futures
+import os
+import subprocess
+import sys
+import textwrap
+import threading
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pytest
+
+from biosim.animal import Herbivore
+from biosim.counters import EventCounters
+from biosim.instrumentation import CallbackSink, Instrumentation
+from biosim.landscape import Lowland
+from biosim.simulation import BioSim
+
+seed = 1234
+
+geogr = """\
+           WWWWW
+           WLLHW
+           WDLLW
+           WWWWW"""
+geogr = textwrap.dedent(geogr)
+
+ini_herbs = [{'loc': (2, 2),
+              'pop': [{'species': 'Herbivore',
+                       'age': 5,
+                       'weight': 20}
+                      for _ in range(50)]}]
+
+ini_carns = [{'loc': (2, 2),
+              'pop': [{'species': 'Carnivore',
+                       'age': 5,
+                       'weight': 20}
+                      for _ in range(20)]}]
+
+
+def test_fork_same_state():
+    """Tests if a branch starts with the same year and animals as the simulation"""
+    sim = BioSim(geogr, ini_herbs, seed=seed, vis_years=0)
+    sim.simulate(5)
+    branch = sim.fork()
+    assert branch.year == sim.year and branch.num_animals_per_species == sim.num_animals_per_species
+
+
+def test_fork_independent():
+    """Tests if changes in a branch does not change the simulation it was forked from"""
+    sim = BioSim(geogr, ini_herbs, seed=seed, vis_years=0)
+    sim.simulate(5)
+    before = sim.num_animals_per_species
+    branch = sim.fork(seed=seed)
+    branch.add_population(ini_carns)
+    branch.simulate(3)
+    assert sim.num_animals_per_species == before and sim.year == 5 and branch.year == 8
+
+
+def test_fork_seed_reproducible():
+    """Tests if two branches forked with the same seed gives the same result"""
+    sim = BioSim(geogr, ini_herbs, seed=seed, vis_years=0)
+    sim.simulate(5)
+    branch_1 = sim.fork(seed=1)
+    branch_1.simulate(5)
+    branch_2 = sim.fork(seed=1)
+    branch_2.simulate(5)
+    assert branch_1.num_animals_per_species == branch_2.num_animals_per_species
+
+
+def test_headless_no_matplotlib():
+    """Tests if matplotlib is not imported when the simulation runs in headless mode"""
+    code = textwrap.dedent("""\
+        import sys
+        from biosim.simulation import BioSim
+        sim = BioSim('WWW\\nWLW\\nWWW', [], seed=1, vis_years=0)
+        sim.simulate(2)
+        assert 'matplotlib' not in sys.modules
+        """)
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    subprocess.check_call([sys.executable, '-c', code], env=env)
+
+
+def test_headless_make_movie():
+    """Tests if make_movie raises RuntimeError in headless mode"""
+    sim = BioSim(geogr, ini_herbs, seed=seed, vis_years=0)
+    with pytest.raises(RuntimeError):
+        sim.make_movie()
+
+
+def test_async_graphics_saves_images(tmpdir):
+    """Tests if all the images are saved when the graphics are drawn in a separate thread"""
+    sim = BioSim(geogr, ini_herbs, seed=seed, img_dir=str(tmpdir), img_base='async',
+                 async_graphics={'queue_size': 2, 'policy': 'block'})
+    sim.simulate(3)
+    plt.close('all')
+    assert sorted(os.listdir(tmpdir)) == ['async_00000.png', 'async_00001.png', 'async_00002.png']
+
+
+def test_async_graphics_invalid_key():
+    """Tests if it raises KeyError if async_graphics has an unknown key"""
+    with pytest.raises(KeyError):
+        BioSim(geogr, ini_herbs, seed=seed, async_graphics={'threads': 2})
+
+
+def test_stats_counts_events():
+    """Tests if the counters count the work of each year of the last simulate call"""
+    sim = BioSim(geogr, ini_herbs + ini_carns, seed=seed, vis_years=0, counters=True)
+    sim.simulate(3)
+    stats = sim.stats()
+    assert len(stats['years']) == 3
+    assert all(stats[event] > 0
+               for event in ('fitness_updates', 'rng_draws', 'sorts', 'allocations'))
+    assert stats['sorts'] == sum(year['sorts'] for year in stats['years'])
+    sim.simulate(1)
+    assert len(sim.stats()['years']) == 1
+
+
+def test_stats_same_simulation():
+    """Tests if counting does not change the simulation"""
+    counted = BioSim(geogr, ini_herbs + ini_carns, seed=seed, vis_years=0, counters=True)
+    counted.simulate(5)
+    plain = BioSim(geogr, ini_herbs + ini_carns, seed=seed, vis_years=0)
+    plain.simulate(5)
+    assert counted.num_animals_per_species == plain.num_animals_per_species
+
+
+def test_counters_overlapping():
+    """Tests if overlapping counters each count, and only while they are enabled"""
+    first, second = EventCounters(), EventCounters()
+    first.enable()
+    Herbivore(5, 20)
+    second.enable()
+    Herbivore(5, 20)
+    first.disable()
+    Herbivore(5, 20)
+    second.disable()
+    Herbivore(5, 20)
+    assert first.counts['allocations'] == 1 and second.counts['allocations'] == 2
+
+
+def test_counters_in_threads():
+    """Tests if counters enabled in two threads only count the animals made in their own thread"""
+    counters = [EventCounters(), EventCounters()]
+    both_enabled = threading.Barrier(2)
+
+    def make_animals(counter, number):
+        counter.enable()
+        both_enabled.wait()
+        for _ in range(number):
+            Herbivore(5, 20)
+        both_enabled.wait()
+        counter.disable()
+
+    threads = [threading.Thread(target=make_animals, args=(counter, number))
+               for counter, number in zip(counters, (3, 7))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert [counter.counts['allocations'] for counter in counters] == [3, 7]
+
+
+def test_stats_not_enabled():
+    """Tests if stats raises RuntimeError when the counters are not used"""
+    with pytest.raises(RuntimeError):
+        BioSim(geogr, ini_herbs + ini_carns, seed=seed, vis_years=0).stats()
+
+
+def test_stop_extinct():
+    """Tests if simulate stops when all the animals are dead"""
+    sim = BioSim(geogr,
+                 [{'loc': (2, 2), 'pop': [{'species': 'Carnivore', 'age': 50, 'weight': 5}]}],
+                 seed=seed, vis_years=0)
+    assert sim.simulate(100, stop={'extinct': 'all'}) == 'extinct'
+    assert sim.year < 100
+
+
+def test_stop_above():
+    """Tests if simulate stops when there are more herbivores than the limit"""
+    sim = BioSim(geogr, ini_herbs, seed=seed, vis_years=0)
+    assert sim.simulate(50, stop={'above': {'Herbivore': 60}}) == 'Herbivore above 60'
+    assert sim.num_animals_per_species['Herbivore'] > 60
+
+
+def test_stop_steady():
+    """Tests if simulate stops when the numbers do not change"""
+    sim = BioSim(geogr, [], seed=seed, vis_years=0)
+    assert sim.simulate(20, stop={'steady': {'window': 5, 'tolerance': 0.}}) == 'steady'
+    assert sim.year == 5
+
+
+def test_no_stop():
+    """Tests if simulate runs all the years when no condition is met"""
+    sim = BioSim(geogr, ini_herbs, seed=seed, vis_years=0)
+    assert sim.simulate(5, stop={'extinct': 'Herbivore', 'below': {'Herbivore': 1}}) is None
+    assert sim.year == 5
+
+
+def test_stop_invalid():
+    """Tests if simulate raises KeyError for unknown stop conditions"""
+    sim = BioSim(geogr, ini_herbs, seed=seed, vis_years=0)
+    with pytest.raises(KeyError):
+        sim.simulate(5, stop={'never': True})
+
+
+def test_fast_forward():
+    """Tests if the animals are grouped into cohorts when the simulation has converged"""
+    sim = BioSim(geogr, ini_herbs, seed=seed, vis_years=0)
+    sim.simulate(150, fast_forward={'window': 20, 'tolerance': 0.2})
+    assert sim.Island.bin_width is not None and sim.num_animals > 0
+    sim.simulate(1)
+    assert sim.Island.bin_width is None
+
+
+def test_fast_forward_invalid():
+    """Tests if it raises KeyError for an unknown fast_forward setting"""
+    sim = BioSim(geogr, ini_herbs, seed=seed, vis_years=0)
+    with pytest.raises(KeyError):
+        sim.simulate(5, fast_forward={'years': 5})
+
+
+def test_cohort_simulation():
+    """Tests if a simulation made with bin_width stays in cohorts"""
+    sim = BioSim(geogr, ini_herbs + ini_carns, seed=seed, vis_years=0, bin_width=1.)
+    sim.simulate(10)
+    assert sim.Island.bin_width == 1. and sim.num_animals > 0
+
+
+def test_binomial_sampling_fewer_draws():
+    """Tests if binomial sampling needs fewer calls to the random number generators"""
+    draws = {}
+    for mode in ('animal', 'binomial'):
+        sim = BioSim(geogr, ini_herbs + ini_carns, seed=seed, vis_years=0, counters=True,
+                     sampling=mode)
+        sim.simulate(10)
+        draws[mode] = sim.stats()['rng_draws']
+        assert sim.num_animals > 0
+    assert draws['binomial'] < draws['animal']
+
+
+def test_sampling_invalid():
+    """Tests if it raises ValueError for an unknown sampling mode"""
+    with pytest.raises(ValueError):
+        BioSim(geogr, ini_herbs, seed=seed, vis_years=0, sampling='poisson')
+
+
+@pytest.fixture
+def reset_params():
+    """Sets the parameters changed by a schedule back"""
+    herbivore, f_max = dict(Herbivore.params), Lowland.f_max
+    yield
+    Herbivore.params.update(herbivore)
+    Lowland.f_max = f_max
+
+
+def test_schedule_values_each_year(reset_params):
+    """Tests if the value of each year of a schedule is used in that year"""
+    f_max = []
+    instrument = Instrumentation(CallbackSink(
+        lambda record: f_max.append(Lowland.f_max)
+        if record['phase'] == 'feeding_season' else None))
+    sim = BioSim(geogr, ini_herbs, seed=seed, vis_years=0, instrument=instrument)
+    sim.simulate(5, schedule={'L': {'f_max': {0: 100, 3: 500}}, 'Herbivore': {'mu': [0.1, 0.2]}})
+    assert f_max == [100, 100, 100, 500, 500]
+    assert Herbivore.params['mu'] == 0.2
+
+
+def test_schedule_same_as_changing_parameters(reset_params):
+    """Tests if a schedule gives the same result as changing the parameters between runs"""
+    sim = BioSim(geogr, ini_herbs, seed=seed, vis_years=0)
+    sim.simulate(6, schedule={'L': {'f_max': [100, 100, 100, 800]}})
+
+    Lowland.f_max = 800
+    other = BioSim(geogr, ini_herbs, seed=seed, vis_years=0)
+    other.set_landscape_parameters('L', {'f_max': 100})
+    other.simulate(3)
+    other.set_landscape_parameters('L', {'f_max': 800})
+    other.simulate(3)
+    assert sim.num_animals_per_species == other.num_animals_per_species
+
+
+@pytest.mark.parametrize('schedule, error', [({'X': {'f_max': [1]}}, KeyError),
+                                             ({'Herbivore': {'no_param': [1]}}, KeyError),
+                                             ({'Herbivore': {'mu': {0: 0.2, 3: -1}}}, ValueError),
+                                             ({'Herbivore': {'mu': []}}, ValueError)])
+def test_schedule_invalid(reset_params, schedule, error):
+    """Tests if a schedule that is not valid raises an error before any year is simulated"""
+    mu = Herbivore.params['mu']
+    sim = BioSim(geogr, ini_herbs, seed=seed, vis_years=0)
+    with pytest.raises(error):
+        sim.simulate(5, schedule=schedule)
+    assert sim.year == 0 and Herbivore.params['mu'] == mu
+
+
+def test_run_batch_same_as_simulate():
+    """Tests if run_batch gives the same animals as simulate with the same seed"""
+    sim = BioSim(geogr, ini_herbs + ini_carns, seed=seed, vis_years=0)
+    sim.simulate(10)
+    batch = BioSim(geogr, ini_herbs + ini_carns, seed=seed, vis_years=0)
+    counts = batch.run_batch(10, report_every=4)
+    assert counts['year'].tolist() == [4, 8, 10] and batch.year == 10
+    assert [counts['Herbivore'][-1], counts['Carnivore'][-1]] == \
+        list(sim.num_animals_per_species.values())
+
+
+def test_run_batch_log_and_schedule(tmpdir, reset_params):
+    """Tests if run_batch writes the reported years to the log file and follows the schedule"""
+    log_file = str(tmpdir.join('counts.csv'))
+    sim = BioSim(geogr, ini_herbs, seed=seed, vis_years=0, log_file=log_file)
+    sim.run_batch(6, report_every=2, schedule={'L': {'f_max': {3: 100}}})
+    with open(log_file) as f:
+        assert [line.split(',')[0] for line in f.readlines()[1:]] == ['0', '2', '4', '6']
+    assert Lowland.f_max == 100
+
+
+def test_run_batch_invalid():
+    """Tests if run_batch raises ValueError for a reporting interval that is not positive"""
+    sim = BioSim(geogr, ini_herbs, seed=seed, vis_years=0)
+    for report_every in (-1, 0):
+        with pytest.raises(ValueError):
+            sim.run_batch(10, report_every=report_every)
+
+
+def test_run_batch_counters():
+    """Tests if the counters keep the counts of each year, like in simulate"""
+    sim = BioSim(geogr, ini_herbs + ini_carns, seed=seed, vis_years=0, counters=True)
+    sim.run_batch(6, report_every=3)
+    stats = sim.stats()
+    assert len(stats['years']) == 6
+    assert stats['sorts'] == sum(year['sorts'] for year in stats['years'])
+
+
+def test_iter_years_same_as_simulate():
+    """Tests if iter_years gives the same counts as simulate with the same seed"""
+    sim = BioSim(geogr, ini_herbs + ini_carns, seed=seed, vis_years=0)
+    sim.simulate(5)
+    streamed = BioSim(geogr, ini_herbs + ini_carns, seed=seed, vis_years=0)
+    records = list(streamed.iter_years(5))
+    assert [record['year'] for record in records] == [1, 2, 3, 4, 5]
+    assert records[-1]['counts'] == sim.num_animals_per_species
+    assert streamed.year == 5
+
+
+def test_iter_years_is_lazy():
+    """Tests if a year is only simulated when its record is asked for"""
+    sim = BioSim(geogr, ini_herbs, seed=seed, vis_years=0)
+    years = sim.iter_years(100)
+    assert sim.year == 0
+    next(years)
+    next(years)
+    assert sim.year == 2
+
+
+def test_iter_years_fields():
+    """Tests if the records only have the fields asked for, with count maps and histograms"""
+    sim = BioSim(geogr, ini_herbs + ini_carns, seed=seed, vis_years=0,
+                 hist_specs={'weight': {'max': 80, 'delta': 4}})
+    record = next(sim.iter_years(1, fields=('count_maps', 'weight')))
+    assert set(record) == {'year', 'count_maps', 'weight'}
+    assert record['count_maps']['Herbivore'].sum() == sim.num_animals_per_species['Herbivore']
+    assert len(record['weight']['bins']) == 21
+    assert len(record['weight']['Carnivore']) == 20
+    assert next(sim.iter_years(1, fields='age'))['age']['bins'][-1] == 60
+
+
+def test_iter_years_unknown_field():
+    """Tests if it raises KeyError for an unknown field before any year is simulated"""
+    sim = BioSim(geogr, ini_herbs, seed=seed, vis_years=0)
+    with pytest.raises(KeyError):
+        sim.iter_years(10, fields=('counts', 'colour'))
+    assert sim.year == 0
+
+
+async def _collect(years, stop_at=None):
+    """Collects the records of an asynchronous generator of years, and closes it"""
+    records = []
+    try:
+        async for record in years:
+            records.append(record)
+            if len(records) == stop_at:
+                break
+    finally:
+        await years.aclose()
+    return records
+
+
+@pytest.mark.parametrize('prefetch', [True, False])
+def test_aiter_years_same_as_iter_years(prefetch):
+    """Tests if aiter_years gives the same records as iter_years with the same seed"""
+    sim = BioSim(geogr, ini_herbs + ini_carns, seed=seed, vis_years=0)
+    expected = [record['counts'] for record in sim.iter_years(5)]
+    sim = BioSim(geogr, ini_herbs + ini_carns, seed=seed, vis_years=0)
+    records = asyncio.run(_collect(sim.aiter_years(5, prefetch=prefetch)))
+    assert [record['counts'] for record in records] == expected
+    assert sim.year == 5
+
+
+def test_aiter_years_array_engine():
+    """Tests if the array engine gives the same records with aiter_years as with iter_years"""
+    pytest.importorskip('numba')
+    sim = BioSim(geogr, ini_herbs + ini_carns, seed=seed, vis_years=0, engine='array')
+    expected = [record['counts'] for record in sim.iter_years(10)]
+    for _ in range(2):
+        sim = BioSim(geogr, ini_herbs + ini_carns, seed=seed, vis_years=0, engine='array')
+        records = asyncio.run(_collect(sim.aiter_years(10)))
+        assert [record['counts'] for record in records] == expected
+
+
+def test_import_without_asyncio():
+    """Tests if asyncio is only imported when aiter_years is used"""
+    code = textwrap.dedent("""\
+        import sys
+        import biosim.simulation
+        assert 'asyncio' not in sys.modules
+        """)
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    subprocess.check_call([sys.executable, '-c', code], env=env)
+
+
+@pytest.mark.parametrize('prefetch, years', [(True, {5, 6}), (False, {5})])
+def test_aiter_years_stop(tmpdir, prefetch, years):
+    """Tests if stopping the loop stops the simulation, and only the records are logged"""
+    log_file = str(tmpdir.join('counts.csv'))
+    sim = BioSim(geogr, ini_herbs, seed=seed, vis_years=0, log_file=log_file)
+    sim.simulate(2)
+    assert len(asyncio.run(_collect(sim.aiter_years(100, prefetch=prefetch), stop_at=3))) == 3
+    assert sim.year in years
+    with open(log_file) as f:
+        assert [line.split(',')[0] for line in f.readlines()[1:]] == ['0', '1', '2', '3', '4', '5']
+
+
+def test_aiter_years_aclose():
+    """Tests if closing the generator after k records leaves the simulation k years on"""
+    sim = BioSim(geogr, ini_herbs, seed=seed, vis_years=0)
+    sim.simulate(2)
+    assert len(asyncio.run(_collect(sim.aiter_years(100), stop_at=4))) == 4
+    assert sim.year == 2 + 4
+
+
+def test_aiter_years_cancel():
+    """Tests if a cancelled loop stops simulating, and leaves the simulation between two years"""
+    sim = BioSim(geogr, ini_herbs + ini_carns, seed=seed, vis_years=0)
+
+    async def cancel():
+        task = asyncio.create_task(_collect(sim.aiter_years(100000)))
+        while sim.year < 3:
+            await asyncio.sleep(0.001)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        year = sim.year
+        await asyncio.sleep(0.05)
+        return year
+
+    assert asyncio.run(cancel()) == sim.year < 100000
+
+
+def test_aiter_years_concurrent():
+    """Tests if several simulations can run at the same time in one event loop"""
+    sims = [BioSim(geogr, ini_herbs, seed=seed, vis_years=0) for _ in range(3)]
+
+    async def run_all():
+        with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+            return await asyncio.gather(*(_collect(sim.aiter_years(4, executor=executor))
+                                          for sim in sims))
+
+    assert [len(records) for records in asyncio.run(run_all())] == [4, 4, 4]
+    assert [sim.year for sim in sims] == [4, 4, 4]
+
+
+def test_aiter_years_process_executor():
+    """Tests if it raises ValueError for an executor that runs in other processes"""
+    sim = BioSim(geogr, ini_herbs, seed=seed, vis_years=0)
+    with concurrent.futures.ProcessPoolExecutor(max_workers=1) as executor:
+        with pytest.raises(ValueError):
+            sim.aiter_years(4, executor=executor)
+
+
+def test_ini_pop_structured_array():
+    """Tests if the initial population can be a structured array"""
+    table = np.array([(2, 2, 'Herbivore', 5, 20.), (2, 3, 'Carnivore', 4, 15.),
+                      (2, 2, 'Herbivore', 6, 21.)],
+                     dtype=[('row', int), ('col', int), ('species', 'U9'), ('age', int),
+                            ('weight', float)])
+    sim = BioSim(geogr, table, seed=seed, vis_years=0)
+    assert sim.num_animals_per_species == {'Herbivore': 2, 'Carnivore': 1}